@@ -0,0 +1,210 @@
+"""
+Env throughput benchmark for the four competition games.
+
+For SecretMafia, ColonelBlotto, ThreePlayerIPD and Codenames this measures:
+
+  - construct cost (Codenames loads and POS-tags its word list here),
+  - reset cost,
+  - step cost and steps per second (env.get_observation + env.step only; the
+    scripted agents that produce the actions are not timed),
+  - render cost (create_board_str, create_game_str, the Codenames board view),
+  - peak traced memory per game and memory retained per step (tracemalloc,
+    in a separate pass so it does not distort the timings).
+
+Actions come from scripted_agents.RandomValidAgent with `rationale=True`, which
+writes discussion lines, a short rationale before each move and a legal move
+for the phase.
+
+By default the reference env copies under envs/ are benchmarked with the
+wrappers textarena registers for them; --source textarena uses ta.make().
+Results can be written as JSON and compared against an earlier run:
+
+Usage:
+    python benchmarks/bench_env_throughput.py
+    python benchmarks/bench_env_throughput.py --games 20 --output bench.json
+    python benchmarks/bench_env_throughput.py --compare bench.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "src"))
+from scripted_agents import RandomValidAgent  # noqa: E402
+
+GAMES = {
+    # env id -> (module of the reference copy, env class, players, renderers as (name, module, function))
+    "SecretMafia-v0": ("envs.SecretMafia.env", "SecretMafiaEnv", 7, [("create_board_str", "envs.SecretMafia.renderer", "create_board_str")]),
+    "ColonelBlotto-v0": ("envs.ColonelBlotto.env", "ColonelBlottoEnv", 2, [("create_game_str", "envs.ColonelBlotto.renderer", "create_game_str")]),
+    "ThreePlayerIPD-v0": ("envs.ThreePlayerIPD.env", "ThreePlayerIPDEnv", 3, []),
+    "Codenames-v0": ("envs.Codenames.env", "CodenamesEnv", 4, [("render_player_view", None, "_render_player_view")]),
+}
+
+def make_env(env_id: str, source: str):
+    """ Build the env: the reference copy with textarena's default wrappers, or ta.make() """
+    import textarena as ta
+    if source == "textarena": return ta.make(env_id)
+    from textarena.envs.registration import ENV_REGISTRY
+    spec = ENV_REGISTRY[env_id]
+    module, cls, _, _ = GAMES[env_id]
+    env = getattr(importlib.import_module(module), cls)(**spec.kwargs)
+    for wrapper in spec.default_wrappers or []:
+        env = wrapper(env)
+    return env
+
+
+def play(env, num_players: int, seed: int, max_steps: int):
+    """ Play one game, timing only the env calls; returns (step seconds, observation seconds) per step """
+    agents = [RandomValidAgent(seed=seed * 100 + pid, rationale=True) for pid in range(num_players)]
+    env.reset(num_players=num_players, seed=seed)
+    step_s, obs_s, done = [], [], False
+    while not done and len(step_s) < max_steps:
+        start = time.perf_counter()
+        player_id, observation = env.get_observation()
+        obs_s.append(time.perf_counter() - start)
+        action = agents[player_id](observation)
+        start = time.perf_counter()
+        done, _ = env.step(action=action)
+        step_s.append(time.perf_counter() - start)
+    return step_s, obs_s
+
+
+def memory_pass(env, num_players: int, seed: int, max_steps: int) -> dict:
+    agents = [RandomValidAgent(seed=seed * 100 + pid, rationale=True) for pid in range(num_players)]
+    tracemalloc.start()
+    try:
+        env.reset(num_players=num_players, seed=seed)
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        steps, done = 0, False
+        while not done and steps < max_steps:
+            player_id, observation = env.get_observation()
+            done, _ = env.step(action=agents[player_id](observation))
+            steps += 1
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": (peak - baseline) / 1024, "retained_bytes_per_step": (current - baseline) / max(steps, 1)}
+
+
+def render_costs(env, env_id: str, repeat: int) -> dict:
+    costs = {}
+    for name, module, function in GAMES[env_id][3]:
+        if module is None: render = getattr(env, function)
+        else:
+            fn = getattr(importlib.import_module(module), function)
+            render = lambda: fn(env.state.game_state)
+        start = time.perf_counter()
+        for _ in range(repeat): render()
+        costs[name] = (time.perf_counter() - start) / repeat * 1e6
+    return costs
+
+
+def bench_env(env_id: str, args) -> dict:
+    num_players = GAMES[env_id][2]
+    construct = []
+    for _ in range(args.construct_runs):
+        start = time.perf_counter()
+        env = make_env(env_id, args.source)
+        construct.append(time.perf_counter() - start)
+
+    resets = []
+    for seed in range(args.resets):
+        start = time.perf_counter()
+        env.reset(num_players=num_players, seed=seed)
+        resets.append(time.perf_counter() - start)
+
+    step_s, obs_s = [], []
+    for game in range(args.games):
+        s, o = play(env, num_players, args.seed + game, args.max_steps)
+        step_s += s
+        obs_s += o
+    renders = render_costs(env, env_id, args.render_repeat)  # on the final state of the last game
+    ordered = sorted(step_s)
+    result = {
+        "env_id": env_id,
+        "construct_ms": statistics.median(construct) * 1000,
+        "reset_us": statistics.median(resets) * 1e6,
+        "games": args.games,
+        "steps": len(step_s),
+        "steps_per_s": len(step_s) / (sum(step_s) + sum(obs_s)),
+        "step_us_mean": statistics.mean(step_s) * 1e6,
+        "step_us_p95": ordered[int(0.95 * (len(ordered) - 1))] * 1e6,
+        "observation_us_mean": statistics.mean(obs_s) * 1e6,
+        "render_us": renders,
+    }
+    result.update(memory_pass(env, num_players, args.seed, args.max_steps))
+    return result
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results: list, baseline_path: str):
+    """ Print the ratio of each timing against a previous JSON run (>1 means slower now) """
+    with open(baseline_path) as f:
+        baseline = {r["env_id"]: r for r in json.load(f)["results"] if "error" not in r}
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        old = baseline.get(r["env_id"])
+        if old is None or "error" in r: continue
+        ratios = {k: r[k] / old[k] for k in ("reset_us", "step_us_mean", "observation_us_mean", "peak_kib") if old.get(k)}
+        print(f"{r['env_id']:<18} " + "  ".join(f"{k} x{v:.2f}" for k, v in ratios.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Env throughput benchmark")
+    parser.add_argument("--envs", nargs="+", default=list(GAMES), choices=list(GAMES))
+    parser.add_argument("--source", choices=["repo", "textarena"], default="repo", help="benchmark envs/ copies or the installed textarena envs")
+    parser.add_argument("--games", type=int, default=10, help="games per env for the step timings")
+    parser.add_argument("--resets", type=int, default=50)
+    parser.add_argument("--construct-runs", type=int, default=3)
+    parser.add_argument("--render-repeat", type=int, default=1000)
+    parser.add_argument("--max-steps", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--output", default=None, help="also write the JSON results to this file")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for env_id in args.envs:
+        try:
+            results.append(bench_env(env_id, args))
+        except Exception as e:  # e.g. Codenames without the nltk corpora
+            message = next((line.strip() for line in str(e).splitlines() if line.strip(" *")), "")
+            results.append({"env_id": env_id, "error": f"{type(e).__name__}: {message}"})
+    report = {"meta": {**metadata(), "source": args.source}, "results": results}
+
+    if args.output:
+        with open(args.output, "w") as f: json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'env':<18} {'construct ms':>12} {'reset us':>9} {'steps/s':>9} {'step us':>8} {'p95 us':>8} {'obs us':>7} {'peak KiB':>9} {'B/step':>7}  render us")
+        for r in results:
+            if "error" in r:
+                print(f"{r['env_id']:<18} {r['error']}")
+                continue
+            renders = ", ".join(f"{k} {v:.1f}" for k, v in r["render_us"].items()) or "-"
+            print(f"{r['env_id']:<18} {r['construct_ms']:>12.1f} {r['reset_us']:>9.1f} {r['steps_per_s']:>9.0f} {r['step_us_mean']:>8.1f} "
+                  f"{r['step_us_p95']:>8.1f} {r['observation_us_mean']:>7.1f} {r['peak_kib']:>9.1f} {r['retained_bytes_per_step']:>7.0f}  {renders}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+End-to-end games-per-minute benchmark of the harness against a mock endpoint.
+
+Starts src/mock_openai_server.py in a background thread and plays full games
+with GameManager, every seat an OpenAIAgent pointed at the mock. Several games
+run concurrently (one thread per game), so the numbers cover the whole request
+path: prompt building, the HTTP client and its connection pool, the request
+layer (rate limiting, retries after injected errors), response post-processing
+and env stepping.
+
+With --latency 0 and no token pacing this measures the harness overhead alone;
+with realistic latencies it shows how far concurrency hides them.
+
+Usage:
+    python benchmarks/bench_games_per_minute.py
+    python benchmarks/bench_games_per_minute.py --envs ColonelBlotto-v0 --games 20 --concurrency 8 --latency uniform:0.05,0.2
+    python benchmarks/bench_games_per_minute.py --error-rate 0.05 --stream --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "src"))
+from agent import OpenAIAgent  # noqa: E402
+from game_manager import GameManager  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+DEFAULT_ENVS = ["ColonelBlotto-v0", "ThreePlayerIPD-v0", "SecretMafia-v0"]
+
+
+def play_one(env_id: str, seed: int, base_url: str, args) -> dict:
+    with GameManager() as manager:
+        manager.setup_game(env_id)
+        for _ in range(manager.get_required_players()):
+            manager.add_agent(OpenAIAgent(model_name="mock", api_key="mock", base_url=base_url, api_type="openai",
+                                          max_retries=args.max_retries))
+        manager.start_game(seed=seed)
+        # a no-op chunk callback makes GameManager use the agents' streaming path
+        callbacks = {"on_action_chunk": lambda player_id, chunk: None} if args.stream else None
+        start = time.perf_counter()
+        result = manager.play_game(max_steps=args.max_steps, callbacks=callbacks, concurrent=not args.sequential_turns)
+        elapsed = time.perf_counter() - start
+    stats = [agent._caller.stats_snapshot() for agent in manager.agents.values()]
+    return {"seconds": elapsed, "steps": result["steps"], "status": result["status"],
+            "retries": sum(s["retries"] for s in stats), "failures": sum(s["failures"] for s in stats)}
+
+
+def bench_env(env_id: str, base_url: str, args) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        games = list(pool.map(lambda seed: play_one(env_id, seed, base_url, args), range(args.seed, args.seed + args.games)))
+    wall = time.perf_counter() - start
+    steps = sum(g["steps"] for g in games)
+    return {
+        "env_id": env_id,
+        "games": len(games),
+        "completed": sum(g["status"] == "completed" for g in games),
+        "games_per_min": len(games) / wall * 60,
+        "steps_per_s": steps / wall,
+        "game_s_mean": statistics.mean(g["seconds"] for g in games),
+        "steps_per_game": steps / len(games),
+        "retries": sum(g["retries"] for g in games),
+        "failures": sum(g["failures"] for g in games),
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Games-per-minute benchmark against a mock OpenAI endpoint")
+    parser.add_argument("--envs", nargs="+", default=DEFAULT_ENVS, choices=list(GameManager.GAME_PLAYER_COUNT))
+    parser.add_argument("--games", type=int, default=8, help="games per env")
+    parser.add_argument("--concurrency", type=int, default=4, help="games played at the same time")
+    parser.add_argument("--latency", default="fixed:0", help="mock time to first token: fixed:S, uniform:LO,HI or lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429/500")
+    parser.add_argument("--tokens-per-s", type=float, default=None, help="mock generation speed (default: unpaced)")
+    parser.add_argument("--stream", action="store_true", help="use the streaming request path")
+    parser.add_argument("--sequential-turns", action="store_true", help="query agents one by one even in simultaneous-move phases")
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    for name in ("game_manager", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    results = []
+    with MockOpenAIServer(latency=args.latency, error_rate=args.error_rate, retry_after=0.01,
+                          tokens_per_s=args.tokens_per_s, seed=args.seed) as server:
+        for env_id in args.envs:
+            with contextlib.redirect_stdout(io.StringIO()):  # OpenAIAgent prints every request
+                results.append(bench_env(env_id, server.base_url, args))
+        server_stats = dict(server.stats)
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "server": server_stats, "results": results}, indent=2))
+        return
+    print(f"{'env':<18} {'games':>5} {'done':>5} {'games/min':>10} {'steps/s':>8} {'game s':>7} {'steps':>6} {'retries':>7} {'failed':>6}")
+    for r in results:
+        print(f"{r['env_id']:<18} {r['games']:>5} {r['completed']:>5} {r['games_per_min']:>10.1f} {r['steps_per_s']:>8.1f} "
+              f"{r['game_s_mean']:>7.2f} {r['steps_per_game']:>6.0f} {r['retries']:>7} {r['failures']:>6}")
+    print(f"mock server: {server_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the ThreePlayerIPD decision-token parser on long reasoning outputs.
+
+Compares the previous full left-to-right `token_pat.findall` scan with the
+backward single-pass `DecisionParser.parse`, on replies that carry several
+kilobytes of chain-of-thought (including "thinking" tokens) before the answer.
+
+Usage:
+    python benchmarks/bench_ipd_decision_parser.py
+    python benchmarks/bench_ipd_decision_parser.py --sizes 2000 8000 32000 --repeat 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from envs.ThreePlayerIPD.env import DecisionParser
+
+PLAYER_ID = 0
+OPPONENTS = (1, 2)
+
+REASONING_SNIPPETS = [
+    "Player 1 said they would cooperate, but last round they chose [1 defect] against me. ",
+    "If I play [2 cooperate] and Player 2 defects I only get 0, which is the sucker payoff. ",
+    "Mutual cooperation gives 3 each, so maybe [1 cooperate] [2 cooperate] is the safe choice. ",
+    "On the other hand a defection against a cooperator yields 5 points for me. ",
+    "Let me reconsider the scores so far and what the others promised during the chat. ",
+]
+
+
+def legacy_parse(msg: str, player_id: int, opponents) -> dict:
+    """ The previous implementation: scan every token, later tokens overwrite earlier ones """
+    decisions = {}
+    for pid_str, choice in DecisionParser.token_pat.findall(msg):
+        tgt = int(pid_str)
+        if tgt == player_id or tgt not in opponents:
+            continue
+        decisions[tgt] = ("defect" if choice.lower().startswith("d") else "cooperate")
+    return decisions
+
+
+def make_reply(num_chars: int, rng: random.Random) -> str:
+    parts, size = ["<think>\n"], 0
+    while size < num_chars:
+        snippet = rng.choice(REASONING_SNIPPETS)
+        parts.append(snippet)
+        size += len(snippet)
+    parts.append("\n</think>\nFinal decision: [1 defect] [2 cooperate]")
+    return "".join(parts)
+
+
+def run(sizes, repeat: int, seed: int) -> list:
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        reply = make_reply(size, rng)
+        report = DecisionParser.parse(reply, PLAYER_ID, OPPONENTS)
+        assert report.decisions == legacy_parse(reply, PLAYER_ID, OPPONENTS), "parsers disagree on the effective decisions"
+        legacy = min(timeit.repeat(lambda: legacy_parse(reply, PLAYER_ID, OPPONENTS), number=repeat, repeat=3)) / repeat
+        single = min(timeit.repeat(lambda: DecisionParser.parse(reply, PLAYER_ID, OPPONENTS), number=repeat, repeat=3)) / repeat
+        results.append({
+            "reply_chars": len(reply),
+            "legacy_us": legacy * 1e6,
+            "single_pass_us": single * 1e6,
+            "speedup": legacy / single if single else float("inf"),
+            "tokens_scanned": report.tokens_scanned,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ThreePlayerIPD decision parser benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000, 64000], help="reasoning length in characters")
+    parser.add_argument("--repeat", type=int, default=1000, help="parses per timing run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="emit results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.seed)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'chars':>8} | {'findall (us)':>12} | {'single-pass (us)':>16} | {'speedup':>7} | {'tokens':>6}")
+    for r in results:
+        print(f"{r['reply_chars']:>8} | {r['legacy_us']:>12.2f} | {r['single_pass_us']:>16.2f} | {r['speedup']:>6.1f}x | {r['tokens_scanned']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Query latency of the results store (src/results_store.py) over many runs.
+
+Fills a temporary store with synthetic runs (several models, one run per model and day, a
+batch of episodes per env) and times the aggregate queries that read the trigger-maintained
+tables against the same aggregation computed from the raw episode table.
+
+Usage:
+    python benchmarks/bench_results_store.py
+    python benchmarks/bench_results_store.py --runs 5000 --episodes 50 --json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "src"))
+from results_store import ResultsStore  # noqa: E402
+
+ENVS = ["ColonelBlotto-v0", "ThreePlayerIPD-v0", "SecretMafia-v0", "Codenames-v0"]
+RAW_COMPARE = ("SELECT r.model, e.env_id, COUNT(*), AVG(e.outcome = 'win'), AVG(e.reward) "
+               "FROM episodes e JOIN runs r USING (run_id) GROUP BY r.model, e.env_id")
+
+
+def fill(store: ResultsStore, runs: int, episodes: int, models: int, seed: int):
+    rng = random.Random(seed)
+    now = time.time()
+    for i in range(runs):
+        model = f"model-{i % models}"
+        run_id = store.start_run(model=model, opponent="baseline")
+        skill = 0.3 + 0.4 * (i % models) / max(models - 1, 1)
+        for env_id in ENVS:
+            results = []
+            for episode in range(episodes):
+                win = rng.random() < skill
+                results.append({"seed": episode, "model_pids": (episode % 2,), "model_reward": 1.0 if win else -1.0,
+                                "opponent_reward": -1.0 if win else 1.0, "invalid_move": rng.random() < 0.02,
+                                "turn_count": rng.randint(3, 20), "duration_s": rng.uniform(1, 10)})
+            # one run per model and night, going back in time
+            store.add_episodes(run_id, env_id, results, created_at=now - 86400 * (i // models))
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Results store query benchmark")
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--episodes", type=int, default=25, help="episodes per run and env")
+    parser.add_argument("--models", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultsStore(os.path.join(tmp, "results.sqlite"))
+        start = time.perf_counter()
+        fill(store, args.runs, args.episodes, args.models, args.seed)
+        insert_s = time.perf_counter() - start
+        total = args.runs * args.episodes * len(ENVS)
+        recent = [run["run_id"] for run in store.runs(limit=100)]
+        results = {
+            "episodes": total,
+            "insert_episodes_per_s": total / insert_s,
+            "compare_ms": timed(lambda: store.compare(), args.repeat),
+            "compare_env_ms": timed(lambda: store.compare("SecretMafia-v0"), args.repeat),
+            "trend_ms": timed(lambda: store.trend("model-0"), args.repeat),
+            "summary_100_runs_ms": timed(lambda: store.summary(recent), args.repeat),
+            "raw_compare_ms": timed(lambda: store._conn().execute(RAW_COMPARE).fetchall(), args.repeat),
+        }
+
+    if args.json:
+        print(json.dumps({"config": vars(args), "results": results}, indent=2))
+        return
+    print(f"{results['episodes']} episodes in {args.runs} runs, inserted at {results['insert_episodes_per_s']:.0f} episodes/s")
+    for key, value in results.items():
+        if key.endswith("_ms"): print(f"  {key[:-3]:<22} {value:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark for the src/ entry points.
+
+Each measurement runs in a fresh interpreter, so it includes every import the
+entry point pulls in (this is what each worker process of a pool pays). The
+main target is `GameManager().list_available_games()`, which should stay under
+200 ms because textarena, gradio and the model backends are imported lazily.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --check      # exit 1 if a target is missed
+    python benchmarks/bench_startup.py --importtime           # show the slowest imports per entry point
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+# name -> (code run in a fresh interpreter, target in milliseconds or None)
+ENTRY_POINTS = {
+    "list_available_games": ("from game_manager import GameManager; GameManager().list_available_games()", 200.0),
+    "import_agent": ("import agent", 200.0),
+    "import_webui": ("import webui", None),
+    "python_baseline": ("pass", None),
+}
+
+
+def measure(code: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=SRC, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def slowest_imports(code: str, top: int = 5) -> list:
+    """ Parse `python -X importtime` output and return the imports with the largest cumulative time """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SRC, check=True, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return [{"module": name, "cumulative_ms": us / 1000} for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for src/ entry points")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--importtime", action="store_true", help="report the slowest imports per entry point")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if a target is missed")
+    parser.add_argument("--json", action="store_true", help="emit results as JSON")
+    args = parser.parse_args()
+
+    results, missed = [], []
+    for name, (code, target) in ENTRY_POINTS.items():
+        try:
+            timings = measure(code, args.runs)
+        except subprocess.CalledProcessError:
+            results.append({"entry_point": name, "error": "failed to import (missing dependency?)"})
+            continue
+        entry = {"entry_point": name, "median_ms": statistics.median(timings), "min_ms": min(timings), "target_ms": target}
+        if args.importtime: entry["slowest_imports"] = slowest_imports(code)
+        if target is not None and entry["median_ms"] > target: missed.append(name)
+        results.append(entry)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            if "error" in r:
+                print(f"{r['entry_point']:<22} {r['error']}")
+                continue
+            target = f"(target {r['target_ms']:.0f} ms)" if r["target_ms"] is not None else ""
+            print(f"{r['entry_point']:<22} median {r['median_ms']:7.1f} ms  min {r['min_ms']:7.1f} ms  {target}")
+            for imp in r.get("slowest_imports", []):
+                print(f"    {imp['cumulative_ms']:8.1f} ms  {imp['module']}")
+    if args.check and missed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
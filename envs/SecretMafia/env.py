@@ -103,14 +103,17 @@ class SecretMafiaEnv(ta.Env):
         "Doctor":    Doctor,
         "Detective": Detective,
     }
-    def __init__(self, mafia_ratio: float = 0.25, discussion_rounds: int = 3):
+    def __init__(self, mafia_ratio: float = 0.25, discussion_rounds: int = 3, simultaneous_discussion: bool = False):
         """
         Args:
             mafia_ratio (float): Ratio of Mafia members to total players (default: 0.25)
             discussion_rounds (int): The number of discussion rounds
+            simultaneous_discussion (bool): All alive players speak at once in each discussion round; the round's messages are revealed together when it ends (default: False).
+                ta.make("SecretMafia-v0") builds the installed env, which lacks this option; game_manager.register_local_envs() registers this class with it enabled as "SecretMafia-simdisc-v0".
         """
         self.mafia_ratio = mafia_ratio
         self.discussion_rounds = discussion_rounds
+        self.simultaneous_discussion = simultaneous_discussion
 
     def reset(self, num_players: int, seed: Optional[int] = None):
         assert 6 <= num_players <= 15, "Player count must be between 5 and 15."
@@ -127,6 +130,7 @@ class SecretMafiaEnv(ta.Env):
             "pending_elimination": None,
         }
         self.state.reset(game_state=game_state, player_prompt_function=self._prompt, secret_roles=self.player_roles)
+        self.discussion_buffer: List[Tuple[int, str]] = [] # (speaker, message) of the current round in simultaneous mode
         self._send_phase_prompts() # populate self.next_player_ids
         self.state.manually_set_current_player_id(self.next_player_ids.pop())
     
@@ -174,6 +178,9 @@ class SecretMafiaEnv(ta.Env):
             if next_phase == Phase.DAY_DISCUSSION:
                 self._resolve_night_outcome()
 
+        # Check if game has concluded
+        if self.state.done: return
+
         # Advance to next phase
         self.phase = self._compute_next_phase()
         self.state.game_state["phase"] = self.phase
@@ -218,7 +225,9 @@ class SecretMafiaEnv(ta.Env):
 
         elif self.phase == Phase.DAY_DISCUSSION:
             rounds = self.discussion_rounds
-            self.state.add_observation(to_id=-1, message=f"Day breaks. Discuss for {rounds} rounds, then a vote will follow.", observation_type=ta.ObservationType.GAME_MESSAGE)
+            message = f"Day breaks. Discuss for {rounds} rounds, then a vote will follow."
+            if self.simultaneous_discussion: message += " In each round everyone speaks at the same time; the round's messages are revealed together once all have spoken."
+            self.state.add_observation(to_id=-1, message=message, observation_type=ta.ObservationType.GAME_MESSAGE)
             players = random.sample(alive, k=len(alive))
             self.next_player_ids = players * rounds
 
@@ -227,7 +236,16 @@ class SecretMafiaEnv(ta.Env):
             self.state.add_observation(to_id=-1, message=f"Voting phase - submit one vote in format [X]. Valid: {opts}", observation_type=ta.ObservationType.GAME_MESSAGE)
             self.next_player_ids = random.sample(alive, k=len(alive))
 
-    def _handle_discussion(self, pid: int, action: str):    self.state.add_observation(from_id=pid, message=action, observation_type=ta.ObservationType.PLAYER_ACTION)
+    def _handle_discussion(self, pid: int, action: str):
+        if not self.simultaneous_discussion:
+            self.state.add_observation(from_id=pid, message=action, observation_type=ta.ObservationType.PLAYER_ACTION)
+            return
+        # simultaneous mode: hold the message until every alive player has spoken this round
+        self.discussion_buffer.append((pid, action))
+        if len(self.discussion_buffer) >= len(self.state.game_state["alive_players"]):
+            for speaker, message in self.discussion_buffer:
+                self.state.add_observation(from_id=speaker, message=message, observation_type=ta.ObservationType.PLAYER_ACTION)
+            self.discussion_buffer = []
     def _handle_day_vote(self, pid: int, action: str):      self._record_vote(pid, action, broadcast_to_all=True)
     def _handle_mafia_vote(self, pid: int, action: str):    self._record_vote(pid, action, broadcast_to_mafia_only=True)
     def _handle_doctor_action(self, pid: int, action: str):
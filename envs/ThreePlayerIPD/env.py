@@ -1,15 +1,70 @@
 import itertools, re
-from typing import Any, Dict, Optional, Tuple
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import textarena as ta
 
 
+@dataclass
+class DecisionReport:
+    """ Result of parsing one decision turn, including partial-credit diagnostics """
+    decisions: Dict[int, str] = field(default_factory=dict)   # opponent id -> "cooperate" / "defect" (the effective, i.e. last, token)
+    missing: List[int] = field(default_factory=list)          # opponents without any token (they default to "cooperate")
+    duplicates: Dict[int, int] = field(default_factory=dict)  # opponent id -> number of superseded earlier tokens
+    conflicts: List[int] = field(default_factory=list)        # opponents whose superseded tokens disagree with the effective one
+    ignored: List[int] = field(default_factory=list)          # well-formed tokens targeting self or unknown ids
+    tokens_scanned: int = 0
+
+    @property
+    def complete(self) -> bool: return not self.missing
+
+
+class DecisionParser:
+    """
+    Single-pass decision token parser that scans the message from the end.
+
+    The last token for an opponent is the one that counts (same as a left-to-right scan where later tokens overwrite earlier
+    ones), so scanning backwards lets us stop as soon as every opponent has a decision. Long chain-of-thought replies that end
+    with the final answer are therefore only read as far back as needed, and "thinking" tokens before the answer are never used.
+    Duplicates and conflicts are only reported for the part of the message that was actually scanned.
+
+    This module is the reference copy of the env; ta.make("ThreePlayerIPD-v0") loads the installed textarena env, so the
+    parser only runs when ThreePlayerIPDEnv from this file is instantiated directly.
+    """
+    token_pat = re.compile(r"\[\s*(\d+)\s+(cooperate|defect)\s*\]", re.I)
+
+    @classmethod
+    def parse(cls, msg: str, player_id: int, opponents: Iterable[int]) -> DecisionReport:
+        opponents = set(opponents)
+        pending = set(opponents)
+        report = DecisionReport()
+        end = len(msg)
+        while pending:
+            start = msg.rfind("[", 0, end)
+            if start < 0: break
+            end = start
+            m = cls.token_pat.match(msg, start)
+            if m is None: continue
+            report.tokens_scanned += 1
+            tgt, choice = int(m.group(1)), ("defect" if m.group(2).lower().startswith("d") else "cooperate")
+            if tgt == player_id or tgt not in opponents:
+                report.ignored.append(tgt)  # ignore bad ids / self-targets
+            elif tgt in report.decisions:
+                report.duplicates[tgt] = report.duplicates.get(tgt, 0) + 1
+                if choice != report.decisions[tgt] and tgt not in report.conflicts: report.conflicts.append(tgt)
+            else:
+                report.decisions[tgt] = choice
+                pending.discard(tgt)
+        report.missing = sorted(pending)
+        return report
+
+
 class ThreePlayerIPDEnv(ta.Env):
     def __init__(self, num_rounds: int=5, communication_turns: int=3, cooperate_reward: int=3, defect_reward: int=5, sucker_reward: int=0, mutual_defect_reward: int=1):
         self.num_rounds = num_rounds
         self.conversation_rounds = communication_turns
         self.R, self.T, self.S, self.P = (cooperate_reward, defect_reward, sucker_reward, mutual_defect_reward) # pay-off constants
-        self.token_pat = re.compile(r"\[\s*(\d+)\s+(cooperate|defect)\s*\]", re.I)
+        self.token_pat = DecisionParser.token_pat
 
     def reset(self, num_players: int, seed: Optional[int] = None):
         assert num_players == 3, f"Environment is hard-coded for exactly three players. Received {num_players} players on reset."
@@ -17,7 +72,7 @@ class ThreePlayerIPDEnv(ta.Env):
         game_state = {
             "round": 1, "num_rounds": self.num_rounds, "phase": "conversation", "conversation_round": 0, "total_conversation_rounds": self.conversation_rounds,
             "decisions": {p: {q: None for q in range(num_players) if q != p} for p in range(num_players)},
-            "scores": {p: 0 for p in range(num_players)}, "acted": {p: False for p in range(num_players)},
+            "scores": {p: 0 for p in range(num_players)}, "acted": {p: False for p in range(num_players)}, "decision_reports": {},
         }
         self.state.reset(game_state=game_state, player_prompt_function=self._prompt)
         self.state.add_observation(message=f"─── Starting Round {game_state['round']} ───\tYou can converse freely for the next {game_state['total_conversation_rounds']} rounds.", observation_type=ta.ObservationType.GAME_MESSAGE)
@@ -65,12 +120,10 @@ class ThreePlayerIPDEnv(ta.Env):
     def _decision_phase(self, msg: str):
         cid = self.state.current_player_id
         gs = self.state.game_state
-        # parse all valid tokens
-        for pid_str, choice in self.token_pat.findall(msg):
-            tgt = int(pid_str)
-            if tgt == cid or tgt not in gs["decisions"][cid]:
-                continue  # ignore bad ids / self-targets
-            gs["decisions"][cid][tgt] = ("defect" if choice.lower().startswith("d") else "cooperate")
+        # parse from the end of the message, stopping once every opponent has a decision
+        report = DecisionParser.parse(msg, player_id=cid, opponents=gs["decisions"][cid])
+        gs["decisions"][cid].update(report.decisions)
+        gs["decision_reports"][cid] = asdict(report)  # plain dict diagnostics; players see the same messages as before
         gs["acted"][cid] = True  # player has taken their decision turn
 
         # When every player has *acted* once, resolve round.
@@ -90,7 +143,7 @@ class ThreePlayerIPDEnv(ta.Env):
                 # reset for next round
                 gs.update({
                     "phase": "conversation", "conversation_round": 0, "acted": {p: False for p in range(self.state.num_players)},
-                    "decisions": { p: {q: None for q in range(self.state.num_players) if q != p} for p in range(self.state.num_players)},
+                    "decisions": { p: {q: None for q in range(self.state.num_players) if q != p} for p in range(self.state.num_players)}, "decision_reports": {},
                 })
                 self.state.add_observation(message=f"─── Starting Round {gs['round']} ───\tYou can converse freely for the next {gs['total_conversation_rounds']} rounds.", observation_type=ta.ObservationType.GAME_MESSAGE)
 
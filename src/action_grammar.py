@@ -0,0 +1,284 @@
+"""
+Shared action grammars for the competition games.
+
+Each game phase that expects a structured move has an ActionGrammar that
+mirrors the parsing and legality rules of the env (SecretMafiaEnv.voting_pattern,
+ThreePlayerIPDEnv.token_pat, ColonelBlottoEnv._parse_allocation_input and the
+Codenames clue/guess regexes). Agents use it to check a move locally before
+submitting it, and LLMAgent uses `prefix_matcher` for grammar-constrained
+decoding so local models cannot emit malformed moves.
+
+The registry is keyed by (env id, phase):
+
+    grammar = get_grammar("SecretMafia-v0", "Day-Voting")
+    grammar.check(observation, "[3]")   # None if legal, otherwise the reason
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Free text before the action (no "[" so the first bracket starts the action) and anything after it
+_PROSE = r"[^\[]*"
+_TAIL = r".*"
+
+
+class ActionGrammar:
+    """
+    One action format.
+
+    Attributes:
+        name (str): Format name, as used by Agent.action_format.
+        token_pattern (re.Pattern): Pattern of one action token.
+        tokens_needed (int): Number of distinct tokens (by first group) that make a complete action.
+        use_first (bool): For single-token formats, whether the env acts on the first token (re.search) instead of the last.
+    """
+    name: str = ""
+    token_pattern: "re.Pattern" = None
+    tokens_needed: int = 1
+    use_first: bool = False
+
+    def find(self, text: str) -> List["re.Match"]:
+        return list(self.token_pattern.finditer(text))
+
+    def is_complete(self, text: str) -> bool:
+        """ Check whether `text` contains a complete action """
+        if self.tokens_needed == 1: return self.token_pattern.search(text) is not None
+        return len({m.group(1) for m in self.token_pattern.finditer(text)}) >= self.tokens_needed
+
+    def extract(self, text: str) -> Optional[str]:
+        """
+        Return the action tokens in `text`, or None if there are none. Single-token formats return the token the env
+        would act on: the first one (`use_first`) or the last one.
+        """
+        matches = [m.group(0) for m in self.token_pattern.finditer(text)]
+        if not matches: return None
+        if self.tokens_needed > 1: return " ".join(matches)
+        return matches[0] if self.use_first else matches[-1]
+
+    def check(self, observation: str, action: str) -> Optional[str]:
+        """
+        Validate `action` against the format and the legal moves readable from `observation`.
+
+        Returns:
+            Optional[str]: None if the action is legal, otherwise the reason it would be rejected.
+        """
+        if not self.is_complete(action): return f"No complete {self.name} action found."
+        return self._check_legal(observation, action)
+
+    def is_valid(self, observation: str, action: str) -> bool:
+        return self.check(observation, action) is None
+
+    def _check_legal(self, observation: str, action: str) -> Optional[str]:
+        return None
+
+    def answer_pattern(self, observation: str) -> str:
+        """ Regex the whole visible answer must match, specialised to the legal moves in `observation` """
+        return _PROSE + self.token_pattern.pattern + _TAIL
+
+    def prefix_matcher(self, observation: str) -> Callable[[str], bool]:
+        """
+        Return `matches(text) -> bool` telling whether `text` can still be extended into a legal answer.
+
+        Requires the `regex` package (a dependency of transformers) for partial matching.
+        """
+        try:
+            import regex
+        except ImportError:
+            raise ImportError("Constrained decoding requires the regex package. Install it with: pip install regex")
+        compiled = regex.compile(self.answer_pattern(observation), regex.IGNORECASE | regex.DOTALL)
+        return lambda text: compiled.fullmatch(text, partial=True) is not None
+
+
+def _player_id(observation: str) -> Optional[int]:
+    match = re.search(r"You are Player (\d+)", observation)
+    return int(match.group(1)) if match else None
+
+
+class IPDDecisionGrammar(ActionGrammar):
+    """ ThreePlayerIPD decision phase: one `[<opponent> cooperate|defect]` token per opponent """
+    name = "ipd_decision"
+    token_pattern = re.compile(r"\[\s*(\d+)\s+(cooperate|defect)\s*\]", re.IGNORECASE)
+    tokens_needed = 2
+    num_players = 3
+
+    def opponents(self, observation: str) -> Optional[List[int]]:
+        me = _player_id(observation)
+        return None if me is None else [q for q in range(self.num_players) if q != me]
+
+    def _check_legal(self, observation, action):
+        opponents = self.opponents(observation)
+        if opponents is None: return None
+        named = {int(m.group(1)) for m in self.token_pattern.finditer(action)}
+        missing = sorted(set(opponents) - named)
+        if missing: return f"No decision found for Player(s) {', '.join(map(str, missing))}."
+        return None
+
+    def answer_pattern(self, observation):
+        opponents = self.opponents(observation)
+        if opponents is None: return super().answer_pattern(observation)
+        token = lambda q: rf"\[\s*{q}\s+(?:cooperate|defect)\s*\]"
+        first, second = opponents
+        return _PROSE + f"(?:{token(first)}{_PROSE}{token(second)}|{token(second)}{_PROSE}{token(first)})" + _TAIL
+
+
+class BlottoAllocationGrammar(ActionGrammar):
+    """ ColonelBlotto allocation: `[A4 B2 C2]`, each field at most once, at most the available units in total """
+    name = "blotto_allocation"
+    token_pattern = re.compile(r"\[\s*(?:[A-Za-z]\s*:?\s*\d+[\s,]*)+\]")
+    field_pattern = re.compile(r"([A-Za-z])\s*:?\s*(\d+)")
+    use_first = True  # the env parses the first bracket
+
+    @staticmethod
+    def fields(observation: str) -> Optional[List[str]]:
+        found = re.findall(r"Available fields: ([A-Z](?:, [A-Z])*)", observation)
+        return found[-1].split(", ") if found else None
+
+    @staticmethod
+    def units(observation: str) -> Optional[int]:
+        found = re.findall(r"Units to allocate: (\d+)", observation)
+        return int(found[-1]) if found else None
+
+    def parse(self, action: str) -> Optional[Dict[str, int]]:
+        """ Parse the first allocation token like ColonelBlottoEnv._parse_allocation_input; None on duplicates """
+        token = self.extract(action)
+        if token is None: return None
+        allocation: Dict[str, int] = {}
+        for name, units in self.field_pattern.findall(token):
+            if name.upper() in allocation: return None
+            allocation[name.upper()] = int(units)
+        return allocation
+
+    def _check_legal(self, observation, action):
+        allocation = self.parse(action)
+        if allocation is None: return "Invalid input format. Use: A:5, B:10, C:5"
+        fields, units = self.fields(observation), self.units(observation)
+        if fields is not None and any(f not in fields for f in allocation): return f"Invalid field name(s). Valid fields: {', '.join(fields)}"
+        if units is not None and sum(allocation.values()) > units: return f"You cannot allocate more than {units} units. Current sum: {sum(allocation.values())}"
+        return None
+
+    def answer_pattern(self, observation):
+        fields = self.fields(observation)
+        field = f"[{''.join(fields)}]" if fields else "[A-Za-z]"
+        return _PROSE + rf"\[\s*(?:{field}\s*:?\s*\d+[\s,]*)+\]" + _TAIL
+
+
+class MafiaVoteGrammar(ActionGrammar):
+    """ SecretMafia votes and night actions: `[X]` with X among the listed targets """
+    name = "mafia_vote"
+    token_pattern = re.compile(r"\[(?:player\s*)?(\d+)\]", re.IGNORECASE)
+
+    @staticmethod
+    def targets(observation: str) -> Optional[List[str]]:
+        start = max(observation.rfind("Valid"), observation.rfind("protect:"), observation.rfind("investigate:"))
+        if start == -1: return None
+        return re.findall(r"\[(\d+)\]", observation[start:].split("\n")[0]) or None
+
+    def _check_legal(self, observation, action):
+        targets = self.targets(observation)
+        target = self.token_pattern.findall(action)[-1]  # the env's greedy pattern picks the last bracket
+        if targets is not None and target not in targets: return f"Invalid target [{target}]. Valid: {', '.join(f'[{t}]' for t in targets)}"
+        return None
+
+    def answer_pattern(self, observation):
+        targets = self.targets(observation)
+        target = "|".join(targets) if targets else r"\d+"
+        return _PROSE + rf"\[(?:player\s*)?(?:{target})\]" + _TAIL
+
+
+class CodenamesClueGrammar(ActionGrammar):
+    """ Codenames spymaster: `[word N]`, the word must not overlap any board word """
+    name = "codenames_clue"
+    token_pattern = re.compile(r"\[(\w+)\s+(\d+)\]")
+    use_first = True  # the env uses re.search, i.e. the first clue token
+
+    @staticmethod
+    def board(observation: str) -> Dict[str, str]:
+        """ Map each board word to its label in the latest board view ("" if unlabelled) """
+        start = observation.rfind("Codenames Words:\n")
+        if start == -1: return {}
+        words = {}
+        for line in observation[start + len("Codenames Words:\n"):].split("\n"):
+            match = re.match(r"(\w+)[ \t]*(.*)$", line)
+            if match is None: break
+            words[match.group(1).lower()] = match.group(2).strip()
+        return words
+
+    def _check_legal(self, observation, action):
+        word = self.token_pattern.search(action).group(1)  # the env uses the first clue token
+        if any(word in board_word or board_word in word for board_word in self.board(observation)):
+            return f"Clue [{word}] is a subset/ exact match of a word on the board."
+        return None
+
+
+class CodenamesGuessGrammar(ActionGrammar):
+    """ Codenames operative: `[word]` for an unrevealed board word, or `[pass]` """
+    name = "codenames_guess"
+    token_pattern = re.compile(r"\[(\w+)\]")
+    use_first = True  # the env uses re.search, i.e. the first guess token
+
+    @staticmethod
+    def unrevealed(observation: str) -> List[str]:
+        return [w for w, label in CodenamesClueGrammar.board(observation).items() if not label]
+
+    def _check_legal(self, observation, action):
+        word = self.token_pattern.search(action).group(1).lower()  # the env uses the first guess token
+        board = CodenamesClueGrammar.board(observation)
+        if word == "pass" or not board: return None
+        if word not in board: return "Invalid move. Word is not on the board."
+        if board[word]: return "Word has already been guessed."
+        return None
+
+    def answer_pattern(self, observation):
+        words = self.unrevealed(observation)
+        if not words: return super().answer_pattern(observation)
+        return _PROSE + rf"\[(?:{'|'.join(map(re.escape, words + ['pass']))})\]" + _TAIL
+
+
+GRAMMARS: Dict[str, ActionGrammar] = {g.name: g for g in (
+    IPDDecisionGrammar(), BlottoAllocationGrammar(), MafiaVoteGrammar(), CodenamesClueGrammar(), CodenamesGuessGrammar()
+)}
+
+# (env id, phase) -> format name; None marks free-text phases
+PHASE_FORMATS: Dict[Tuple[str, str], Optional[str]] = {
+    ("ThreePlayerIPD-v0", "conversation"): None,
+    ("ThreePlayerIPD-v0", "decision"): "ipd_decision",
+    ("ColonelBlotto-v0", "allocation"): "blotto_allocation",
+    ("SecretMafia-v0", "Day-Discussion"): None,
+    ("SecretMafia-v0", "Day-Voting"): "mafia_vote",
+    ("SecretMafia-v0", "Night-Mafia"): "mafia_vote",
+    ("SecretMafia-v0", "Night-Doctor"): "mafia_vote",
+    ("SecretMafia-v0", "Night-Detective"): "mafia_vote",
+    ("Codenames-v0", "clue"): "codenames_clue",
+    ("Codenames-v0", "guess"): "codenames_guess",
+}
+
+UNKNOWN_PHASE = ("unknown", "unknown")
+
+# Markers in the observation text that announce the current (env id, phase); the marker that occurs last wins
+_PHASE_MARKERS: Tuple[Tuple[str, Tuple[str, str]], ...] = (
+    ("Submit your decisions, one token per opponent", ("ThreePlayerIPD-v0", "decision")),
+    ("You can converse freely for the next", ("ThreePlayerIPD-v0", "conversation")),
+    ("Format: '[A4 B2 C2]'", ("ColonelBlotto-v0", "allocation")),
+    ("Voting phase - submit one vote", ("SecretMafia-v0", "Day-Voting")),
+    ("Mafia, agree on a victim", ("SecretMafia-v0", "Night-Mafia")),
+    ("choose one player to protect", ("SecretMafia-v0", "Night-Doctor")),
+    ("choose one player to investigate", ("SecretMafia-v0", "Night-Detective")),
+    ("Day breaks. Discuss", ("SecretMafia-v0", "Day-Discussion")),
+    ("the Spymaster for", ("Codenames-v0", "clue")),
+    ("the Operative for", ("Codenames-v0", "guess")),
+)
+
+
+def detect_phase(observation: str) -> Tuple[str, str]:
+    """ Guess (env id, phase) from the observation text; UNKNOWN_PHASE if no marker is found """
+    best_pos, best_phase = -1, UNKNOWN_PHASE
+    for marker, phase in _PHASE_MARKERS:
+        pos = observation.rfind(marker)
+        if pos > best_pos:
+            best_pos, best_phase = pos, phase
+    return best_phase
+
+
+def get_grammar(env_id: str, phase: str) -> Optional[ActionGrammar]:
+    """ Return the grammar for (env id, phase), or None for free-text and unknown phases """
+    name = PHASE_FORMATS.get((env_id, phase))
+    return GRAMMARS[name] if name is not None else None
@@ -1,9 +1,215 @@
 from abc import ABC, abstractmethod
 import os
-from typing import Dict, Optional, Any, List, Union
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Any, List, Union, Tuple, Generator
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from action_grammar import GRAMMARS, PHASE_FORMATS, detect_phase
+from resilience import ResilientCaller
 
 STANDARD_GAME_PROMPT = "You are a competitive game player. Make sure you read the game instructions carefully, and always follow the required format."
 
+# Reasoning spans emitted by reasoning models (e.g. DeepSeek-R1) that should never reach the environment
+REASONING_TAGS: Tuple[Tuple[str, str], ...] = (("<think>", "</think>"), ("<reasoning>", "</reasoning>"))
+
+# Game-specific action formats: (pattern of one complete action token, number of tokens that make a complete action).
+# Derived from the shared grammar registry in action_grammar.py.
+ACTION_FORMATS: Dict[str, Tuple["re.Pattern", int]] = {name: (g.token_pattern, g.tokens_needed) for name, g in GRAMMARS.items()}
+
+# Stop sequences for API models, per action format. The API drops the stop sequence from the output, so it is re-appended.
+# "ipd_decision" needs one token per opponent and therefore relies on StoppingCriteria / streaming instead.
+STOP_SEQUENCES: Dict[str, List[str]] = {
+    "blotto_allocation": ["]"],
+    "mafia_vote":        ["]"],
+    "codenames_clue":    ["]"],
+    "codenames_guess":   ["]"],
+}
+
+# When a stop sequence cuts the output inside a reasoning span, the partial output is sent back as an assistant turn with
+# this prompt, so the model continues instead of regenerating its reasoning. After MAX_STOP_CONTINUATIONS continuations
+# with stop sequences, a last one is requested without them.
+CONTINUE_PROMPT = "Continue your previous response exactly where it stopped. Do not repeat any of it."
+MAX_STOP_CONTINUATIONS = 2
+
+class AgentError(RuntimeError):
+    """
+    Raised by an agent that could not produce an action (e.g. API retries or the turn budget ran out).
+
+    The error text must never reach the env as a move; callers substitute a fallback action (see GameManager).
+    """
+
+
+# Value of Agent.action_format meaning "infer the format from the observation text"
+AUTO_ACTION_FORMAT = "auto"
+
+
+def detect_action_format(observation: str) -> Optional[str]:
+    """
+    Guess the action format expected for the next move from the observation text.
+
+    Args:
+        observation (str): The observation passed to the agent.
+
+    Returns:
+        Optional[str]: A key of ACTION_FORMATS, or None when the current phase expects free text.
+    """
+    return PHASE_FORMATS.get(detect_phase(observation))
+
+
+def validate_action(observation: str, action: str, action_format: Optional[str]) -> bool:
+    """ Check that `action` is well-formed for `action_format` and legal in the current observation (see ActionGrammar.check) """
+    if action_format is None: return bool(action.strip())
+    return GRAMMARS[action_format].is_valid(observation, action)
+
+
+def is_complete_action(text: str, action_format: Optional[str]) -> bool:
+    """ Check whether `text` contains a complete action of the given format (free text is always complete) """
+    if action_format is None: return bool(text.strip())
+    return GRAMMARS[action_format].is_complete(text)
+
+
+def strip_reasoning(text: str, tags: Tuple[Tuple[str, str], ...] = REASONING_TAGS) -> str:
+    """
+    Remove reasoning spans from a complete response.
+
+    Unterminated spans are dropped up to the end of the text. A closing tag without an opening tag (chat templates
+    that pre-fill "<think>") drops everything before it.
+    """
+    for open_tag, close_tag in tags:
+        orphan = text.find(close_tag)
+        if orphan != -1 and text.rfind(open_tag, 0, orphan) == -1:
+            text = text[orphan + len(close_tag):]
+        while True:
+            start = text.find(open_tag)
+            if start == -1: break
+            end = text.find(close_tag, start + len(open_tag))
+            text = text[:start] if end == -1 else text[:start] + text[end + len(close_tag):]
+    return text.strip()
+
+
+class ReasoningStripper:
+    """
+    Streaming filter that removes reasoning spans from text arriving in chunks.
+
+    With `starts_in_reasoning` the stream is taken to begin inside a span, for chat templates that pre-fill the
+    opening tag (e.g. DeepSeek-R1's "<think>"), so everything up to the first closing tag is reasoning.
+    """
+    def __init__(self, tags: Tuple[Tuple[str, str], ...] = REASONING_TAGS, starts_in_reasoning: bool = False):
+        self.tags = tags
+        self._close_tag: Optional[str] = tags[0][1] if starts_in_reasoning else None  # set while inside a reasoning span
+        self._pending = ""                     # tail that could still be the start of a tag
+        self._max_tag = max(len(t) for pair in tags for t in pair)
+
+    @property
+    def in_reasoning(self) -> bool: return self._close_tag is not None
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk and return the newly visible (non-reasoning) text.
+
+        Args:
+            chunk (str): The next piece of generated text.
+
+        Returns:
+            str: Visible text that can be emitted now; a possible partial tag at the end is held back.
+        """
+        buf, out = self._pending + chunk, []
+        while buf:
+            if self._close_tag is not None:
+                end = buf.find(self._close_tag)
+                if end == -1:
+                    keep = len(self._close_tag) - 1
+                    self._pending = buf[-keep:] if keep else ""
+                    return "".join(out)
+                buf = buf[end + len(self._close_tag):]
+                self._close_tag = None
+                continue
+            hits = [(buf.find(open_tag), open_tag, close_tag) for open_tag, close_tag in self.tags if open_tag in buf]
+            if hits:
+                start, open_tag, close_tag = min(hits)
+                out.append(buf[:start])
+                buf = buf[start + len(open_tag):]
+                self._close_tag = close_tag
+                continue
+            # hold back anything that might be the beginning of an opening tag
+            cut = len(buf)
+            lt = buf.rfind("<", max(0, len(buf) - self._max_tag))
+            if lt != -1 and any(open_tag.startswith(buf[lt:]) for open_tag, _ in self.tags): cut = lt
+            out.append(buf[:cut])
+            self._pending = buf[cut:]
+            return "".join(out)
+        self._pending = ""
+        return "".join(out)
+
+    def flush(self) -> str:
+        """ Return any held-back visible text at the end of the stream """
+        pending, self._pending = self._pending, ""
+        return "" if self._close_tag is not None else pending
+
+
+class ResponsePostProcessor:
+    """
+    Post-processing stage between the model output and the environment.
+
+    Strips reasoning spans (incrementally, so it can run on a token stream) and extracts the game-specific action from
+    the visible answer. `done` turns True as soon as the visible text contains a complete action, which generation loops
+    use to stop decoding early. Set `starts_in_reasoning` when the chat template pre-fills the opening reasoning tag.
+    """
+    def __init__(self, action_format: Optional[str] = None, tags: Tuple[Tuple[str, str], ...] = REASONING_TAGS,
+                 starts_in_reasoning: bool = False):
+        if action_format is not None and action_format not in ACTION_FORMATS:
+            raise ValueError(f"Unknown action format: {action_format}. Known formats: {', '.join(ACTION_FORMATS)}")
+        self.action_format = action_format
+        self.tags = tags
+        self.starts_in_reasoning = starts_in_reasoning
+        self._stripper = ReasoningStripper(tags, starts_in_reasoning)
+        self._raw: List[str] = []
+        self._visible: List[str] = []
+        self.done = False
+
+    @classmethod
+    def for_observation(cls, observation: str, action_format: Optional[str] = AUTO_ACTION_FORMAT) -> "ResponsePostProcessor":
+        return cls(action_format=detect_action_format(observation) if action_format == AUTO_ACTION_FORMAT else action_format)
+
+    def feed(self, chunk: str) -> str:
+        """ Consume a chunk of generated text, update `done`, and return the newly visible text """
+        self._raw.append(chunk)
+        visible = self._stripper.feed(chunk)
+        if visible: self._visible.append(visible)
+        # only an action after the reasoning has closed counts; a "[...]" inside reasoning is never one
+        if self.action_format is not None and not self.done and self._visible and not self._stripper.in_reasoning:
+            self.done = self._is_complete("".join(self._visible))
+        return visible
+
+    def flush(self) -> str:
+        """ Return visible text that was held back at the end of the stream """
+        tail = self._stripper.flush()
+        if tail: self._visible.append(tail)
+        return tail
+
+    def _is_complete(self, text: str) -> bool:
+        return is_complete_action(text, self.action_format)
+
+    def extract(self, text: str) -> str:
+        """ Extract the action from visible text; falls back to the visible text when no action token is found """
+        if self.action_format is None: return text
+        action = GRAMMARS[self.action_format].extract(text)
+        return text if action is None else action
+
+    def finalize(self) -> str:
+        """ Return the action for the complete response fed so far """
+        prefill = self.tags[0][0] if self.starts_in_reasoning else ""  # an unterminated pre-filled span is dropped
+        return self.extract(strip_reasoning(prefill + "".join(self._raw), self.tags))
+
+    def process(self, text: str) -> str:
+        """ Non-streaming convenience: post-process a complete response """
+        self.feed(text)
+        return self.finalize()
+
 # Global OpenAI client
 _openai_client = None
 
@@ -48,8 +254,78 @@ class OpenAIConfig:
     def set_openai_base_url(self, base_url):
         self._openai_base_url = base_url
 
+class CancelTokens:
+    """ Per-call cancellation events of one agent: `cancel_all()` stops the calls in flight without affecting later calls """
+    def __init__(self):
+        self._active = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def token(self, cancel_event: Optional[threading.Event] = None):
+        """ Register the event of one call (a fresh one unless the caller passes its own) for its duration """
+        event = cancel_event if cancel_event is not None else threading.Event()
+        with self._lock:
+            self._active.add(event)
+        try:
+            yield event
+        finally:
+            with self._lock:
+                self._active.discard(event)
+
+    def cancel_all(self):
+        with self._lock:
+            for event in self._active: event.set()
+
+
+_CALL_CONTEXT = threading.local()
+
+
+def call_values() -> Dict[str, Any]:
+    """ The per-call values set with call_context() in the current thread """
+    return getattr(_CALL_CONTEXT, "values", {})
+
+
+@contextmanager
+def call_context(**values):
+    """
+    Per-call inputs (`action_format`, `state_view`) for every agent called by the current thread inside the block.
+
+    Callers that know the env and phase (GameManager, AnytimeAgent, CascadeAgent) pass them this way instead of setting
+    attributes on agents they do not own, so an agent shared between threads or seats never sees another call's values
+    and keeps no stale ones afterwards. They take precedence over the agent's own attributes.
+    """
+    previous = call_values()
+    _CALL_CONTEXT.values = {**previous, **values}
+    try:
+        yield
+    finally:
+        _CALL_CONTEXT.values = previous
+
+
 class Agent(ABC):
     """ Generic agent class that defines the basic structure of an agent """
+    # Expected action format when no call_context() provides one: AUTO_ACTION_FORMAT infers it from the observation,
+    # None means free text.
+    action_format: Optional[str] = AUTO_ACTION_FORMAT
+    # Agents that set `uses_state_view = True` receive a typed, player-visible snapshot of the game state
+    # (see game_state_views.py) in `state_view` for each call, so they can skip parsing the observation text.
+    uses_state_view: bool = False
+
+    @property
+    def state_view(self) -> Optional[Any]:
+        """ The state view of the current call (see call_context), else one assigned to the agent """
+        return call_values().get("state_view", self.__dict__.get("_state_view"))
+
+    @state_view.setter
+    def state_view(self, value: Optional[Any]):
+        self._state_view = value
+
+    def resolve_action_format(self, observation: str) -> Optional[str]:
+        """ Return the action format for this observation: the current call's, else `action_format` (AUTO infers it) """
+        action_format = call_values().get("action_format", self.action_format)
+        if action_format == AUTO_ACTION_FORMAT: return detect_action_format(observation)
+        return action_format
+
     @abstractmethod
     def __call__(self, observation: str) -> str:
         """
@@ -63,9 +339,103 @@ class Agent(ABC):
         """
         pass
 
+    def stream(self, observation: str, cancel_event: Optional[threading.Event] = None) -> Generator[str, None, str]:
+        """
+        Stream the response as it is generated.
+
+        Yields text chunks and returns the final action (available as `StopIteration.value`). Agents without native
+        streaming yield their complete response as a single chunk.
+
+        Args:
+            observation (str): The input string to process.
+            cancel_event (threading.Event, optional): Set by the caller to stop this call early; agents without
+                native streaming ignore it.
+        """
+        action = self(observation)
+        yield action
+        return action
+
+def _action_stopping_criteria(tokenizer, postprocessor: Optional[ResponsePostProcessor], cancel_event: Optional[threading.Event] = None):
+    """
+    Build a transformers StoppingCriteriaList that halts decoding once `postprocessor` has seen a complete action after
+    any reasoning has closed (see ResponsePostProcessor.done), or once `cancel_event` is set.
+    """
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class ActionCompleteCriteria(StoppingCriteria):
+        def __init__(self):
+            self.prompt_length = None
+            self.seen = 0
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if cancel_event is not None and cancel_event.is_set():
+                return torch.ones((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+            if postprocessor is None:
+                return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
+            if self.prompt_length is None: self.prompt_length = input_ids.shape[1] - 1  # first call happens after one new token
+            # actions and reasoning tags end with "]" / ">", so only re-decode when such a token was produced
+            if any(c in tokenizer.decode(input_ids[0, -1:], skip_special_tokens=True) for c in "]>"):
+                text = tokenizer.decode(input_ids[0, self.prompt_length:], skip_special_tokens=True)
+                postprocessor.feed(text[self.seen:])
+                self.seen = len(text)
+            return torch.full((input_ids.shape[0],), postprocessor.done, dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([ActionCompleteCriteria()])
+
+
+def _grammar_logits_processor(tokenizer, grammar, observation: str, top_k: int = 32, tags: Tuple[Tuple[str, str], ...] = REASONING_TAGS,
+                              starts_in_reasoning: bool = False):
+    """
+    Build a transformers LogitsProcessorList that keeps the visible answer inside `grammar`.
+
+    Reasoning spans are left unconstrained. Outside them, only the `top_k` most likely candidates are checked against
+    the grammar's prefix matcher and all other tokens are masked, so the cost per step is `top_k` partial regex
+    matches on the (short) visible answer. End-of-sequence is only allowed once the action is complete. If none of
+    the candidates fits, the step is left unconstrained rather than forcing an unlikely token. Set
+    `starts_in_reasoning` when the chat template already opened the reasoning span in the prompt.
+    """
+    import torch
+    from transformers import LogitsProcessor, LogitsProcessorList
+
+    matches = grammar.prefix_matcher(observation)
+
+    class GrammarLogitsProcessor(LogitsProcessor):
+        def __init__(self):
+            self.prompt_length = None
+            self.strippers: List[ReasoningStripper] = []
+            self.visible: List[str] = []
+
+        def __call__(self, input_ids, scores):
+            if self.prompt_length is None:
+                self.prompt_length = input_ids.shape[1]
+                self.strippers = [ReasoningStripper(tags, starts_in_reasoning) for _ in range(input_ids.shape[0])]
+                self.visible = ["" for _ in range(input_ids.shape[0])]
+            elif input_ids.shape[1] > self.prompt_length:
+                for row in range(input_ids.shape[0]):  # decode only the newest token of each row
+                    self.visible[row] += self.strippers[row].feed(tokenizer.decode(input_ids[row, -1:], skip_special_tokens=True))
+            for row in range(input_ids.shape[0]):
+                if self.strippers[row].in_reasoning: continue
+                visible = self.visible[row]
+                candidates = torch.topk(scores[row], min(top_k, scores.shape[-1])).indices.tolist()
+                allowed = []
+                for token_id in candidates:
+                    if token_id == tokenizer.eos_token_id: ok = grammar.is_complete(visible)
+                    else: ok = matches(visible + tokenizer.decode([token_id], skip_special_tokens=True))
+                    if ok: allowed.append(token_id)
+                if allowed:
+                    masked = torch.full_like(scores[row], float("-inf"))
+                    masked[allowed] = scores[row, allowed]
+                    scores[row] = masked
+            return scores
+
+    return LogitsProcessorList([GrammarLogitsProcessor()])
+
+
 class LLMAgent(Agent):
     def __init__(self, model_name: str, device: str = "auto", quantize: bool = False, max_new_tokens: int = 1024,
-                 hf_kwargs: dict = None,):
+                 hf_kwargs: dict = None, postprocess: bool = True, early_stop: bool = True, constrained_decoding: bool = False,
+                 grammar_top_k: int = 32, reasoning_prefilled: bool = False):
         """
         Initialize the Hugging Face local agent.
         
@@ -73,6 +443,11 @@ class LLMAgent(Agent):
             model_name (str): The name of the model.
             device (str): Device to use for model inference (default: "auto").
             quantize (bool): Whether to load the model in 8-bit quantized format (default: False).
+            postprocess (bool): Strip reasoning spans and extract the game action from the response (default: True).
+            early_stop (bool): Stop decoding once a complete action has been generated (default: True, requires postprocess).
+            constrained_decoding (bool): Restrict the visible answer to the action grammar of the current phase (default: False).
+            grammar_top_k (int): Candidates checked against the grammar per decoding step (default: 32).
+            reasoning_prefilled (bool): The prompt ends with an opening reasoning tag, so generation starts inside reasoning (default: False).
         """
         super().__init__()
         
@@ -81,11 +456,19 @@ class LLMAgent(Agent):
         except ImportError:
             raise ImportError("Transformers library is required. Install it with: pip install transformers")
             
+        hf_kwargs = hf_kwargs or {}
+        self.postprocess = postprocess
+        self.early_stop = early_stop
+        self.constrained_decoding = constrained_decoding
+        self.grammar_top_k = grammar_top_k
+        self.reasoning_prefilled = reasoning_prefilled
+        self._cancel_tokens = CancelTokens()
         ## Initialize the Hugging Face model and tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         if quantize: self.model = AutoModelForCausalLM.from_pretrained(model_name, load_in_8bit=True, device_map=device, **hf_kwargs)
         else: self.model = AutoModelForCausalLM.from_pretrained(model_name, device_map=device, **hf_kwargs)
         self.system_prompt = STANDARD_GAME_PROMPT
+        self.max_new_tokens = max_new_tokens
         self.pipeline = pipeline('text-generation', max_new_tokens=max_new_tokens, model=self.model, tokenizer=self.tokenizer) ## Initialize the Hugging Face pipeline
     
     def __call__(self, observation: str) -> str:
@@ -99,17 +482,76 @@ class LLMAgent(Agent):
             str: The response generated by the model.
         """
         try: # Generate a response
-            response = self.pipeline(self.system_prompt+"\n"+observation, num_return_sequences=1, return_full_text=False)
+            postprocessor = self._postprocessor(self.resolve_action_format(observation)) if self.postprocess else None
+            early_stop = postprocessor is not None and self.early_stop and postprocessor.action_format is not None
+            with self._cancel_tokens.token() as cancel_event:
+                generate_kwargs = {"stopping_criteria": _action_stopping_criteria(self.tokenizer, postprocessor if early_stop else None, cancel_event)}
+                generate_kwargs.update(self._grammar_kwargs(observation, postprocessor.action_format if postprocessor is not None else self.resolve_action_format(observation)))
+                response = self.pipeline(self.system_prompt+"\n"+observation, num_return_sequences=1, return_full_text=False, **generate_kwargs)
             action = response[0]['generated_text'].strip() # Extract and return the text output
+            if postprocessor is not None:
+                action = self._postprocessor(postprocessor.action_format).process(action)
             return action
         except Exception as e:
             return f"An error occurred: {e}"
 
+    def stream(self, observation: str, cancel_event: Optional[threading.Event] = None) -> Generator[str, None, str]:
+        """
+        Stream the response token by token through a TextIteratorStreamer.
+
+        Yields visible text (reasoning spans removed when postprocess is enabled) and returns the final action.
+        Decoding stops at the next step once `cancel_event` is set.
+        """
+        from threading import Thread
+        from transformers import TextIteratorStreamer
+
+        action_format = self.resolve_action_format(observation) if self.postprocess else None
+        postprocessor = self._postprocessor(action_format) if self.postprocess else None
+        try:
+            inputs = self.tokenizer(self.system_prompt+"\n"+observation, return_tensors="pt").to(self.model.device)
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            early_stop = self.early_stop and action_format is not None
+            chunks = []
+            with self._cancel_tokens.token(cancel_event) as cancel_event:
+                generate_kwargs = dict(**inputs, streamer=streamer, max_new_tokens=self.max_new_tokens,
+                                       stopping_criteria=_action_stopping_criteria(self.tokenizer, self._postprocessor(action_format) if early_stop else None, cancel_event),
+                                       **self._grammar_kwargs(observation, action_format if self.postprocess else self.resolve_action_format(observation)))
+                thread = Thread(target=self.model.generate, kwargs=generate_kwargs, daemon=True)
+                thread.start()
+                for text in streamer:
+                    chunks.append(text)
+                    visible = postprocessor.feed(text) if postprocessor is not None else text
+                    if visible: yield visible
+                thread.join()
+            if postprocessor is not None:
+                tail = postprocessor.flush()
+                if tail: yield tail
+                return postprocessor.finalize()
+            return "".join(chunks).strip()
+        except Exception as e:
+            return f"An error occurred: {e}"
+
+    def _postprocessor(self, action_format: Optional[str]) -> ResponsePostProcessor:
+        return ResponsePostProcessor(action_format=action_format, starts_in_reasoning=self.reasoning_prefilled)
+
+    def _grammar_kwargs(self, observation: str, action_format: Optional[str]) -> Dict[str, Any]:
+        """ Generation kwargs for grammar-constrained decoding of the current phase (empty for free text) """
+        if not self.constrained_decoding or action_format is None: return {}
+        return {"logits_processor": _grammar_logits_processor(self.tokenizer, GRAMMARS[action_format], observation, self.grammar_top_k,
+                                                                starts_in_reasoning=self.reasoning_prefilled)}
+
+    def cancel(self):
+        """ Ask all running generations of this agent to stop at the next decoding step """
+        self._cancel_tokens.cancel_all()
+
 
 
 class OpenAIAgent(Agent):
     """ OpenAI API-based agent class """
-    def __init__(self, model_name: str = None, api_key: str = None, base_url: str = None, api_type: str = None):
+    def __init__(self, model_name: str = None, api_key: str = None, base_url: str = None, api_type: str = None,
+                 postprocess: bool = True, use_stop_sequences: bool = True, rate_limit: Optional[float] = None,
+                 max_retries: int = 4, turn_timeout: Optional[float] = None, hedge_base_url: Optional[str] = None,
+                 reasoning_prefilled: bool = False):
         """
         Initialize the OpenAI API agent.
         
@@ -118,6 +560,14 @@ class OpenAIAgent(Agent):
             api_key (str, optional): OpenAI API key.
             base_url (str, optional): OpenAI API base URL.
             api_type (str, optional): API type ('azure_key' for Azure OpenAI).
+            postprocess (bool): Strip reasoning spans and extract the game action from the response (default: True).
+            use_stop_sequences (bool): Send per-game stop sequences so decoding halts after the action (default: True, requires postprocess).
+            rate_limit (float, optional): Requests per second allowed on the endpoint, shared by all agents using the same base URL;
+                also applied to the hedge endpoint, which has its own bucket.
+            max_retries (int): Retries for transient errors (429, 5xx, timeouts) with exponential backoff and jitter (default: 4).
+            turn_timeout (float, optional): Time budget of one turn in seconds; retries and backoff never exceed it.
+            hedge_base_url (str, optional): Second endpoint that receives a duplicate request once the primary is slower than its p95 latency.
+            reasoning_prefilled (bool): The server's chat template pre-fills "<think>" (e.g. DeepSeek-R1), so responses start inside reasoning and only close it (default: False).
         """
         super().__init__()
         
@@ -146,29 +596,44 @@ class OpenAIAgent(Agent):
             self.config._openai_api_key = "123"
         
         self.system_prompt = STANDARD_GAME_PROMPT
+        self.postprocess = postprocess
+        self.use_stop_sequences = use_stop_sequences
+        self.reasoning_prefilled = reasoning_prefilled
+        
+        self.turn_timeout = turn_timeout
+        self._cancel_tokens = CancelTokens()
+        # 停止序列落在推理片段内时的续写请求次数
+        self.stats = {"stop_continuations": 0}
+        self._stats_lock = threading.Lock()
         
-        # 创建OpenAI客户端
+        # 创建OpenAI客户端，重试由请求层统一处理
         self._client = self._create_client()
+        self._hedge_client = self._create_client(hedge_base_url) if hedge_base_url else None
+        self._caller = ResilientCaller(endpoint=self.config.get_openai_base_url(), rate_limit=rate_limit, max_retries=max_retries,
+                                       hedge_endpoint=hedge_base_url)
     
-    def _create_client(self):
+    def _create_client(self, base_url: Optional[str] = None):
         """创建并返回OpenAI客户端"""
+        base_url = base_url or self.config.get_openai_base_url()
         try:
             if self.config.openai_api_type == "azure_key" and self.config.get_openai_api_key() != "123":
                 from openai import AzureOpenAI as OpenAI
                 # Azure OpenAI需要不同的参数
                 client = OpenAI(
-                    azure_endpoint=self.config.get_openai_base_url(),
+                    azure_endpoint=base_url,
                     api_key=self.config.get_openai_api_key(),
                     api_version="2025-01-01-preview", 
+                    max_retries=0,
                 )
-                print(f"Initialized Azure OpenAI client with endpoint: {self.config.get_openai_base_url()}")
+                print(f"Initialized Azure OpenAI client with endpoint: {base_url}")
             else:
                 from openai import OpenAI
                 client = OpenAI(
                     api_key=self.config.get_openai_api_key(),
-                    base_url=self.config.get_openai_base_url()
+                    base_url=base_url,
+                    max_retries=0,
                 )
-                print(f"Initialized standard OpenAI client with base URL: {self.config.get_openai_base_url()}")
+                print(f"Initialized standard OpenAI client with base URL: {base_url}")
             return client
         except Exception as e:
             print(f"Error creating OpenAI client: {e}")
@@ -182,6 +647,9 @@ class OpenAIAgent(Agent):
             
         Returns:
             action: The generated action text
+
+        Raises:
+            AgentError: When the request fails for good (retries or the turn budget exhausted)
         """
         try:
             # 准备系统提示和用户消息
@@ -192,23 +660,118 @@ class OpenAIAgent(Agent):
             print(f"Making API request to model: {self.model_name}")
             print(f"Observation length: {len(observation)} chars")
             
-            # 发送请求
-            response = self._client.chat.completions.create(
-                model=self.model_name,
-                messages=[system_message, user_message],
-                temperature=self.config.TEMPERATURE,
-                max_tokens=self.config.MAX_TOKENS_RESPONSE_GENERATION
-            )
+            # 根据动作格式选择停止序列
+            action_format = self.resolve_action_format(observation) if self.postprocess else None
+            stop = STOP_SEQUENCES.get(action_format) if self.use_stop_sequences else None
             
-            # 提取生成的文本
-            action = response.choices[0].message.content
+            # 发送请求，整个回合共享同一个截止时间
+            deadline = time.monotonic() + self.turn_timeout if self.turn_timeout else None
+            messages = [system_message, user_message]
+            action = self._complete(messages, stop=stop, deadline=deadline)
+            if stop:
+                action = self._restore_stop(action)
+                # 在推理片段内部被截断时，把已生成的部分作为助手消息发回并续写，而不是整段重新生成
+                for continuation in range(MAX_STOP_CONTINUATIONS + 1):
+                    if not self._in_reasoning(action, self.reasoning_prefilled): break
+                    with self._stats_lock:
+                        self.stats["stop_continuations"] += 1
+                    # 最后一次续写不带停止序列，保证推理片段能够结束
+                    continuation_stop = stop if continuation < MAX_STOP_CONTINUATIONS else None
+                    action += self._complete(messages + [{"role": "assistant", "content": action}, {"role": "user", "content": CONTINUE_PROMPT}],
+                                             stop=continuation_stop, deadline=deadline)
+                    if continuation_stop: action = self._restore_stop(action)
+            if self.postprocess:
+                action = ResponsePostProcessor(action_format=action_format, starts_in_reasoning=self.reasoning_prefilled).process(action)
             return action
         except Exception as e:
             # 处理错误并返回可理解的错误消息
             error_code = getattr(e, 'status_code', None)
             error_msg = f"Error code: {error_code} - {str(e)}"
             print(f"OpenAI API error: {error_msg}")
-            return f"An error occurred: {error_msg}"
+            # 错误信息不能作为动作提交给环境
+            raise AgentError(error_msg) from e
+
+    def stream(self, observation: str, cancel_event: Optional[threading.Event] = None) -> Generator[str, None, str]:
+        """
+        Stream the response with stream=True.
+
+        Yields visible text (reasoning spans removed when postprocess is enabled) and returns the final action. The
+        stream is closed as soon as a complete action has been received, so no stop sequences are needed, or once
+        `cancel_event` is set. Raises AgentError when the request fails for good.
+        """
+        try:
+            action_format = self.resolve_action_format(observation) if self.postprocess else None
+            postprocessor = ResponsePostProcessor(action_format=action_format, starts_in_reasoning=self.reasoning_prefilled) if self.postprocess else None
+            deadline = time.monotonic() + self.turn_timeout if self.turn_timeout else None
+            response = self._caller.call(lambda remaining: self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "system", "content": self.system_prompt}, {"role": "user", "content": observation}],
+                temperature=self.config.TEMPERATURE,
+                max_tokens=self.config.MAX_TOKENS_RESPONSE_GENERATION,
+                stream=True,
+                **({"timeout": remaining} if remaining is not None else {})
+            ), deadline=deadline)
+            chunks = []
+            try:
+                with self._cancel_tokens.token(cancel_event) as cancel_event:
+                    for event in response:
+                        if cancel_event.is_set(): break  # 调用方已放弃本次生成
+                        delta = event.choices[0].delta.content if event.choices else None
+                        if not delta: continue
+                        chunks.append(delta)
+                        visible = postprocessor.feed(delta) if postprocessor is not None else delta
+                        if visible: yield visible
+                        if postprocessor is not None and postprocessor.done: break  # 动作已完整，提前结束
+            finally:
+                response.close()
+            if postprocessor is not None:
+                tail = postprocessor.flush()
+                if tail: yield tail
+                return postprocessor.finalize()
+            return "".join(chunks)
+        except Exception as e:
+            error_code = getattr(e, 'status_code', None)
+            error_msg = f"Error code: {error_code} - {str(e)}"
+            print(f"OpenAI API error: {error_msg}")
+            # 错误信息不能作为动作提交给环境
+            raise AgentError(error_msg) from e
+
+    @staticmethod
+    def _restore_stop(text: str) -> str:
+        """停止序列不会出现在输出中，补回缺失的右括号"""
+        return text + "]" if text.rfind("[") > text.rfind("]") else text
+
+    @staticmethod
+    def _in_reasoning(text: str, starts_in_reasoning: bool = False) -> bool:
+        """文本是否停在一个未闭合的推理片段内（starts_in_reasoning：模板已预填开始标签）"""
+        stripper = ReasoningStripper(starts_in_reasoning=starts_in_reasoning)
+        stripper.feed(text)
+        return stripper.in_reasoning
+
+    def cancel(self):
+        """停止本agent所有正在进行的流式生成"""
+        self._cancel_tokens.cancel_all()
+
+    def _complete(self, messages: List[Dict[str, str]], stop: Optional[List[str]] = None, deadline: Optional[float] = None) -> str:
+        """经由请求层（限流、重试、对冲）发送chat completion请求并返回文本"""
+        request_kwargs = {"stop": stop} if stop else {}
+
+        def request_with(client):
+            def request(remaining: Optional[float]) -> str:
+                timeout_kwargs = {"timeout": remaining} if remaining is not None else {}
+                response = client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    temperature=self.config.TEMPERATURE,
+                    max_tokens=self.config.MAX_TOKENS_RESPONSE_GENERATION,
+                    **request_kwargs,
+                    **timeout_kwargs
+                )
+                return response.choices[0].message.content or ""
+            return request
+
+        hedge = request_with(self._hedge_client) if self._hedge_client is not None else None
+        return self._caller.call(request_with(self._client), hedge=hedge, deadline=deadline)
 
 class HumanAgent(Agent):
     """ Human agent class that allows the user to input actions manually """
@@ -226,4 +789,230 @@ class HumanAgent(Agent):
             str: The response generated by the agent.
         """
         print("\n\n+++ +++ +++") # for easies visualization of what is part of each turns observation
-        return input(f"Current observations: {observation}\nPlease enter the action: ")
\ No newline at end of file
+        return input(f"Current observations: {observation}\nPlease enter the action: ")
+
+
+class FormatFallbackAgent(Agent):
+    """ Instant fallback policy: returns a well-formed (not necessarily strong) action for the expected format """
+    FREE_TEXT = "I have nothing to add right now."
+    CLUE_WORDS = ("signal", "motion", "harbor", "spark", "legend", "ripple")
+
+    def __call__(self, observation: str) -> str:
+        action_format = self.resolve_action_format(observation)
+        player = re.search(r"You are Player (\d+)", observation)
+        me = int(player.group(1)) if player else None
+        if action_format == "ipd_decision":
+            return " ".join(f"[{q} cooperate]" for q in range(3) if q != me)
+        if action_format == "blotto_allocation":
+            fields = re.findall(r"Available fields: ([A-Z](?:, [A-Z])*)", observation)
+            units = re.findall(r"Units to allocate: (\d+)", observation)
+            names = fields[-1].split(", ") if fields else ["A", "B", "C"]
+            total = int(units[-1]) if units else 20
+            share, extra = divmod(total, len(names))
+            return "[" + " ".join(f"{n}{share + (i < extra)}" for i, n in enumerate(names)) + "]"
+        if action_format == "mafia_vote":
+            line = observation[max(observation.rfind("Valid"), observation.rfind("protect:"), observation.rfind("investigate:")):]
+            targets = [int(t) for t in re.findall(r"\[(\d+)\]", line.split("\n")[0])]
+            targets = [t for t in targets if t != me] or targets
+            return f"[{targets[0]}]" if targets else "[0]"
+        if action_format == "codenames_guess":
+            return "[pass]"
+        if action_format == "codenames_clue":
+            words = set(re.findall(r"[a-z]+", observation.lower()))
+            clue = next((w for w in self.CLUE_WORDS if not any(w in b or b in w for b in words if len(b) > 2)), self.CLUE_WORDS[0])
+            return f"[{clue} 1]"
+        return self.FREE_TEXT
+
+
+class AnytimeAgent(Agent):
+    """
+    Turn-deadline-aware wrapper around any agent.
+
+    The main agent and a fast fallback policy are started in parallel for every observation. The main agent is driven
+    through `stream()` with a per-call cancel event, so agents with native streaming (OpenAIAgent, LLMAgent) stop
+    generating as soon as the turn gives up on them. A legal action from the main agent (see validate_action) is
+    returned as soon as it arrives; when the deadline (minus a safety margin) is reached first, the best action
+    available is returned instead and the main call is cancelled.
+    Preference order: legal main action, legal fallback action, any main action, any fallback action.
+
+    Calls still running after their turn (agents that cannot be cancelled mid-call) are tracked; while
+    `max_abandoned` of them are running, the main agent is skipped and the fallback answers alone, so abandoned
+    calls never queue up in front of new turns.
+
+    Args:
+        agent (Agent): The main (slow, strong) agent.
+        fallback (Agent, optional): Fast fallback policy, a heuristic or a small model (default: FormatFallbackAgent).
+        turn_timeout (float): Time budget of one turn in seconds.
+        safety_margin (float): Seconds reserved for submitting the action before the deadline.
+        max_abandoned (int): Maximum number of calls from earlier turns that may still be running.
+    """
+    def __init__(self, agent: Agent, fallback: Optional[Agent] = None, turn_timeout: float = 60.0, safety_margin: float = 2.0,
+                 max_abandoned: int = 2):
+        super().__init__()
+        self.agent = agent
+        self.fallback = fallback if fallback is not None else FormatFallbackAgent()
+        self.turn_timeout = turn_timeout
+        self.safety_margin = safety_margin
+        self.max_abandoned = max_abandoned
+        self.stats = {"main": 0, "fallback": 0, "deadline_hits": 0, "main_skipped": 0}
+        self._abandoned = []
+        # two workers per turn plus the abandoned calls, so a new turn never waits for a free worker
+        self._executor = ThreadPoolExecutor(max_workers=2 + max_abandoned, thread_name_prefix="anytime")
+
+    @staticmethod
+    def _drain(agent: Agent, observation: str, cancel_event: threading.Event, values: Dict[str, Any]) -> str:
+        """ Run one streamed call of `agent` to completion with the caller's call_context() values """
+        with call_context(**values):
+            chunks = agent.stream(observation, cancel_event=cancel_event)
+            try:
+                while True: next(chunks)
+            except StopIteration as stop:
+                return stop.value
+
+    @staticmethod
+    def _call(agent, observation: str, values: Dict[str, Any]) -> str:
+        with call_context(**values):
+            return agent(observation)
+
+    def __call__(self, observation: str) -> str:
+        deadline = time.monotonic() + max(0.0, self.turn_timeout - self.safety_margin)
+        action_format = self.resolve_action_format(observation)
+        # the wrapped agents run in worker threads: hand them this call's values there, never as attributes
+        values = {**call_values(), "action_format": action_format}
+
+        def legal(future) -> bool:
+            return future is not None and future.done() and future.exception() is None and validate_action(observation, future.result(), action_format)
+
+        self._abandoned = [f for f in self._abandoned if not f.done()]
+        cancel_event = threading.Event()
+        main = None
+        if len(self._abandoned) < self.max_abandoned:
+            main = self._executor.submit(self._drain, self.agent, observation, cancel_event, values)
+        else:
+            self.stats["main_skipped"] += 1
+        fallback = self._executor.submit(self._call, self.fallback, observation, values)
+
+        # wait for the main agent, but stop early if it finishes with an illegal action and the fallback is legal
+        pending = {f for f in (main, fallback) if f is not None}
+        while main in pending and not legal(main):
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done: break
+        if legal(main):
+            self.stats["main"] += 1
+            self._abandon(fallback)
+            return main.result()
+
+        if main is not None and not main.done():
+            self.stats["deadline_hits"] += 1
+            cancel_event.set()
+            self._abandon(main)
+        if not fallback.done():
+            wait([fallback], timeout=max(0.0, deadline - time.monotonic()))
+        self._abandon(fallback)
+        candidates = [f for f in (fallback, main) if f is not None and f.done() and f.exception() is None]
+        chosen = next((f for f in candidates if legal(f)), None)
+        chosen = chosen or next((f for f in (main, fallback) if f in candidates), None)
+        if chosen is not None and chosen is main:
+            self.stats["main"] += 1
+            return main.result()
+        self.stats["fallback"] += 1
+        return chosen.result() if chosen is not None else self._call(FormatFallbackAgent(), observation, values)
+
+    def _abandon(self, future):
+        """ Keep track of a call that is left running after its turn """
+        if not future.done(): self._abandoned.append(future)
+
+    def close(self):
+        """ Cancel the calls still running from earlier turns and shut down the worker threads """
+        for future in self._abandoned: future.cancel()
+        self._executor.shutdown(wait=False)
+
+
+# Phases where a mistake is costly enough to always use the large model
+DEFAULT_ESCALATION_PHASES = {("SecretMafia-v0", "Day-Voting"), ("Codenames-v0", "clue")}
+
+
+class CascadeAgent(Agent):
+    """
+    Model cascade: ask a cheap model first and escalate to a large model only when needed.
+
+    The small model's action is accepted if it passes validate_action for the expected format and, when a
+    `confidence_fn` is given, its confidence reaches `min_confidence`. Otherwise, or when the small model fails, or for
+    phases listed in `escalate_phases`, the large model answers. Per (env, phase) statistics on escalation rates,
+    reasons and latency are collected in `stats` (see `stats_table()`) to tune thresholds from data.
+
+    Args:
+        small (Agent): Cheap model, asked first.
+        large (Agent): Expensive model, used on escalation.
+        escalate_phases (set, optional): (env id, phase) pairs (see action_grammar.detect_phase) that always go to the large model.
+        confidence_fn (callable, optional): `confidence_fn(observation, action) -> float` in [0, 1] for the small model's action.
+        min_confidence (float): Escalate when the confidence is below this value.
+    """
+    def __init__(self, small: Agent, large: Agent, escalate_phases: Optional[set] = None,
+                 confidence_fn=None, min_confidence: float = 0.5):
+        super().__init__()
+        self.small = small
+        self.large = large
+        self.escalate_phases = DEFAULT_ESCALATION_PHASES if escalate_phases is None else set(escalate_phases)
+        self.confidence_fn = confidence_fn
+        self.min_confidence = min_confidence
+        self.stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, phase: Tuple[str, str], reason: Optional[str], small_s: float, large_s: float):
+        with self._lock:
+            entry = self.stats.setdefault(phase, {"calls": 0, "escalations": 0, "reasons": {}, "small_s": 0.0, "large_s": 0.0})
+            entry["calls"] += 1
+            entry["small_s"] += small_s
+            entry["large_s"] += large_s
+            if reason is not None:
+                entry["escalations"] += 1
+                entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+
+    def _ask_small(self, observation: str, action_format: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """ Return (action, escalation reason); the reason is None when the small model's action is accepted """
+        try:
+            action = self.small(observation)
+        except Exception:
+            return None, "error"
+        if not validate_action(observation, action, action_format): return action, "invalid"
+        if self.confidence_fn is not None and self.confidence_fn(observation, action) < self.min_confidence:
+            return action, "low_confidence"
+        return action, None
+
+    def __call__(self, observation: str) -> str:
+        phase = detect_phase(observation)
+        action_format = self.resolve_action_format(observation)
+
+        small_s = large_s = 0.0
+        with call_context(action_format=action_format):
+            if phase in self.escalate_phases:
+                action, reason = None, "high_stakes"
+            else:
+                start = time.monotonic()
+                action, reason = self._ask_small(observation, action_format)
+                small_s = time.monotonic() - start
+            if reason is not None:
+                start = time.monotonic()
+                try:
+                    action = self.large(observation)
+                except Exception:
+                    if action is None: raise  # neither model produced anything
+                large_s = time.monotonic() - start
+        self._record(phase, reason, small_s, large_s)
+        return action
+
+    def stats_table(self) -> List[Dict[str, Any]]:
+        """ Per-phase summary: escalation rate, escalation reasons and mean latency of each model """
+        with self._lock:
+            rows = []
+            for (env, phase), e in sorted(self.stats.items()):
+                small_calls = e["calls"] - e["reasons"].get("high_stakes", 0)
+                rows.append({
+                    "env": env, "phase": phase, "calls": e["calls"],
+                    "escalation_rate": e["escalations"] / e["calls"],
+                    "reasons": dict(e["reasons"]),
+                    "mean_small_s": e["small_s"] / small_calls if small_calls else None,
+                    "mean_large_s": e["large_s"] / e["escalations"] if e["escalations"] else None,
+                })
+            return rows
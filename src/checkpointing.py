@@ -0,0 +1,170 @@
+"""
+Durable per-episode checkpointing for offline evaluation.
+
+EpisodeLog appends every finished episode to a JSONL file (flushed and fsynced, so a crash or
+pre-emption loses at most the episode in flight). Every `snapshot_every` episodes the per-env
+summary of all logged episodes is written atomically to a CSV next to the log, so a partial summary can be read while a sweep is still running.
+
+An episode is identified by its unit (env id, seed, model seats). On restart the log is read
+back, and offline_evaluation replays logged units from it instead of playing them again; the
+aggregates and stop rules therefore end up exactly where an uninterrupted run would have been.
+A truncated last line (a crash in the middle of a write) is ignored and cut off before the
+next append.
+
+Read a partial summary at any time:
+    python src/checkpointing.py eval_results/episodes.jsonl
+"""
+import csv
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Unit = Tuple[str, int, Tuple[int, ...]]
+
+
+def _jsonable(value):
+    """ json.dumps default for numpy scalars in run_game results """
+    if hasattr(value, "item"): return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def summarize_results(results: Iterable[dict]) -> List[dict]:
+    """ One summary row per env from run_game results that carry an "env_id" (columns as in offline_evaluation) """
+    aggregates: Dict[str, Dict[str, float]] = {}
+    for result in results:
+        agg = aggregates.setdefault(result["env_id"], dict(
+            episodes=0, wins=0, losses=0, draws=0, invalid_moves=0, turns=0, reward_model=0.0, reward_opponent=0.0))
+        agg["episodes"] += 1
+        if result["model_reward"] > result["opponent_reward"]: agg["wins"] += 1
+        elif result["model_reward"] < result["opponent_reward"]: agg["losses"] += 1
+        else: agg["draws"] += 1
+        agg["invalid_moves"] += int(result["invalid_move"])
+        agg["turns"] += result["turn_count"]
+        agg["reward_model"] += result["model_reward"]
+        agg["reward_opponent"] += result["opponent_reward"]
+    rows = []
+    for env_id, agg in aggregates.items():
+        n = agg["episodes"]
+        rows.append({
+            "env_id": env_id,
+            "episodes": n,
+            "win_rate": agg["wins"] / n,
+            "loss_rate": agg["losses"] / n,
+            "draw_rate": agg["draws"] / n,
+            "invalid_rate": agg["invalid_moves"] / n,
+            "avg_turns": agg["turns"] / n,
+            "avg_model_reward": agg["reward_model"] / n,
+            "avg_opponent_reward": agg["reward_opponent"] / n,
+        })
+    return rows
+
+
+class EpisodeLog:
+    """
+    Append-only episode log with resume lookups and periodic summary snapshots.
+
+    Args:
+        path (str): JSONL log file; created if missing, resumed from if present.
+        snapshot_every (int): Write the summary CSV every this many appended episodes (0 disables it).
+        snapshot_path (str, optional): Summary CSV; default: the log path with "_summary.csv".
+    """
+    def __init__(self, path: str, snapshot_every: int = 10, snapshot_path: Optional[str] = None):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = snapshot_path or f"{os.path.splitext(path)[0]}_summary.csv"
+        self.results: Dict[Unit, dict] = {}
+        self._valid_bytes = 0
+        self._file = None
+        self._appended = 0
+        self._load()
+
+    @staticmethod
+    def unit(env_id: str, seed: int, model_pids: Sequence[int]) -> Unit:
+        return env_id, int(seed), tuple(int(pid) for pid in model_pids)
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"): break  # torn write at the end of the file
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._valid_bytes += len(line)
+                self._add(record)
+
+    def _add(self, record: dict):
+        record["model_pids"] = tuple(record["model_pids"])
+        self.results[self.unit(record["env_id"], record["seed"], record["model_pids"])] = record
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def get(self, env_id: str, seed: int, model_pids: Sequence[int]) -> Optional[dict]:
+        """ The logged result of this unit, or None if it has not been played """
+        return self.results.get(self.unit(env_id, seed, model_pids))
+
+    def append(self, env_id: str, result: dict):
+        """ Durably log one run_game result (it must have a seed) """
+        if result.get("seed") is None: raise ValueError("Only seeded episodes can be checkpointed")
+        record = {"env_id": env_id, **result, "model_pids": list(result["model_pids"]), "logged_at": time.time()}
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "ab")
+            self._file.truncate(self._valid_bytes)  # drop a torn last line before appending
+        line = (json.dumps(record, default=_jsonable) + "\n").encode()
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._valid_bytes += len(line)
+        self._add(json.loads(line))
+        self._appended += 1
+        if self.snapshot_every and self._appended % self.snapshot_every == 0:
+            self.snapshot()
+
+    def summary(self) -> List[dict]:
+        """ One summary row per env over all logged episodes """
+        return summarize_results(self.results.values())
+
+    def snapshot(self):
+        """ Atomically write the current summary to `snapshot_path` """
+        rows = self.summary()
+        if not rows: return
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, self.snapshot_path)
+
+    def close(self):
+        """ Write a final snapshot and close the log file """
+        if self._appended: self.snapshot()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("usage: python src/checkpointing.py EPISODE_LOG.jsonl")
+    rows = EpisodeLog(sys.argv[1]).summary()
+    if not rows:
+        print("No episodes logged yet.")
+        return
+    print(" | ".join(f"{key:>12}" for key in rows[0]))
+    for row in rows:
+        print(" | ".join(f"{v:>12.3f}" if isinstance(v, float) else f"{v!s:>12}" for v in row.values()))
+
+
+if __name__ == "__main__":
+    main()
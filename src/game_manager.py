@@ -1,14 +1,37 @@
-import textarena as ta
 from typing import Dict, List, Optional, Union, Tuple, Any
+import copy
 import os
+import random
 import sys
 import logging
-from agent import Agent, HumanAgent, LLMAgent, OpenAIAgent
+from concurrent.futures import ThreadPoolExecutor
+from action_grammar import PHASE_FORMATS
+from agent import AUTO_ACTION_FORMAT, Agent, AgentError, FormatFallbackAgent, HumanAgent, LLMAgent, OpenAIAgent, call_context
+from game_state_views import build_state_view
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 基于本地参考实现（envs/）的环境变体：环境ID -> (规则所属的游戏, 入口"模块:类", 在原游戏构造参数上追加的参数)
+# ta.make("SecretMafia-v0")加载的是textarena安装包中的环境，本地参考实现的扩展需以新ID注册后才能使用
+LOCAL_ENVS = {
+    "SecretMafia-simdisc-v0": ("SecretMafia-v0", "envs.SecretMafia.env:SecretMafiaEnv", {"simultaneous_discussion": True}),
+}
+
+
+def register_local_envs():
+    """在textarena中注册LOCAL_ENVS（已注册的跳过），沿用原游戏的默认参数与包装器"""
+    from textarena.envs.registration import ENV_REGISTRY, register
+    if PROJECT_ROOT not in sys.path:
+        sys.path.append(PROJECT_ROOT)
+    for env_id, (base_id, entry_point, kwargs) in LOCAL_ENVS.items():
+        if env_id in ENV_REGISTRY: continue
+        base = ENV_REGISTRY[base_id]
+        register(env_id, entry_point=entry_point, default_wrappers=base.default_wrappers, **{**base.kwargs, **kwargs})
+
 class GameManager:
     """
     游戏管理器类，用于统一管理四种不同的游戏环境
@@ -20,7 +43,8 @@ class GameManager:
         "secret_mafia": "SecretMafia-v0",
         "three_player_ipd": "ThreePlayerIPD-v0",
         "colonel_blotto": "ColonelBlotto-v0",
-        "codenames": "Codenames-v0"
+        "codenames": "Codenames-v0",
+        "secret_mafia_simultaneous": "SecretMafia-simdisc-v0"
     }
     
     # 每个游戏需要的玩家数量
@@ -28,7 +52,16 @@ class GameManager:
         "SecretMafia-v0": 7,
         "ThreePlayerIPD-v0": 3,
         "ColonelBlotto-v0": 2,
-        "Codenames-v0": 4
+        "Codenames-v0": 4,
+        "SecretMafia-simdisc-v0": 7
+    }
+    
+    # 同时行动的阶段：(环境ID, 阶段) -> 分组名；同一组内连续行动的玩家互相看不到对方的动作
+    SIMULTANEOUS_PHASES = {
+        ("ColonelBlotto-v0", "allocation"): "allocation",
+        ("ThreePlayerIPD-v0", "decision"): "decision",
+        ("SecretMafia-v0", "Night-Doctor"): "night-roles",
+        ("SecretMafia-v0", "Night-Detective"): "night-roles",
     }
     
     def __init__(self):
@@ -38,6 +71,25 @@ class GameManager:
         self.agents = {}
         self.human_player_ids = []
         self.llm_player_ids = []
+        # 观察压缩器：玩家ID -> compressor(observation, player_id)；键None表示对所有玩家生效
+        self.observation_compressors = {}
+        # 同时行动阶段的并发生成：线程池按需创建，统计推测动作的命中情况
+        self._action_executor = None
+        self.speculation_stats = {"groups": 0, "speculative_actions": 0, "hits": 0, "misses": 0}
+        # 代理未能生成动作、改用占位动作的次数
+        self.agent_errors = 0
+    
+    def close(self):
+        """关闭并发生成动作的线程池；之后仍可继续使用，需要时会重新创建"""
+        if self._action_executor is not None:
+            self._action_executor.shutdown(wait=True)
+            self._action_executor = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
     
     def list_available_games(self) -> List[str]:
         """列出所有可用的游戏"""
@@ -52,13 +104,14 @@ class GameManager:
         else:
             raise ValueError(f"不支持的游戏: {game_name}. 支持的游戏有: {', '.join(self.SUPPORTED_GAMES.keys())}")
     
-    def setup_game(self, game_name: str, seed: Optional[int] = None) -> str:
+    def setup_game(self, game_name: str, seed: Optional[int] = None, env_kwargs: Optional[Dict[str, Any]] = None) -> str:
         """
         设置游戏环境
         
         Args:
             game_name: 游戏名称
             seed: 随机种子
+            env_kwargs: 传给环境构造函数的额外参数，如SecretMafia的{"discussion_rounds": 2}
         
         Returns:
             规范化的游戏名称
@@ -66,8 +119,11 @@ class GameManager:
         self.game_name = self._validate_game_name(game_name)
         logger.info(f"设置游戏环境: {self.game_name}")
         
-        # 创建环境
-        self.env = ta.make(self.game_name)
+        # 创建环境；textarena在首次设置游戏时才导入，列出游戏等操作无需加载
+        import textarena as ta
+        if self.game_name in LOCAL_ENVS:
+            register_local_envs()
+        self.env = ta.make(self.game_name, **(env_kwargs or {}))
         
         # 清空代理列表
         self.agents = {}
@@ -207,7 +263,7 @@ class GameManager:
         logger.info(f"游戏 {self.game_name} 已开始，玩家数量: {num_players}")
         return {"status": "started", "num_players": num_players, "initial_observation": obs}
     
-    def play_game(self, max_steps: int = 1000, callbacks: Dict[str, callable] = None) -> Dict[str, Any]:
+    def play_game(self, max_steps: int = 1000, callbacks: Dict[str, callable] = None, concurrent: bool = False) -> Dict[str, Any]:
         """
         运行完整的游戏过程
         
@@ -215,8 +271,12 @@ class GameManager:
             max_steps: 最大步数，防止无限循环
             callbacks: 回调函数字典，包含以下可选回调:
                 - on_observation(player_id, observation): 当玩家收到观察时调用
+                - on_action_chunk(player_id, chunk): 代理流式生成动作时，每收到一段文本调用一次（仅当前行动的玩家）
                 - on_action(player_id, action): 当玩家执行动作时调用
                 - on_step_complete(done, info): 当一步完成时调用
+            concurrent: 在同时行动的阶段（SIMULTANEOUS_PHASES）并发生成各玩家的动作，再按环境要求的顺序提交。
+                只有各座位是不同的代理实例时才并发（同一实例坐多个座位时按顺序生成）；默认关闭，
+                因为代理可能在实例之间共享模型或状态
             
         Returns:
             游戏结果
@@ -229,6 +289,8 @@ class GameManager:
         
         step_count = 0
         game_over = False
+        # 提前生成的动作：玩家ID -> (预期观察, 动作)
+        planned = {}
         
         while not game_over and step_count < max_steps:
             player_id, observation = self.env.get_observation()
@@ -243,8 +305,22 @@ class GameManager:
                 
             agent = self.agents[player_id]
             
-            # 代理生成动作
-            action = agent(observation)
+            # 代理生成动作；若已基于完全相同的观察提前生成过，直接使用
+            if player_id in planned and planned[player_id][0] == observation:
+                action = planned.pop(player_id)[1]
+                self.speculation_stats["hits"] += 1
+            else:
+                self.speculation_stats["misses"] += len(planned)
+                planned = {}
+                group = self._plan_simultaneous_turns(player_id, observation) if concurrent and not self.human_player_ids else []
+                if len(group) > 1:
+                    actions = self._generate_concurrently(group, callbacks)
+                    action = actions[0]
+                    planned = {pid: (obs, act) for (pid, obs, _, _), act in zip(group[1:], actions[1:])}
+                elif group:
+                    action = self._run_agent(agent, player_id, group[0][2], callbacks, group[0][3])
+                else:
+                    action = self.generate_action(agent, player_id, observation, callbacks)
             
             # 回调：动作
             if 'on_action' in callbacks:
@@ -259,6 +335,8 @@ class GameManager:
                 
             step_count += 1
         
+        self.speculation_stats["misses"] += len(planned)
+        
         # 游戏结束，获取奖励
         rewards, game_info = self.env.close()
         
@@ -274,6 +352,221 @@ class GameManager:
         logger.info(f"游戏结束，总步数: {step_count}")
         return result
     
+    def generate_action(self, agent: Agent, player_id: int, observation: str, callbacks: Dict[str, callable] = None) -> str:
+        """
+        让代理生成动作；注册了on_action_chunk回调且代理支持流式输出时，边生成边回调
+        
+        Args:
+            agent: 当前玩家的代理
+            player_id: 当前玩家ID
+            observation: 当前观察
+            callbacks: 回调函数字典，同play_game
+        
+        Returns:
+            最终提交给环境的动作
+        """
+        observation, values = self._prepare_agent(agent, player_id, observation)
+        return self._run_agent(agent, player_id, observation, callbacks, values)
+    
+    def _prepare_agent(self, agent: Agent, player_id: int, observation: str, env=None) -> Tuple[str, Dict[str, Any]]:
+        """
+        准备交给代理的观察与本次调用的输入（动作格式、状态视图，基于env，默认当前环境）
+        
+        这些输入通过call_context按次传入，不写到代理实例上：同一代理可能被多个对局或线程共享
+        
+        Returns:
+            (交给代理的观察, 本次调用的输入)
+        """
+        # 告知代理当前阶段的动作格式，以便在动作完整后提前停止生成
+        values = {"action_format": self.get_action_format(player_id, env)}
+        
+        # 仅向声明需要的代理提供结构化状态视图
+        if getattr(agent, "uses_state_view", False):
+            values["state_view"] = self.get_state_view(player_id, env)
+        return self.compress_observation(player_id, observation), values
+    
+    def _run_agent(self, agent: Agent, player_id: int, observation: str, callbacks: Dict[str, callable] = None,
+                   values: Optional[Dict[str, Any]] = None) -> str:
+        """调用代理生成动作；代理无法给出动作（AgentError）时改用格式正确的占位动作，错误信息不会提交给环境"""
+        values = values or {}
+        with call_context(**values):
+            try:
+                return self._call_agent(agent, player_id, observation, callbacks)
+            except AgentError as e:
+                logger.warning(f"玩家 {player_id} 的代理未能生成动作，使用占位动作: {e}")
+                self.agent_errors += 1
+                return FormatFallbackAgent()(observation)
+    
+    def _call_agent(self, agent: Agent, player_id: int, observation: str, callbacks: Dict[str, callable] = None) -> str:
+        """调用代理生成动作；注册了on_action_chunk回调且代理支持流式输出时，边生成边回调"""
+        callbacks = callbacks or {}
+        on_chunk = callbacks.get('on_action_chunk')
+        if on_chunk is None or not hasattr(agent, "stream"):
+            return agent(observation)
+        
+        chunks = agent.stream(observation)
+        while True:
+            try:
+                on_chunk(player_id, next(chunks))
+            except StopIteration as stop:
+                return stop.value
+    
+    def get_simultaneous_group(self, player_id: int, env=None) -> Optional[str]:
+        """
+        返回当前阶段所属的同时行动分组名；按顺序行动的阶段返回None
+        
+        Args:
+            player_id: 当前行动的玩家ID
+            env: 读取状态的环境，默认当前环境
+        """
+        phase = self.get_phase(player_id, env)
+        # SecretMafia-simdisc-v0（simultaneous_discussion）中，同一轮讨论的发言在本轮结束后才公布
+        if phase == ("SecretMafia-v0", "Day-Discussion") and getattr(env if env is not None else self.env, "simultaneous_discussion", False):
+            return "discussion"
+        return self.SIMULTANEOUS_PHASES.get(phase)
+    
+    def _plan_simultaneous_turns(self, player_id: int, observation: str) -> List[Tuple[int, str, str, Dict[str, Any]]]:
+        """
+        推测同一同时行动阶段内接下来行动的玩家及其观察
+        
+        在环境副本上用占位动作（FormatFallbackAgent）依次推进，收集同组玩家将看到的观察。
+        同组玩家看不到彼此的动作，所以占位动作不影响这些观察；play_game在真正轮到该玩家时
+        仍会核对观察是否完全一致，不一致则重新生成。
+        推测的观察可能被丢弃，所以只纳入准备过程没有持久副作用的玩家：设置了观察压缩器
+        （增量状态、可能调用摘要模型）的玩家等到真正轮到时才准备。使用状态视图的代理也不纳入：
+        副本上的状态视图可能包含占位动作的结果，而play_game只核对观察。
+        
+        Args:
+            player_id: 当前行动的玩家ID
+            observation: 当前玩家的观察
+            
+        Returns:
+            [(玩家ID, 原始观察, 交给代理的观察, 本次调用的输入)]，第一项为当前玩家；不处于同时行动阶段时返回空列表
+        """
+        group_name = self.get_simultaneous_group(player_id)
+        if group_name is None:
+            return []
+        agents = [self.agents[player_id]]
+        group = [(player_id, observation, *self._prepare_agent(agents[0], player_id, observation))]
+        # 副本推进时环境会使用全局随机数（如阶段切换时打乱发言顺序），推测结束后恢复，保证对局不受影响
+        random_state = random.getstate()
+        try:
+            sim = copy.deepcopy(self.env)
+            fallback = FormatFallbackAgent()
+            pid, obs = player_id, observation
+            while True:
+                fallback.action_format = self.get_action_format(pid, sim)
+                done, _ = sim.step(action=fallback(obs))
+                if done:
+                    break
+                pid, obs = sim.get_observation()
+                agent = self.agents.get(pid)
+                # 同一代理实例不并发调用；压缩器的副作用只发生在已提交的回合，状态视图只取自真实环境
+                if (agent is None or any(agent is a for a in agents) or any(pid == p for p, *_ in group)
+                        or self._compressor(pid) is not None or getattr(agent, "uses_state_view", False)
+                        or self.get_simultaneous_group(pid, sim) != group_name):
+                    break
+                agents.append(agent)
+                group.append((pid, obs, *self._prepare_agent(agent, pid, obs, sim)))
+        except Exception as e:
+            logger.warning(f"推测同时行动的玩家失败，按顺序生成: {e}")
+            group = group[:1]
+        finally:
+            random.setstate(random_state)
+        return group
+    
+    def _generate_concurrently(self, group: List[Tuple[int, str, str, Dict[str, Any]]], callbacks: Dict[str, callable] = None) -> List[str]:
+        """并发生成同组玩家的动作；只有当前行动的玩家（第一项）触发流式回调"""
+        if self._action_executor is None:
+            self._action_executor = ThreadPoolExecutor(max_workers=max(self.GAME_PLAYER_COUNT.values()), thread_name_prefix="action")
+        self.speculation_stats["groups"] += 1
+        self.speculation_stats["speculative_actions"] += len(group) - 1
+        futures = [
+            self._action_executor.submit(self._run_agent, self.agents[pid], pid, prepared, callbacks if i == 0 else None, values)
+            for i, (pid, _, prepared, values) in enumerate(group)
+        ]
+        return [future.result() for future in futures]
+    
+    def set_observation_compressor(self, compressor: Optional[callable], player_ids: Optional[List[int]] = None):
+        """
+        设置观察压缩器，在观察交给代理之前对其进行压缩（如observation_compression.MafiaObservationCompressor）
+        
+        Args:
+            compressor: compressor(observation, player_id) -> str；传入None表示移除
+            player_ids: 生效的玩家ID列表，None表示所有玩家
+        """
+        for key in (player_ids if player_ids is not None else [None]):
+            if compressor is None: self.observation_compressors.pop(key, None)
+            else: self.observation_compressors[key] = compressor
+    
+    def _compressor(self, player_id: int) -> Optional[callable]:
+        """返回对该玩家生效的观察压缩器"""
+        return self.observation_compressors.get(player_id, self.observation_compressors.get(None))
+    
+    def compress_observation(self, player_id: int, observation: str) -> str:
+        """返回交给代理的观察；未设置压缩器时原样返回"""
+        compressor = self._compressor(player_id)
+        return observation if compressor is None else compressor(observation, player_id)
+    
+    def get_state_view(self, player_id: int, env=None) -> Optional[Any]:
+        """
+        返回玩家可见的结构化游戏状态（按角色过滤，不含秘密信息）
+        
+        Args:
+            player_id: 观察者的玩家ID
+            env: 读取状态的环境，默认当前环境
+            
+        Returns:
+            game_state_views中的状态视图；不支持的游戏返回None
+        """
+        if self.env is None:
+            raise RuntimeError("请先使用setup_game()设置游戏环境")
+        return build_state_view(self.rules_id, env if env is not None else self.env, player_id)
+    
+    @property
+    def rules_id(self) -> Optional[str]:
+        """当前游戏规则所属的环境ID：本地变体（LOCAL_ENVS）返回原游戏ID，阶段、动作格式与状态视图均按它查找"""
+        return LOCAL_ENVS[self.game_name][0] if self.game_name in LOCAL_ENVS else self.game_name
+    
+    def get_phase(self, player_id: int, env=None) -> Optional[Tuple[str, str]]:
+        """
+        返回当前的(环境ID, 阶段)，即action_grammar注册表的键
+        
+        Args:
+            player_id: 当前行动的玩家ID
+            env: 读取状态的环境，默认当前环境
+            
+        Returns:
+            (环境ID, 阶段)；未知游戏返回None
+        """
+        game_state = (env if env is not None else self.env).state.game_state
+        game = self.rules_id
+        if game == "ThreePlayerIPD-v0":
+            return game, game_state.get("phase")
+        if game == "ColonelBlotto-v0":
+            return game, "allocation"
+        if game == "SecretMafia-v0":
+            return game, getattr(game_state.get("phase"), "value", game_state.get("phase"))
+        if game == "Codenames-v0":
+            return game, "clue" if player_id in (0, 2) else "guess"
+        return None
+    
+    def get_action_format(self, player_id: int, env=None) -> Optional[str]:
+        """
+        根据当前环境和阶段返回玩家下一步动作的格式
+        
+        Args:
+            player_id: 当前行动的玩家ID
+            env: 读取状态的环境，默认当前环境
+            
+        Returns:
+            agent.ACTION_FORMATS中的格式名称；自由发言阶段返回None；未知游戏返回AUTO_ACTION_FORMAT
+        """
+        phase = self.get_phase(player_id, env)
+        if phase is None or phase not in PHASE_FORMATS:
+            return AUTO_ACTION_FORMAT
+        return PHASE_FORMATS[phase]
+    
     def get_required_players(self) -> int:
         """获取当前游戏需要的玩家数量"""
         if self.game_name is None:
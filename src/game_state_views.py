@@ -0,0 +1,139 @@
+"""
+Typed, player-visible views of the env game state.
+
+The envs keep the facts agents need in `env.state.game_state` (alive players,
+votes, Blotto fields, IPD scores, Codenames guesses). build_state_view() copies
+the part a given player is allowed to see into a small dataclass, so agents and
+heuristics can use it instead of re-parsing the observation text. Secrets are
+filtered by role: Mafia membership and night votes are only visible to Mafia,
+Codenames labels only to spymasters (or once revealed), the opponents' current
+Blotto allocation and IPD decisions not at all.
+
+Views are snapshots: they hold copies, never references into the env.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class MafiaStateView:
+    player_id: int
+    role: str
+    team: str
+    phase: str
+    day_number: int
+    alive_players: List[int]
+    teammates: List[int] = field(default_factory=list)          # Mafia only
+    votes: Dict[int, int] = field(default_factory=dict)         # day votes for everyone, night votes for Mafia only
+    pending_elimination: Optional[int] = None                   # Mafia only
+
+
+@dataclass
+class BlottoStateView:
+    player_id: int
+    current_round: int
+    num_rounds: int
+    fields: List[str]
+    units_to_allocate: int
+    scores: Dict[int, int]
+    my_allocation: Dict[str, int]
+    allocation_complete: bool
+
+
+@dataclass
+class IPDStateView:
+    player_id: int
+    round: int
+    num_rounds: int
+    phase: str
+    conversation_round: int
+    total_conversation_rounds: int
+    opponents: List[int]
+    scores: Dict[int, int]
+    my_decisions: Dict[int, Optional[str]]
+    acted: bool
+
+
+@dataclass
+class CodenamesStateView:
+    player_id: int
+    team: str                    # "R" or "B"
+    role: str                    # "Spymaster" or "Operative"
+    board: Dict[str, str]        # word -> label; "" where the label is hidden from this player
+    guessed_words: List[str]
+    last_clue: Optional[str]
+    last_number: int
+    remaining_guesses: int
+
+
+def _mafia_view(env, player_id: int) -> MafiaStateView:
+    gs = env.state.game_state
+    roles = gs["player_roles"]
+    role = roles[player_id]
+    is_mafia = role == "Mafia"
+    phase = getattr(gs["phase"], "value", gs["phase"])
+    night = phase.startswith("Night")
+    return MafiaStateView(
+        player_id=player_id, role=role, team="Mafia" if is_mafia else "Village", phase=phase,
+        day_number=gs["day_number"], alive_players=list(gs["alive_players"]),
+        teammates=[p for p, r in roles.items() if r == "Mafia"] if is_mafia else [],
+        votes=dict(gs["votes"]) if is_mafia or not night else {},
+        pending_elimination=gs.get("pending_elimination") if is_mafia else None,
+    )
+
+
+def _blotto_view(env, player_id: int) -> BlottoStateView:
+    gs = env.state.game_state
+    mine = gs["player_states"][player_id]
+    return BlottoStateView(
+        player_id=player_id, current_round=gs["current_round"], num_rounds=env.num_rounds,
+        fields=[f["name"] for f in gs["fields"]], units_to_allocate=env.num_total_units, scores=dict(gs["scores"]),
+        my_allocation=dict(mine["current_allocation"]), allocation_complete=mine["allocation_complete"],
+    )
+
+
+def _ipd_view(env, player_id: int) -> IPDStateView:
+    gs = env.state.game_state
+    return IPDStateView(
+        player_id=player_id, round=gs["round"], num_rounds=gs["num_rounds"], phase=gs["phase"],
+        conversation_round=gs["conversation_round"], total_conversation_rounds=gs["total_conversation_rounds"],
+        opponents=sorted(gs["decisions"][player_id]), scores=dict(gs["scores"]),
+        my_decisions=dict(gs["decisions"][player_id]), acted=gs["acted"][player_id],
+    )
+
+
+def _codenames_view(env, player_id: int) -> CodenamesStateView:
+    gs = env.state.game_state
+    spymaster = player_id in (0, 2)
+    guessed = gs["guessed_words"]
+    return CodenamesStateView(
+        player_id=player_id, team="R" if player_id < 2 else "B", role="Spymaster" if spymaster else "Operative",
+        board={w: label if spymaster or w in guessed else "" for w, label in env.board.items()},
+        guessed_words=sorted(guessed), last_clue=gs.get("last_clue"), last_number=gs.get("last_number", 0),
+        remaining_guesses=gs.get("remaining_guesses", 0),
+    )
+
+
+STATE_VIEW_BUILDERS: Dict[str, Callable[[Any, int], Any]] = {
+    "SecretMafia-v0": _mafia_view,
+    "SecretMafia-simdisc-v0": _mafia_view,
+    "ColonelBlotto-v0": _blotto_view,
+    "ThreePlayerIPD-v0": _ipd_view,
+    "Codenames-v0": _codenames_view,
+}
+
+
+def build_state_view(env_id: str, env, player_id: int) -> Optional[Any]:
+    """
+    Build the view of `env`'s current state that `player_id` is allowed to see.
+
+    Args:
+        env_id (str): Env id, e.g. "SecretMafia-v0".
+        env: The (possibly wrapped) env; wrappers forward attribute access to the base env.
+        player_id (int): The observing player.
+
+    Returns:
+        The state view dataclass, or None for envs without a builder.
+    """
+    builder = STATE_VIEW_BUILDERS.get(env_id)
+    return builder(env, player_id) if builder is not None else None
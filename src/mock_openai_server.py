@@ -0,0 +1,287 @@
+"""
+Local stand-in for an OpenAI-compatible endpoint, for load and resilience testing.
+
+MockOpenAIServer implements POST /v1/chat/completions (plain and `stream=True`
+server-sent events) and GET /v1/models with the standard library only, so
+OpenAIAgent can be pointed at it without network access:
+
+    server = start_in_thread(latency="lognormal:-1.5,0.5", error_rate=0.05, tokens_per_s=80)
+    agent = OpenAIAgent(model_name="mock", api_key="mock", base_url=server.base_url)
+
+What it simulates:
+
+  - latency: time to first token drawn from a distribution ("fixed:S",
+    "uniform:LO,HI" or "lognormal:MU,SIGMA", in seconds),
+  - errors: a fraction of requests fails with one of `error_codes` (429, 500, ...)
+    and a Retry-After header,
+  - throughput: `tokens_per_s` paces the generated tokens (whitespace-delimited
+    words count as tokens), both when streaming and for plain responses,
+  - stop sequences: the reply is cut before the first stop string, like the API.
+
+Replies are scripted by default: the game is detected from the last user message
+and scripted_agents.baseline_agent() plays a legal move, so whole games run to
+completion. Observations from other games (and follow-up prompts without a game
+marker) get a free-text reply. `responses` overrides this per game with a fixed string, a list of
+strings (cycled) or a callable `observation -> str`; the key "*" applies to all
+games without their own entry.
+
+CLI:
+    python src/mock_openai_server.py --port 8001 --latency uniform:0.2,0.8 --error-rate 0.02 --tokens-per-s 50
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from action_grammar import detect_phase
+from scripted_agents import BASELINE_AGENTS, RandomValidAgent, baseline_agent
+
+_TOKEN = re.compile(r"\s*\S+")
+
+Responses = Dict[str, Union[str, List[str], Callable[[str], str]]]
+
+
+@dataclass
+class LatencyDistribution:
+    """ Time-to-first-token distribution in seconds """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: Union[str, float, "LatencyDistribution"]) -> "LatencyDistribution":
+        """ Parse "fixed:S", "uniform:LO,HI", "lognormal:MU,SIGMA" or a number of seconds """
+        if isinstance(spec, LatencyDistribution): return spec
+        if isinstance(spec, (int, float)): return cls("fixed", float(spec))
+        kind, _, params = spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()] if params else []
+        if kind == "fixed" and len(values) == 1: return cls(kind, values[0])
+        if kind in ("uniform", "lognormal") and len(values) == 2: return cls(kind, values[0], values[1])
+        raise ValueError(f"Invalid latency spec {spec!r}; use fixed:S, uniform:LO,HI or lognormal:MU,SIGMA")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform": return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal": return rng.lognormvariate(self.a, self.b)
+        return self.a
+
+
+def apply_stop(text: str, stop: Union[None, str, List[str]]) -> str:
+    """ Cut `text` before the earliest stop sequence (the stop string itself is not returned) """
+    if not stop: return text
+    cuts = [text.find(s) for s in ([stop] if isinstance(stop, str) else stop) if s]
+    cuts = [c for c in cuts if c >= 0]
+    return text[:min(cuts)] if cuts else text
+
+
+class MockOpenAIServer:
+    """
+    Threaded mock of the chat.completions endpoint.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port (see `base_url`).
+        latency: Time to first token, a LatencyDistribution or spec string (see LatencyDistribution.parse).
+        error_rate (float): Fraction of requests answered with an error status.
+        error_codes (iterable of int): Status codes to choose from for injected errors.
+        retry_after (float, optional): Retry-After header sent with injected errors, in seconds.
+        tokens_per_s (float, optional): Generation speed; None returns the whole reply at once.
+        responses (dict, optional): Per-game replies (env id or "*" -> str, list of str, or callable); scripted by default.
+        seed (int, optional): Seed for latencies, errors and the scripted players.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: Union[str, float, LatencyDistribution] = 0.0,
+                 error_rate: float = 0.0, error_codes: Iterable[int] = (429, 500), retry_after: Optional[float] = 0.1,
+                 tokens_per_s: Optional[float] = None, responses: Optional[Responses] = None, seed: Optional[int] = None):
+        self.latency = LatencyDistribution.parse(latency)
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.retry_after = retry_after
+        self.tokens_per_s = tokens_per_s
+        self.responses = responses or {}
+        self.stats = {"requests": 0, "errors": 0, "streams": 0, "disconnects": 0, "completion_tokens": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cycles: Dict[str, Iterable[str]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        """ Serve in a daemon thread and return self """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None: self._thread.join()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self):
+        """ Draw (injected error status or None, latency, scripted-player seed) under the lock """
+        with self._lock:
+            self.stats["requests"] += 1
+            error = self._rng.choice(self.error_codes) if self.error_codes and self._rng.random() < self.error_rate else None
+            if error is not None: self.stats["errors"] += 1
+            return error, self.latency.sample(self._rng), self._rng.randrange(2 ** 31)
+
+    def reply(self, messages: List[dict], seed: Optional[int] = None) -> str:
+        """ The assistant reply for a conversation (before stop sequences are applied) """
+        observation = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        env_id = detect_phase(observation)[0]
+        response = self.responses.get(env_id, self.responses.get("*"))
+        if response is None:
+            if env_id not in BASELINE_AGENTS: return RandomValidAgent(seed=seed).speak(observation)
+            return baseline_agent(env_id, seed=seed, rationale=True)(observation)
+        if callable(response): return response(observation)
+        if isinstance(response, str): return response
+        with self._lock:
+            cycle = self._cycles.setdefault(env_id, itertools.cycle(response))
+            return next(cycle)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    disable_nagle_algorithm = True  # headers and body are separate writes; Nagle would delay the body by ~40 ms
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items(): self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        mock: MockOpenAIServer = self.server.mock
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.split("?")[0].rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(body or b"{}")
+            messages = request["messages"]
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": {"message": f"Invalid request: {e}", "type": "invalid_request_error"}})
+            return
+
+        error, latency, seed = mock._draw()
+        time.sleep(latency)
+        if error is not None:
+            headers = {"Retry-After": f"{mock.retry_after:g}"} if mock.retry_after is not None else {}
+            kind = "rate_limit_error" if error == 429 else "server_error"
+            self._send_json(error, {"error": {"message": f"Injected {error} error", "type": kind, "code": error}}, headers)
+            return
+
+        text = apply_stop(mock.reply(messages, seed), request.get("stop"))
+        tokens = _TOKEN.findall(text) or ([text] if text else [])
+        model = request.get("model") or "mock"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        usage = {"prompt_tokens": sum(len(m.get("content") or "") for m in messages) // 4, "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        delay = 1.0 / mock.tokens_per_s if mock.tokens_per_s else 0.0
+        with mock._lock:
+            mock.stats["completion_tokens"] += len(tokens)
+            if request.get("stream"): mock.stats["streams"] += 1
+
+        if not request.get("stream"):
+            time.sleep(delay * len(tokens))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> dict:
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_event(chunk({"role": "assistant", "content": ""}))
+            for token in tokens:
+                if delay: time.sleep(delay)
+                self._write_event(chunk({"content": token}))
+            self._write_event(chunk({}, "stop"))
+            self._write_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client closed the stream early (e.g. once the action was complete)
+            with mock._lock: mock.stats["disconnects"] += 1
+            self.close_connection = True
+
+    def _write_event(self, payload: Union[dict, str]):
+        data = payload if isinstance(payload, str) else json.dumps(payload)
+        event = f"data: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+        self.wfile.flush()
+
+
+def start_in_thread(**kwargs) -> MockOpenAIServer:
+    """ Create a MockOpenAIServer (same arguments) and start serving it in a background thread """
+    return MockOpenAIServer(**kwargs).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat.completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S, uniform:LO,HI or lognormal:MU,SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-codes", default="429,500", help="comma-separated status codes for injected errors")
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--tokens-per-s", type=float, default=None)
+    parser.add_argument("--responses", default=None, help="JSON file mapping env id (or \"*\") to a reply or a list of replies")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f: responses = json.load(f)
+    server = MockOpenAIServer(host=args.host, port=args.port, latency=args.latency, error_rate=args.error_rate,
+                              error_codes=[int(c) for c in args.error_codes.split(",") if c],
+                              retry_after=args.retry_after, tokens_per_s=args.tokens_per_s, responses=responses, seed=args.seed)
+    print(f"Mock OpenAI server listening on {server.base_url} (set OPENAI_BASE_URL to this)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
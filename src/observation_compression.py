@@ -0,0 +1,237 @@
+"""
+Observation compression for long SecretMafia games.
+
+The env observation is the player's whole message history: every discussion
+line, vote and phase message since night 1. MafiaObservationCompressor sits
+between env.get_observation() and the agent and replaces the history with:
+
+  - the welcome/role message (kept verbatim),
+  - structured facts extracted by rules: alive and eliminated players, vote
+    tallies per day, role claims, investigation claims and vote intentions
+    per player, and private results (e.g. the Detective's investigations),
+  - optional rolling summaries of past days' discussions, and
+  - the messages of the current day verbatim (bounded by `max_recent_messages`).
+
+Parsing is incremental: each player's history is usually the previous one plus
+new messages, so only the new suffix is parsed (checked with a prefix hash),
+and every past day is summarized at most once (cached by its text).
+
+Use it through GameManager.set_observation_compressor() or wrap any agent with
+CompressedObservationAgent.
+"""
+import hashlib
+import re
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from agent import Agent, call_context
+
+_MESSAGE_START = re.compile(r"\n\[(GAME|Player (\d+))\] ")
+_ROLE_CLAIM = re.compile(r"\bI(?:'m| am)\s+(?:the\s+|a\s+|an\s+)?(detective|doctor|villager|mafia)\b", re.IGNORECASE)
+_INVESTIGATION_CLAIM = re.compile(r"\bPlayer\s*(\d+)\s+(?:is|IS)\s+(not\s+|NOT\s+)?(?:a\s+)?(mafia|innocent|villager|town)\b", re.IGNORECASE)
+_VOTE_INTENT = re.compile(r"\bvote\s+(?:for\s+)?(?:\[\s*(?:player\s*)?(\d+)\s*\]|player\s*(\d+))", re.IGNORECASE)
+_VOTE_TOKEN = re.compile(r"\[(?:player\s*)?(\d+)\]", re.IGNORECASE)
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass
+class MafiaFacts:
+    """ Facts extracted from one player's SecretMafia history """
+    intro: str = ""
+    players: List[int] = field(default_factory=list)
+    alive: List[int] = field(default_factory=list)
+    eliminated: List[Tuple[int, str]] = field(default_factory=list)        # (player, reason) in order
+    day: int = 0
+    phase: str = "Night"
+    day_votes: Dict[int, Dict[int, int]] = field(default_factory=dict)      # day -> voter -> target
+    night_votes: Dict[int, Dict[int, int]] = field(default_factory=dict)    # night -> voter -> target (Mafia only)
+    role_claims: Dict[int, List[str]] = field(default_factory=dict)
+    investigation_claims: Dict[int, List[str]] = field(default_factory=dict)
+    vote_intents: Dict[int, int] = field(default_factory=dict)               # latest stated intention per player
+    private_results: List[str] = field(default_factory=list)
+    day_discussions: Dict[int, List[str]] = field(default_factory=dict)     # day -> raw discussion lines
+    current: List[str] = field(default_factory=list)                        # raw messages since the current day started
+
+
+class MafiaStateExtractor:
+    """ Rule-based, incremental parser of a SecretMafia message history """
+    def __init__(self):
+        self.facts = MafiaFacts()
+        self._in_voting = False
+
+    def feed(self, text: str):
+        """ Parse newly appended history text (which must start at a message boundary) """
+        starts = list(_MESSAGE_START.finditer(text))
+        if starts and starts[0].start() > 0 and not self.facts.intro:
+            self._game_message(text[:starts[0].start()].strip())
+        for i, match in enumerate(starts):
+            body = text[match.end():starts[i + 1].start() if i + 1 < len(starts) else len(text)].rstrip("\n")
+            if match.group(2) is None: self._game_message(body)
+            else: self._player_message(int(match.group(2)), body)
+
+    def _game_message(self, body: str):
+        facts = self.facts
+        if body.startswith("Welcome to Secret Mafia!"):
+            facts.intro = body
+            players = re.search(r"Players: ((?:Player \d+(?:, )?)+)", body)
+            if players: facts.players = facts.alive = [int(p) for p in re.findall(r"\d+", players.group(1))]
+            facts.alive = list(facts.alive)
+            return
+        eliminated = re.match(r"Player (\d+) (was .+|has been .+)\.$", body)
+        if eliminated:
+            pid = int(eliminated.group(1))
+            if pid in facts.alive: facts.alive.remove(pid)
+            facts.eliminated.append((pid, eliminated.group(2)))
+        elif body.startswith("Day breaks"):
+            facts.day += 1
+            facts.phase = "Day-Discussion"
+            facts.day_discussions[facts.day] = []
+            facts.current = []
+            self._in_voting = False
+        elif body.startswith("Voting phase"):
+            facts.phase = "Day-Voting"
+            facts.day_votes.setdefault(facts.day, {})
+            self._in_voting = True
+        elif body.startswith("Night has fallen") or body.startswith("Night phase"):
+            facts.phase = "Night"
+            self._in_voting = False
+            if body.startswith("Night has fallen"): facts.night_votes.setdefault(facts.day + 1, {})
+        elif re.match(r"Player \d+ IS (?:NOT )?a Mafia member\.", body):
+            facts.private_results.append(f"Night {facts.day + 1}: {body}")
+        if facts.day: facts.current.append(f"[GAME] {body}")
+
+    def _player_message(self, pid: int, body: str):
+        facts = self.facts
+        if facts.day: facts.current.append(f"[Player {pid}] {body}")
+        votes = _VOTE_TOKEN.findall(body)
+        if facts.phase == "Day-Voting" and self._in_voting:
+            if votes: facts.day_votes[facts.day][pid] = int(votes[-1])
+            return
+        if facts.phase == "Night":
+            if votes and facts.day + 1 in facts.night_votes: facts.night_votes[facts.day + 1][pid] = int(votes[-1])
+            return
+        facts.day_discussions.setdefault(facts.day, []).append(f"[Player {pid}] {body}")
+        for role in _ROLE_CLAIM.findall(body):
+            claims = facts.role_claims.setdefault(pid, [])
+            if role.capitalize() not in claims: claims.append(role.capitalize())
+        for target, negated, verdict in _INVESTIGATION_CLAIM.findall(body):
+            mafia = verdict.lower() == "mafia" and not negated
+            claim = f"Player {target} {'is' if mafia else 'is not'} Mafia"
+            claims = facts.investigation_claims.setdefault(pid, [])
+            if claim not in claims: claims.append(claim)
+        intents = _VOTE_INTENT.findall(body)
+        if intents: facts.vote_intents[pid] = int(intents[-1][0] or intents[-1][1])
+
+
+class MafiaObservationCompressor:
+    """
+    Compress SecretMafia observations; observations of other games are returned unchanged.
+
+    Args:
+        summarizer (callable, optional): `summarizer(text) -> str` for past days' discussions, e.g. a small model.
+            Without it, past discussions are represented only by the extracted facts.
+        max_recent_messages (int): Verbatim messages kept from the current day (oldest dropped first).
+        max_cached_summaries (int): Summaries kept in the LRU cache.
+    """
+    def __init__(self, summarizer: Optional[Callable[[str], str]] = None, max_recent_messages: int = 40,
+                 max_cached_summaries: int = 256):
+        self.summarizer = summarizer
+        self.max_recent_messages = max_recent_messages
+        self.max_cached_summaries = max_cached_summaries
+        self.stats = {"calls": 0, "incremental": 0, "summaries": 0, "summary_hits": 0, "chars_in": 0, "chars_out": 0}
+        self._histories: Dict[Optional[int], Tuple[int, str, MafiaStateExtractor]] = {}
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+
+    def extract(self, observation: str, player_id: Optional[int] = None) -> MafiaFacts:
+        """ Return the facts for this history, parsing only what was appended since the last call for `player_id` """
+        cached = self._histories.get(player_id)
+        if cached is not None and len(observation) >= cached[0] and _digest(observation[:cached[0]]) == cached[1]:
+            extractor = cached[2]
+            extractor.feed(observation[cached[0]:])
+            self.stats["incremental"] += 1
+        else:
+            extractor = MafiaStateExtractor()
+            extractor.feed(observation)
+        self._histories[player_id] = (len(observation), _digest(observation), extractor)
+        return extractor.facts
+
+    def summarize(self, text: str) -> str:
+        """ Summarize `text` once; repeated requests for the same text are served from the cache """
+        key = _digest(text)
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            self.stats["summary_hits"] += 1
+            return self._summaries[key]
+        summary = self.summarizer(text).strip()
+        self.stats["summaries"] += 1
+        self._summaries[key] = summary
+        if len(self._summaries) > self.max_cached_summaries: self._summaries.popitem(last=False)
+        return summary
+
+    def render(self, facts: MafiaFacts) -> str:
+        """ Render the compressed observation """
+        lines = [facts.intro, "", "=== Game summary ==="]
+        lines.append(f"Day {facts.day}, phase: {facts.phase}" if facts.day else "Night 1")
+        lines.append("Alive: " + ", ".join(f"Player {p}" for p in facts.alive))
+        if facts.eliminated:
+            lines.append("Eliminated: " + "; ".join(f"Player {p} ({reason})" for p, reason in facts.eliminated))
+        for result in facts.private_results:
+            lines.append(f"Your result - {result}")
+        for night, votes in sorted(facts.night_votes.items()):
+            if votes: lines.append(f"Night {night} Mafia votes: " + ", ".join(f"P{v}->P{t}" for v, t in votes.items()))
+        for day, votes in sorted(facts.day_votes.items()):
+            if not votes: continue
+            tally = Counter(votes.values()).most_common()
+            lines.append(f"Day {day} votes: " + ", ".join(f"P{v}->P{t}" for v, t in votes.items())
+                         + " | tally: " + ", ".join(f"P{t}: {n}" for t, n in tally))
+        claimants = sorted(set(facts.role_claims) | set(facts.investigation_claims) | set(facts.vote_intents))
+        if claimants:
+            lines.append("Claims:")
+            for pid in claimants:
+                parts = [f"claims {', '.join(facts.role_claims[pid])}"] if pid in facts.role_claims else []
+                parts += facts.investigation_claims.get(pid, [])
+                if pid in facts.vote_intents: parts.append(f"wants to vote Player {facts.vote_intents[pid]}")
+                lines.append(f"  Player {pid}: " + "; ".join(parts))
+        if self.summarizer is not None:
+            for day, discussion in sorted(facts.day_discussions.items()):
+                if day == facts.day or not discussion: continue
+                lines.append(f"Day {day} discussion summary: {self.summarize(chr(10).join(discussion))}")
+        recent = facts.current[-self.max_recent_messages:]
+        if recent:
+            lines += ["", "=== Current day ==="] + recent
+        return "\n".join(lines)
+
+    def __call__(self, observation: str, player_id: Optional[int] = None) -> str:
+        """
+        Return the compressed observation.
+
+        Args:
+            observation (str): The full observation text from the env.
+            player_id (int, optional): Seat of the observing player; keys the incremental cache.
+        """
+        if "Welcome to Secret Mafia!" not in observation: return observation
+        facts = self.extract(observation, player_id)
+        if not facts.day: return observation  # nothing to compress before the first day
+        compressed = self.render(facts)
+        if len(compressed) >= len(observation): compressed = observation  # early in the game the facts are not shorter yet
+        self.stats["calls"] += 1
+        self.stats["chars_in"] += len(observation)
+        self.stats["chars_out"] += len(compressed)
+        return compressed
+
+
+class CompressedObservationAgent(Agent):
+    """ Wrap an agent so it only ever sees compressed observations """
+    def __init__(self, agent: Agent, compressor: Optional[MafiaObservationCompressor] = None):
+        super().__init__()
+        self.agent = agent
+        self.compressor = compressor if compressor is not None else MafiaObservationCompressor()
+
+    def __call__(self, observation: str) -> str:
+        # the format markers (e.g. "Voting phase") stay in the compressed text, so AUTO detection keeps working
+        with call_context(action_format=self.resolve_action_format(observation)):
+            return self.agent(self.compressor(observation))
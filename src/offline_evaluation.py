@@ -5,7 +5,11 @@ We evaluate Qwen/Qwen3-1.7B against a fixed opponent
 (google/gemini-2.0-flash-001).
 """
 import os
+import random
+import time
 from collections import defaultdict
+from statistics import mean, stdev
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -13,49 +17,154 @@ from tqdm import tqdm
 
 import textarena as ta
 
+from checkpointing import EpisodeLog
+from result_cache import ResultCache, agent_fingerprint
+from results_store import ResultsStore, RunRecorder
+from role_scheduling import MAFIA_ENV_ID, RoleStratifiedScheduler, seat_roles
+from scripted_agents import baseline_agent
+from sequential_testing import OUTCOME_SCORES, SequentialStopRule
+
 NUM_EPISODES = 8
 EVAL_ENV_IDS = [("TicTacToe-v0", 2), ("Snake-v0", 4)]  # (env-id, num_players)
 OPPONENT_NAME = "google/gemini-2.0-flash-001"
 FILE_NAME = "eval_summary.csv"
+# Evaluate against the zero-cost scripted baseline of each env (scripted_agents.baseline_agent) instead of OPPONENT_NAME.
+# Only SecretMafia, ColonelBlotto, ThreePlayerIPD and Codenames have one; set EVAL_ENV_IDS accordingly.
+USE_SCRIPTED_BASELINE = False
+# Adaptive stopping: keyword arguments of sequential_testing.SequentialStopRule, e.g.
+# dict(method="sprt", p0=0.4, p1=0.6, max_episodes=200) or dict(method="wilson", precision=0.1).
+# Each env then plays until its rule stops it instead of exactly NUM_EPISODES.
+STOP_RULE = None
+# Paired design: every seed is played once per seat assignment of the model (both Blotto sides, each IPD/Mafia
+# seat, each Codenames team) and an "episode" is one seed. Luck of the deal (roles, boards) then cancels out within
+# a seed; use STOP_RULE method "t", whose interval uses the lower variance of the per-seed scores.
+PAIRED_SEEDS = False
+FIRST_SEED = 0
+# Seats the model occupies together in one game of the paired design; default: every single seat
+MODEL_SEATS = {"Codenames-v0": [(0, 1), (2, 3)]}  # the model plays a whole Codenames team
+# Role-stratified SecretMafia evaluation: keyword arguments of role_scheduling.RoleStratifiedScheduler, e.g.
+# dict(precision=0.1, max_episodes=200). The model's role is chosen per episode through the seed, and per-role
+# win rates with intervals are reported and saved next to FILE_NAME. None evaluates SecretMafia like other envs.
+ROLE_STRATIFIED = None
+ROLE_FILE_NAME = "eval_roles.csv"
+# Checkpoint/resume: every finished episode is appended to this JSONL log, and a partial summary is written next to
+# it every SNAPSHOT_EVERY episodes (also readable with `python src/checkpointing.py LOG`). A restarted run replays the
+# (env, seed, seat) units already in the log instead of playing them again. Use a fresh log for another model/opponent.
+# Episodes are then always seeded: without PAIRED_SEEDS episode i plays seed FIRST_SEED + i on seeded_seat(seed).
+CHECKPOINT_FILE = None  # e.g. "eval_results/episodes.jsonl"
+SNAPSHOT_EVERY = 10
+# Result cache (SQLite file, e.g. "eval_results/result_cache.sqlite"): episodes whose model, opponent (by fingerprint:
+# class, configuration, prompt, code), env version, seed and seats are unchanged since an earlier run are taken from the
+# cache instead of being played. Episodes are then always seeded, as with CHECKPOINT_FILE.
+RESULT_CACHE = None
+# Results store (SQLite file, e.g. "eval_results/results.sqlite"): every run and each episode it plays is appended, for
+# comparisons across models and dates (`python src/results_store.py DB compare`). RUN_LABEL tags the run. Episodes
+# replayed from CHECKPOINT_FILE or taken from RESULT_CACHE are not appended again; they belong to the run that played them.
+RESULTS_DB = None
+RUN_LABEL = None
 
-# Model to evaluate
-model = ta.agents.HFLocalAgent(
-    model_name="Qwen/Qwen3-4B",
-    max_new_tokens=512,
-)
-
-# Fixed opponent
-opponent = ta.agents.OpenRouterAgent(model_name=OPPONENT_NAME)
 
+def run_game(env_id: str, num_players: int, model, opponent, model_pids: Optional[Sequence[int]] = None,
+             seed: Optional[int] = None) -> dict:
+    """
+    Play one episode and return per-episode stats for the *model* player.
 
-def run_game(env_id: str, num_players: int, model, opponent) -> dict:
-    """Play one episode and return per-episode stats for the *model* player."""
+    Args:
+        model_pids: Seats played by the model; default: one random seat.
+        seed: Env seed (roles, boards); default: unseeded.
+    """
+    start = time.perf_counter()
     env = ta.make(env_id)
-    env.reset(num_players=num_players)
+    env.reset(num_players=num_players, seed=seed)
 
-    model_pid = np.random.randint(0, num_players)    # random seat
+    if model_pids is None:
+        model_pids = (np.random.randint(0, num_players),)    # random seat
     done = False
 
     while not done:
         pid, obs = env.get_observation()
-        action = model(obs) if pid == model_pid else opponent(obs)
+        action = model(obs) if pid in model_pids else opponent(obs)
         done, _ = env.step(action=action)
 
     rewards, game_info = env.close()
 
     return {
-        "model_reward": rewards[model_pid],
-        "opponent_reward": np.mean([rewards[i] for i in range(num_players) if i != model_pid]),
-        "invalid_move": bool(game_info[model_pid]["invalid_move"]),
-        "turn_count":  game_info[model_pid]["turn_count"],
+        "model_reward": np.mean([rewards[i] for i in model_pids]),
+        "opponent_reward": np.mean([rewards[i] for i in range(num_players) if i not in model_pids]),
+        "invalid_move": any(game_info[i]["invalid_move"] for i in model_pids),
+        "turn_count":  max(game_info[i]["turn_count"] for i in model_pids),
+        "model_pids": tuple(model_pids),
+        "seed": seed,
+        "duration_s": time.perf_counter() - start,
     }
 
 
-results = defaultdict(list)
+def run_unit(env_id: str, num_players: int, model, opponent, model_pids: Sequence[int], seed: int,
+             log: Optional[EpisodeLog] = None, cache: Optional[ResultCache] = None,
+             recorder: Optional[RunRecorder] = None) -> dict:
+    """
+    run_game, but take the result from `log` if this unit was already played in this run, or from `cache` if the
+    same episode was played by an earlier run. New results are added to both, and only they go to `recorder`: replayed
+    and cached episodes are already in the results store under the run that played them.
+    """
+    result = log.get(env_id, seed, model_pids) if log is not None else None
+    if result is not None: return result
+    result = cache.get(model, opponent, env_id, seed, model_pids) if cache is not None else None
+    fresh = result is None
+    if fresh:
+        result = run_game(env_id, num_players, model, opponent, model_pids=model_pids, seed=seed)
+        if cache is not None: cache.put(model, opponent, env_id, seed, model_pids, result)
+    if log is not None: log.append(env_id, result)
+    if fresh and recorder is not None: recorder.add(env_id, result, model_role(env_id, num_players, result))
+    return result
+
+
+def seat_assignments(env_id: str, num_players: int) -> List[Tuple[int, ...]]:
+    """ Seat sets the model occupies in the paired design: MODEL_SEATS, or every single seat """
+    return MODEL_SEATS.get(env_id) or [(pid,) for pid in range(num_players)]
+
+
+def seeded_seat(seed: int, num_players: int) -> int:
+    """
+    The model's seat in an unpaired seeded episode. It is drawn from its own stream: the env deals roles from
+    `random.seed(seed)`, so a seat drawn with the same seed would be correlated with the role it gets.
+    """
+    return random.Random(f"seat-{seed}").randrange(num_players)
+
+
+def run_paired_seed(env_id: str, num_players: int, model, opponent, seed: int, log: Optional[EpisodeLog] = None,
+                    cache: Optional[ResultCache] = None, recorder: Optional[RunRecorder] = None) -> List[dict]:
+    """ Play `seed` once for every seat assignment of the model """
+    return [run_unit(env_id, num_players, model, opponent, seats, seed, log, cache, recorder)
+            for seats in seat_assignments(env_id, num_players)]
+
+
+def model_role(env_id: str, num_players: int, result: dict) -> Optional[str]:
+    """ The model's SecretMafia role in a seeded single-seat episode, else None """
+    if env_id != MAFIA_ENV_ID or result["seed"] is None or len(result["model_pids"]) != 1: return None
+    return seat_roles(result["seed"], num_players)[result["model_pids"][0]]
 
-outer_bar = tqdm(EVAL_ENV_IDS, desc="Environments")
-for env_id, num_players in outer_bar:
 
+def outcome_of(result: dict) -> str:
+    """ "win", "loss" or "draw" for the model in one episode """
+    if result["model_reward"] > result["opponent_reward"]: return "win"
+    if result["model_reward"] < result["opponent_reward"]: return "loss"
+    return "draw"
+
+
+def evaluate_env(env_id: str, num_players: int, model, opponent, stop_rule: SequentialStopRule = None,
+                 paired: bool = None, log: Optional[EpisodeLog] = None, cache: Optional[ResultCache] = None,
+                 recorder: Optional[RunRecorder] = None) -> dict:
+    """
+    Evaluate the model on one env: NUM_EPISODES episodes, or until `stop_rule` stops it.
+
+    With `paired` (default PAIRED_SEEDS) an episode is one seed played in every seat assignment, and `stop_rule`
+    is updated with the seed's mean score. With `log` or `cache` episodes are seeded, and units already in the log or
+    the cache are not replayed. `recorder` receives every episode played in this run for the results store.
+
+    Returns the per-environment summary row.
+    """
+    paired = PAIRED_SEEDS if paired is None else paired
     # per-environment aggregates
     stats = dict(
         wins=0,
@@ -66,60 +175,191 @@ for env_id, num_players in outer_bar:
         total_invalid_moves=0,
         total_turns=0,
     )
+    outcome_keys = {"win": "wins", "loss": "losses", "draw": "draws"}
 
-    inner_bar = tqdm(range(NUM_EPISODES), desc=f"Evaluating {env_id}", leave=False)
-    for _ in inner_bar:
-        outcome = run_game(env_id, num_players, model, opponent)
-
-        # W/L/D
-        if outcome["model_reward"] > outcome["opponent_reward"]:
-            stats["wins"] += 1
-        elif outcome["model_reward"] < outcome["opponent_reward"]:
-            stats["losses"] += 1
+    max_episodes = stop_rule.max_episodes if stop_rule is not None else NUM_EPISODES
+    inner_bar = tqdm(range(max_episodes), desc=f"Evaluating {env_id}", leave=False)
+    games_done = 0
+    seed_scores = []
+    for episode in inner_bar:
+        if paired:
+            episode_results = run_paired_seed(env_id, num_players, model, opponent, seed=FIRST_SEED + episode, log=log, cache=cache,
+                                              recorder=recorder)
+        elif log is not None or cache is not None:
+            seed = FIRST_SEED + episode
+            episode_results = [run_unit(env_id, num_players, model, opponent, (seeded_seat(seed, num_players),), seed, log, cache,
+                                        recorder)]
         else:
-            stats["draws"] += 1
+            episode_results = [run_game(env_id, num_players, model, opponent)]
+            if recorder is not None:
+                recorder.add(env_id, episode_results[0], None)
+        outcomes = [outcome_of(result) for result in episode_results]
 
-        # Accumulate metrics
-        stats["total_reward_model"]     += outcome["model_reward"]
-        stats["total_reward_opponent"]  += outcome["opponent_reward"]
-        stats["total_invalid_moves"]    += int(outcome["invalid_move"])
-        stats["total_turns"]            += outcome["turn_count"]
+        for result, outcome in zip(episode_results, outcomes):
+            # W/L/D
+            stats[outcome_keys[outcome]] += 1
+
+            # Accumulate metrics
+            stats["total_reward_model"]     += result["model_reward"]
+            stats["total_reward_opponent"]  += result["opponent_reward"]
+            stats["total_invalid_moves"]    += int(result["invalid_move"])
+            stats["total_turns"]            += result["turn_count"]
+        games_done += len(episode_results)
+        seed_scores.append(mean(OUTCOME_SCORES[outcome] for outcome in outcomes))
 
         # Live progress bar
-        games_done = _ + 1
-        inner_bar.set_postfix({
+        postfix = {
             "Win%":   f"{stats['wins']   / games_done:.1%}",
             "Loss%":  f"{stats['losses'] / games_done:.1%}",
             "Draw%":  f"{stats['draws']  / games_done:.1%}",
             "Inv%":   f"{stats['total_invalid_moves'] / games_done:.1%}",
             "Turns":  f"{stats['total_turns'] / games_done:.1f}",
-        })
+        }
+        if stop_rule is not None:
+            stop_rule.update(seed_scores[-1] if paired else outcomes[0])
+            lo, hi = stop_rule.interval()
+            postfix["CI"] = f"[{lo:.2f}, {hi:.2f}]"
+        inner_bar.set_postfix(postfix)
+        if stop_rule is not None and stop_rule.should_stop():
+            break
+    inner_bar.close()
 
-    # write per-environment summary
-    results["env_id"].append(env_id)
-    results["win_rate"].append(stats["wins"] / NUM_EPISODES)
-    results["loss_rate"].append(stats["losses"] / NUM_EPISODES)
-    results["draw_rate"].append(stats["draws"] / NUM_EPISODES)
-    results["invalid_rate"].append(stats["total_invalid_moves"] / NUM_EPISODES)
-    results["avg_turns"].append(stats["total_turns"] / NUM_EPISODES)
-    results["avg_model_reward"].append(stats["total_reward_model"] / NUM_EPISODES)
-    results["avg_opponent_reward"].append(stats["total_reward_opponent"] / NUM_EPISODES)
+    row = {
+        "env_id": env_id,
+        "win_rate": stats["wins"] / games_done,
+        "loss_rate": stats["losses"] / games_done,
+        "draw_rate": stats["draws"] / games_done,
+        "invalid_rate": stats["total_invalid_moves"] / games_done,
+        "avg_turns": stats["total_turns"] / games_done,
+        "avg_model_reward": stats["total_reward_model"] / games_done,
+        "avg_opponent_reward": stats["total_reward_opponent"] / games_done,
+    }
+    if paired:
+        row["seeds"] = len(seed_scores)
+        row["games"] = games_done
+        row["paired_score"] = mean(seed_scores)
+        row["paired_score_se"] = stdev(seed_scores) / np.sqrt(len(seed_scores)) if len(seed_scores) > 1 else float("nan")
+    if stop_rule is not None:
+        row.update(stop_rule.summary())
+    return row
 
-df = pd.DataFrame(results)
 
-# Pretty-print to console (Markdown table looks nice in most terminals/Jupyter)
-print("\n=== Evaluation Summary ===")
-print(df.to_markdown(index=False, floatfmt=".3f"))
+def evaluate_mafia_roles(num_players: int, model, opponent, scheduler: RoleStratifiedScheduler,
+                         log: Optional[EpisodeLog] = None, cache: Optional[ResultCache] = None,
+                         recorder: Optional[RunRecorder] = None) -> Tuple[dict, List[dict]]:
+    """
+    Evaluate the model on SecretMafia with role-stratified scheduling.
+
+    Returns the per-environment summary row (same columns as evaluate_env, with the win rate re-weighted by the natural
+    role frequencies) and one row per role.
+    """
+    outcomes = defaultdict(int)
+    inner_bar = tqdm(total=scheduler.max_episodes, desc=f"Evaluating {MAFIA_ENV_ID} by role", leave=False)
+    while (episode := scheduler.next_episode()) is not None:
+        role, seed, seat = episode
+        result = run_unit(MAFIA_ENV_ID, num_players, model, opponent, (seat,), seed, log, cache, recorder)
+        outcome = outcome_of(result)
+        scheduler.update(role, outcome)
+        outcomes[outcome] += 1
+        outcomes["invalid"] += int(result["invalid_move"])
+        outcomes["turns"] += result["turn_count"]
+        outcomes["reward_model"] += result["model_reward"]
+        outcomes["reward_opponent"] += result["opponent_reward"]
+
+        inner_bar.update(1)
+        inner_bar.set_postfix({r["role"]: f"{r['win_rate']:.2f} ({r['episodes']})" for r in scheduler.summary()[:-1]})
+    inner_bar.close()
+
+    episodes = scheduler.episodes
+    estimate, lo, hi = scheduler.overall()
+    row = {
+        "env_id": MAFIA_ENV_ID,
+        "win_rate": estimate,
+        "loss_rate": outcomes["loss"] / episodes,
+        "draw_rate": outcomes["draw"] / episodes,
+        "invalid_rate": outcomes["invalid"] / episodes,
+        "avg_turns": outcomes["turns"] / episodes,
+        "avg_model_reward": outcomes["reward_model"] / episodes,
+        "avg_opponent_reward": outcomes["reward_opponent"] / episodes,
+        "episodes": episodes,
+        "win_rate_lo": lo,
+        "win_rate_hi": hi,
+    }
+    return row, scheduler.summary()
+
+
+def main():
+    # Model to evaluate
+    model = ta.agents.HFLocalAgent(
+        model_name="Qwen/Qwen3-4B",
+        max_new_tokens=512,
+    )
+
+    # Fixed opponent (built up front, so an env without a scripted baseline fails before anything is played)
+    opponent = None if USE_SCRIPTED_BASELINE else ta.agents.OpenRouterAgent(model_name=OPPONENT_NAME)
+    baselines = {env_id: baseline_agent(env_id) for env_id, _ in EVAL_ENV_IDS} if USE_SCRIPTED_BASELINE else {}
+
+    log = EpisodeLog(CHECKPOINT_FILE, snapshot_every=SNAPSHOT_EVERY) if CHECKPOINT_FILE else None
+    if log is not None and len(log):
+        print(f"Resuming from {CHECKPOINT_FILE}: {len(log)} episodes already played")
+    cache = ResultCache(RESULT_CACHE) if RESULT_CACHE else None
+    recorder = None
+    if RESULTS_DB:
+        store = ResultsStore(RESULTS_DB)
+        run_id = store.start_run(
+            model=getattr(model, "model_name", type(model).__name__), model_fingerprint=agent_fingerprint(model),
+            opponent="scripted baseline" if USE_SCRIPTED_BASELINE else OPPONENT_NAME,
+            opponent_fingerprint=None if opponent is None else agent_fingerprint(opponent), label=RUN_LABEL,
+            config=dict(env_ids=EVAL_ENV_IDS, num_episodes=NUM_EPISODES, stop_rule=STOP_RULE, paired=PAIRED_SEEDS,
+                        role_stratified=ROLE_STRATIFIED))
+        recorder = RunRecorder(store, run_id)
+
+    rows = []
+    role_rows = []
+
+    outer_bar = tqdm(EVAL_ENV_IDS, desc="Environments")
+    for env_id, num_players in outer_bar:
+        env_opponent = baselines[env_id] if USE_SCRIPTED_BASELINE else opponent
+        stop_rule = SequentialStopRule(**STOP_RULE) if STOP_RULE is not None else None
+
+        if env_id == MAFIA_ENV_ID and ROLE_STRATIFIED is not None:
+            scheduler = RoleStratifiedScheduler(num_players=num_players, **ROLE_STRATIFIED)
+            row, role_rows = evaluate_mafia_roles(num_players, model, env_opponent, scheduler, log, cache, recorder)
+        else:
+            row = evaluate_env(env_id, num_players, model, env_opponent, stop_rule, log=log, cache=cache, recorder=recorder)
+
+        # write per-environment summary
+        rows.append(row)
+
+    if log is not None:
+        log.close()
+    if cache is not None:
+        print(f"Result cache: {cache.stats['hits']} episodes reused, {cache.stats['misses']} played")
+    df = pd.DataFrame(rows)
+
+    # Pretty-print to console (Markdown table looks nice in most terminals/Jupyter)
+    print("\n=== Evaluation Summary ===")
+    print(df.to_markdown(index=False, floatfmt=".3f"))
+    if role_rows:
+        print(f"\n=== {MAFIA_ENV_ID} by role ===")
+        print(pd.DataFrame(role_rows).to_markdown(index=False, floatfmt=".3f"))
+
+    """
+    Should look like this:
+    | env_id       |   win_rate |   loss_rate |   draw_rate |   invalid_rate |   avg_turns |   avg_model_reward |   avg_opponent_reward |
+    |:-------------|-----------:|------------:|------------:|---------------:|------------:|-------------------:|----------------------:|
+    | TicTacToe-v0 |      0.500 |       0.375 |       0.125 |          0.000 |       4.125 |              0.125 |                -0.125 |
+    | Snake-v0     |      0.250 |       0.625 |       0.125 |          0.000 |       3.875 |             -0.458 |                 0.028 |
+    """
+
+    # Persist to CSV
+    os.makedirs("eval_results", exist_ok=True)
+    df.to_csv(f"eval_results/{FILE_NAME}", index=False)
+    print(f"\nSaved -> eval_results/{FILE_NAME}")
+    if role_rows:
+        pd.DataFrame(role_rows).to_csv(f"eval_results/{ROLE_FILE_NAME}", index=False)
+        print(f"Saved -> eval_results/{ROLE_FILE_NAME}")
 
-"""
-Should look like this:
-| env_id       |   win_rate |   loss_rate |   draw_rate |   invalid_rate |   avg_turns |   avg_model_reward |   avg_opponent_reward |
-|:-------------|-----------:|------------:|------------:|---------------:|------------:|-------------------:|----------------------:|
-| TicTacToe-v0 |      0.500 |       0.375 |       0.125 |          0.000 |       4.125 |              0.125 |                -0.125 |
-| Snake-v0     |      0.250 |       0.625 |       0.125 |          0.000 |       3.875 |             -0.458 |                 0.028 |
-"""
 
-# Persist to CSV
-os.makedirs("eval_results", exist_ok=True)
-df.to_csv(f"eval_results/{FILE_NAME}", index=False)
-print(f"\nSaved -> eval_results/{FILE_NAME}")
+if __name__ == "__main__":
+    main()
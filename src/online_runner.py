@@ -0,0 +1,265 @@
+"""
+Long-running online runner for both competition tracks.
+
+Unlike online_play_track1.py / online_play_track2.py, which load the model,
+play a single match and exit, this runner loads the agent once and keeps
+re-queuing for back-to-back matches. Several online sessions can run
+concurrently and share the same loaded model. Dropped connections are
+retried with exponential backoff, and per-match latency is reported.
+
+For offline testing, --local-standin replaces the online server with a local
+stand-in. It exposes the same single-seat interface and plays the other seats
+with a local opponent.
+
+Usage:
+    python online_runner.py --track "Social Detection" --model-name "MyTeam_Agent_v1" \\
+        --model-description "..." --team-hash MG25-XXXXXXXXXX --sessions 2
+    python online_runner.py --track Generalization --agent openai --model gpt-4o-mini --local-standin --matches 6
+"""
+import argparse
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from agent import Agent, AgentError, FormatFallbackAgent, LLMAgent, OpenAIAgent
+from game_manager import GameManager
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TRACK_ENV_IDS = {
+    "Social Detection": ["SecretMafia-v0"],
+    "Generalization": ["Codenames-v0", "ColonelBlotto-v0", "ThreePlayerIPD-v0"],
+}
+
+
+class LockedAgent(Agent):
+    """ Serializes calls to a shared agent, e.g. one local model used by several concurrent sessions """
+    def __init__(self, agent: Agent):
+        super().__init__()
+        self.agent = agent
+        self._lock = threading.Lock()
+
+    def __call__(self, observation: str) -> str:
+        with self._lock:
+            return self.agent(observation)
+
+
+class OnlineEnvFactory:
+    """ Creates online envs via ta.make_mgc_online, registering the model once and reusing its token afterwards """
+    def __init__(self, track: str, model_name: str, model_description: str, team_hash: str, agent: Agent, small_category: bool = False):
+        self.track = track
+        self.model_name = model_name
+        self.model_description = model_description
+        self.team_hash = team_hash
+        self.agent = agent
+        self.small_category = small_category
+        self.model_token: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        import textarena as ta
+        with self._lock:  # the first call registers the model, later calls reuse the token
+            env = ta.make_mgc_online(
+                track=self.track,
+                model_name=self.model_name,
+                model_token=self.model_token,
+                model_description=self.model_description,
+                team_hash=self.team_hash,
+                agent=self.agent,
+                small_category=self.small_category
+            )
+            self.model_token = self.model_token or getattr(env, "model_token", None)
+        return env
+
+
+class LocalOnlineStandIn:
+    """
+    Local stand-in for the online matchmaking server.
+
+    Behaves like the env returned by ta.make_mgc_online: reset(num_players=1), then only the observations of our own
+    seat are returned. The other seats are played by `opponent`.
+    """
+    def __init__(self, track: str, opponent: Agent, seed: Optional[int] = None):
+        self.env_ids = TRACK_ENV_IDS[track]
+        self.opponent = opponent
+        self.seed = seed
+        self.env_id = None
+        self.seat = None
+        self._done = False
+        self._info: Dict[str, Any] = {}
+
+    def reset(self, num_players: int = 1, seed: Optional[int] = None):
+        import textarena as ta
+        assert num_players == 1, "Online envs are always reset with num_players=1"
+        rng = random.Random(seed if seed is not None else self.seed)
+        self.env_id = rng.choice(self.env_ids)
+        num_seats = GameManager.GAME_PLAYER_COUNT[self.env_id]
+        self.seat = rng.randrange(num_seats)
+        self.env = ta.make(self.env_id)
+        self.env.reset(num_players=num_seats, seed=seed if seed is not None else self.seed)
+        self._done = False
+        self._advance()
+
+    def _advance(self):
+        """ Let the opponents play until it is our seat's turn or the game is over """
+        while not self._done:
+            pid, observation = self.env.get_observation()
+            if pid == self.seat:
+                self._pending = (pid, observation)
+                return
+            self._done, self._info = self.env.step(action=self.opponent(observation))
+
+    def get_observation(self):
+        return self._pending
+
+    def step(self, action: str):
+        self._done, self._info = self.env.step(action=action)
+        self._advance()
+        return self._done, self._info
+
+    def close(self):
+        rewards, game_info = self.env.close()
+        return {0: rewards[self.seat]}, {0: game_info[self.seat]}
+
+
+class OnlineRunner:
+    """
+    Plays back-to-back matches with one loaded agent.
+
+    Args:
+        agent: The agent shared by all sessions.
+        env_factory: Callable returning a fresh (online or stand-in) env for each match.
+        sessions (int): Number of concurrent matches.
+        max_matches (int, optional): Stop after this many completed matches in total; None runs until interrupted.
+        reconnect_delay (float): First backoff delay after a failed match, doubled per consecutive failure.
+        max_reconnect_delay (float): Upper bound of the backoff delay.
+        log_file (str, optional): Append one JSON line per match.
+    """
+    def __init__(self, agent: Agent, env_factory: Callable[[], Any], sessions: int = 1, max_matches: Optional[int] = None,
+                 reconnect_delay: float = 5.0, max_reconnect_delay: float = 300.0, log_file: Optional[str] = None):
+        self.agent = agent
+        self.env_factory = env_factory
+        self.sessions = sessions
+        self.max_matches = max_matches
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.log_file = log_file
+        self.matches: List[Dict[str, Any]] = []
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def play_match(self) -> Dict[str, Any]:
+        """ Play one match and return its timing and outcome """
+        created = time.monotonic()
+        env = self.env_factory()
+        env.reset(num_players=1)
+        first_observation, turn_times, done = None, [], False
+        while not done:
+            player_id, observation = env.get_observation()
+            if first_observation is None: first_observation = time.monotonic()
+            start = time.monotonic()
+            try:
+                action = self.agent(observation)
+            except AgentError as e:
+                # never send the error text as a move; a well-formed placeholder keeps the match alive
+                logger.warning(f"Agent failed to act ({e}); playing a fallback move")
+                action = FormatFallbackAgent()(observation)
+            turn_times.append(time.monotonic() - start)
+            done, step_info = env.step(action=action)
+        rewards, game_info = env.close()
+        finished = time.monotonic()
+        return {
+            "env_id": getattr(env, "env_id", None),
+            "reward": next(iter(rewards.values()), None) if rewards else None,
+            "turns": len(turn_times),
+            "queue_s": (first_observation or finished) - created,
+            "match_s": finished - created,
+            "mean_turn_s": statistics.mean(turn_times) if turn_times else 0.0,
+            "max_turn_s": max(turn_times) if turn_times else 0.0,
+        }
+
+    def _session(self, session_id: int):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                record = self.play_match()
+            except Exception as e:
+                with self._lock: self.failures += 1
+                logger.warning(f"Session {session_id}: match failed ({e}); retrying in {delay:.0f}s")
+                self._stop.wait(delay)
+                delay = min(self.max_reconnect_delay, delay * 2)
+                continue
+            delay = self.reconnect_delay
+            record["session"] = session_id
+            with self._lock:
+                self.matches.append(record)
+                if self.log_file:
+                    with open(self.log_file, "a") as f: f.write(json.dumps(record) + "\n")
+                if self.max_matches is not None and len(self.matches) >= self.max_matches: self._stop.set()
+            logger.info(f"Session {session_id}: match {len(self.matches)} done in {record['match_s']:.1f}s "
+                        f"(queue {record['queue_s']:.1f}s, {record['turns']} turns, {record['mean_turn_s']:.2f}s/turn, reward {record['reward']})")
+
+    def run(self) -> Dict[str, Any]:
+        """ Run all sessions until `max_matches` is reached or the process is interrupted, then return the summary """
+        threads = [threading.Thread(target=self._session, args=(i,), daemon=True) for i in range(self.sessions)]
+        for t in threads: t.start()
+        try:
+            while any(t.is_alive() for t in threads): time.sleep(0.5)
+        except KeyboardInterrupt:
+            logger.info("Stopping after the current matches...")
+            self._stop.set()
+        return self.summary()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock: matches = list(self.matches)
+        match_s = sorted(m["match_s"] for m in matches)
+        return {
+            "matches": len(matches),
+            "failures": self.failures,
+            "median_match_s": statistics.median(match_s) if match_s else None,
+            "p95_match_s": match_s[min(len(match_s) - 1, int(0.95 * len(match_s)))] if match_s else None,
+            "median_queue_s": statistics.median(m["queue_s"] for m in matches) if matches else None,
+            "mean_turn_s": statistics.mean(m["mean_turn_s"] for m in matches) if matches else None,
+            "mean_reward": statistics.mean(m["reward"] for m in matches if m["reward"] is not None) if matches else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running online runner")
+    parser.add_argument("--track", choices=list(TRACK_ENV_IDS), required=True)
+    parser.add_argument("--model-name", default="Test LLM agent", help="name registered for the online arena")
+    parser.add_argument("--model-description", default="")
+    parser.add_argument("--team-hash", default="MG25-XXXXXXXXXX")
+    parser.add_argument("--small-category", action="store_true", help="participate in the Efficient Division")
+    parser.add_argument("--agent", choices=["hf", "openai"], default="hf")
+    parser.add_argument("--model", default="deepseek-ai/DeepSeek-R1-0528-Qwen3-8B", help="HF model id or OpenAI model name")
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent online sessions sharing the loaded model")
+    parser.add_argument("--serialize", action="store_true", help="serialize model calls across sessions (one GPU)")
+    parser.add_argument("--matches", type=int, default=None, help="stop after this many matches")
+    parser.add_argument("--log-file", default=None, help="append one JSON line per match")
+    parser.add_argument("--local-standin", action="store_true", help="play against a local stand-in instead of the online server")
+    args = parser.parse_args()
+
+    agent = LLMAgent(model_name=args.model) if args.agent == "hf" else OpenAIAgent(model_name=args.model)
+    shared = LockedAgent(agent) if args.serialize else agent
+    if args.local_standin:
+        env_factory = lambda: LocalOnlineStandIn(track=args.track, opponent=shared)
+    else:
+        env_factory = OnlineEnvFactory(args.track, args.model_name, args.model_description, args.team_hash, agent, args.small_category)
+
+    runner = OnlineRunner(shared, env_factory, sessions=args.sessions, max_matches=args.matches, log_file=args.log_file)
+    try:
+        print(json.dumps(runner.run(), indent=2))
+    finally:
+        # agents that own worker threads (e.g. AnytimeAgent) release them here
+        if hasattr(agent, "close"): agent.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Request layer for API-backed agents: per-endpoint rate limiting, retries with
+exponential backoff and jitter, turn-deadline awareness and hedged requests.
+
+A transient failure (HTTP 429, 5xx, timeouts, dropped connections) is retried
+instead of being turned into the agent's action, and all agents that talk to
+the same endpoint share one token bucket so they stay within a common quota.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", "ConnectionError", "TimeoutError"}
+
+
+class DeadlineExceeded(Exception):
+    """ Raised when the turn budget runs out before a request succeeds """
+
+
+class TokenBucket:
+    """ Thread-safe token bucket: `rate` requests per second with bursts of up to `capacity` """
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for a refill if necessary.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in seconds; None waits indefinitely, 0 does not wait.
+
+        Returns:
+            bool: True if a token was taken, False if the timeout expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_for = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return False
+                wait_for = min(wait_for, remaining)
+            time.sleep(wait_for)
+
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(endpoint: str, rate: float, capacity: Optional[float] = None) -> TokenBucket:
+    """
+    Return the token bucket shared by every caller of `endpoint`, creating it on first use.
+
+    Raises:
+        ValueError: If the endpoint already has a bucket with a different rate or capacity.
+    """
+    with _BUCKETS_LOCK:
+        if endpoint not in _BUCKETS:
+            _BUCKETS[endpoint] = TokenBucket(rate=rate, capacity=capacity)
+        bucket = _BUCKETS[endpoint]
+    requested_capacity = capacity if capacity is not None else max(1.0, rate)
+    if bucket.rate != rate or bucket.capacity != requested_capacity:
+        raise ValueError(f"Endpoint {endpoint} already has a rate limit of {bucket.rate}/s (burst {bucket.capacity}); "
+                         f"got {rate}/s (burst {requested_capacity}). All callers of an endpoint must use the same limit.")
+    return bucket
+
+
+class LatencyTracker:
+    """ Rolling window of request latencies used to decide when to hedge """
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ Return the q-th percentile (0-100), or None until `min_samples` latencies were recorded """
+        with self._lock:
+            if len(self._samples) < self.min_samples: return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def is_retryable(error: Exception) -> bool:
+    """ Decide whether an API error is transient """
+    status = getattr(error, "status_code", None)
+    if status is not None: return status in RETRYABLE_STATUS_CODES
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """ Seconds requested by a Retry-After header, if the error carries one """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try: return float(headers.get("retry-after"))
+    except (TypeError, ValueError): return None
+
+
+class ResilientCaller:
+    """
+    Run API requests with rate limiting, retries, a deadline and optional hedging.
+
+    Args:
+        endpoint (str): Key of the shared rate limiter (normally the base URL).
+        rate_limit (float, optional): Requests per second allowed on the endpoint; None disables rate limiting.
+        max_retries (int): Retries after the first attempt for transient errors.
+        base_delay (float): First backoff delay in seconds; doubles on every retry.
+        max_delay (float): Upper bound of a single backoff delay.
+        hedge_percentile (float): Latency percentile after which a hedged request is sent.
+        hedge_endpoint (str, optional): Key of the hedge endpoint's own rate limiter; hedges take their token there.
+        hedge_rate_limit (float, optional): Requests per second allowed on the hedge endpoint; default: `rate_limit`.
+    """
+    def __init__(self, endpoint: str, rate_limit: Optional[float] = None, max_retries: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, hedge_percentile: float = 95.0, hedge_endpoint: Optional[str] = None,
+                 hedge_rate_limit: Optional[float] = None):
+        self.limiter = get_rate_limiter(endpoint, rate_limit) if rate_limit else None
+        hedge_rate_limit = hedge_rate_limit if hedge_rate_limit is not None else rate_limit
+        self.hedge_limiter = get_rate_limiter(hedge_endpoint, hedge_rate_limit) if hedge_endpoint and hedge_rate_limit else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker()
+        self.stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "hedges_skipped": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hedge")
+
+    def _count(self, key: str):
+        # calls run concurrently from several game threads
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def stats_snapshot(self) -> Dict[str, int]:
+        """ A consistent copy of `stats` """
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def backoff(self, attempt: int) -> float:
+        """ Exponential backoff with full jitter for the given retry number (0-based) """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, request: Callable[[Optional[float]], Any], hedge: Optional[Callable[[Optional[float]], Any]] = None,
+             deadline: Optional[float] = None) -> Any:
+        """
+        Run `request` until it succeeds, a non-transient error occurs, retries run out or the deadline passes.
+
+        Args:
+            request: Callable taking the remaining time budget in seconds (or None) and performing one attempt.
+            hedge: Optional equivalent request against a second endpoint, sent when the primary is slower than the
+                tracked latency percentile.
+            deadline (float, optional): Absolute `time.monotonic()` deadline for the whole call.
+
+        Returns:
+            The result of the first successful attempt.
+        """
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0: raise DeadlineExceeded("Turn budget exhausted before the request succeeded")
+            if self.limiter is not None and not self.limiter.acquire(timeout=remaining):
+                raise DeadlineExceeded("Turn budget exhausted while waiting for the rate limiter")
+            self._count("requests")
+            try:
+                return self._attempt(request, hedge, deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = max(self.backoff(attempt), retry_after(e) or 0.0)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    self._count("failures")
+                    raise DeadlineExceeded(f"Turn budget exhausted while backing off after: {e}") from e
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def _attempt(self, request, hedge, deadline):
+        start = time.monotonic()
+        remaining = None if deadline is None else deadline - start
+        hedge_after = self.latency.percentile(self.hedge_percentile) if hedge is not None else None
+        if hedge_after is None:
+            result = request(remaining)
+            self.latency.record(time.monotonic() - start)
+            return result
+
+        # hedged attempt: fire the duplicate once the primary is slower than usual, keep the first success
+        futures = {self._executor.submit(request, remaining): "primary"}
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            # the hedge is a request to the hedge endpoint: it needs a token from that endpoint's quota, but it is
+            # skipped rather than waited for
+            if self.hedge_limiter is None or self.hedge_limiter.acquire(timeout=0):
+                self._count("hedges")
+                left = None if deadline is None else deadline - time.monotonic()
+                futures[self._executor.submit(hedge, left)] = "hedge"
+            else:
+                self._count("hedges_skipped")
+        error = None
+        pending = set(futures)
+        while pending:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            if not done: raise DeadlineExceeded("Turn budget exhausted while waiting for a hedged request")
+            for future in done:
+                if future.exception() is None:
+                    if futures[future] == "hedge": self._count("hedge_wins")
+                    self.latency.record(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,159 @@
+"""
+Episode result cache keyed by agent fingerprints, env version, seed and seats.
+
+A rerun of an evaluation only has to play the episodes whose inputs changed. An episode's
+result is stored under:
+
+  - the fingerprint of the evaluated agent and of the opponent (an episode depends on both),
+  - the env id and env version,
+  - the seed and the model's seats.
+
+An agent fingerprint is a SHA-256 over its class, its public configuration attributes
+(model name, sampling parameters such as OpenAIConfig.TEMPERATURE, system prompt, seed, flags;
+nested agents and config objects recursively) and its code version. The code version defaults
+to the source of the modules that define the agent's class and its base classes, so editing a
+prompt template in agent.py invalidates that agent's entries. Private attributes, API keys and
+runtime objects (clients, executors, loaded models, random generators) are not part of it.
+Pass `code_version` (e.g. a git commit) to pin it instead.
+
+The env version is the textarena version plus a hash of the env class's source file.
+
+Results live in a SQLite file, so several workers (see work_queue.py) can share one cache.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence
+
+from checkpointing import _jsonable
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SECRET_ATTRIBUTES = ("api_key", "secret", "password")
+RUNTIME_ATTRIBUTES = ("stats",)  # counters that change while the agent plays
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    agent TEXT NOT NULL,
+    opponent TEXT NOT NULL,
+    env_id TEXT NOT NULL,
+    env_version TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    seats TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (agent, opponent, env_id, env_version, seed, seats)
+);
+"""
+
+
+@lru_cache(maxsize=None)
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _is_local(obj) -> bool:
+    """ Whether `obj`'s class is defined in this repository or is a textarena agent """
+    module = sys.modules.get(type(obj).__module__)
+    path = os.path.abspath(getattr(module, "__file__", None) or "")
+    return path.startswith(SRC_DIR) or type(obj).__module__.startswith("textarena.agents")
+
+
+def _describe(value, depth: int = 0):
+    """ JSON-able description of a configuration value; None for runtime objects that are left out """
+    if value is None or isinstance(value, (bool, int, float, str)): return value
+    if isinstance(value, (list, tuple)): return [_describe(v, depth + 1) for v in value]
+    if isinstance(value, dict): return {str(k): _describe(v, depth + 1) for k, v in value.items()}
+    if isinstance(getattr(value, "name_or_path", None), str): return value.name_or_path  # transformers models/tokenizers
+    if depth < 4 and hasattr(value, "__dict__") and _is_local(value):
+        return agent_config(value, depth + 1)
+    return None
+
+
+def agent_config(agent, depth: int = 0) -> Dict[str, Any]:
+    """ Class and public configuration attributes of an agent (or a config object it holds) """
+    attributes = {}
+    for name, value in sorted(vars(agent).items()):
+        if name.startswith("_") or name in RUNTIME_ATTRIBUTES or any(s in name.lower() for s in SECRET_ATTRIBUTES): continue
+        described = _describe(value, depth)
+        if described is not None: attributes[name] = described
+    return {"class": f"{type(agent).__module__}.{type(agent).__qualname__}", "attributes": attributes}
+
+
+def code_version_of(agent) -> str:
+    """ Hash of the source files defining the agent's class and base classes (local and textarena ones) """
+    paths = set()
+    for cls in type(agent).__mro__:
+        try:
+            path = inspect.getsourcefile(cls)
+        except TypeError:
+            continue  # builtins
+        if path and (os.path.abspath(path).startswith(SRC_DIR) or cls.__module__.startswith("textarena")):
+            paths.add(os.path.abspath(path))
+    return hashlib.sha256("".join(_file_hash(p) for p in sorted(paths)).encode()).hexdigest()
+
+
+def agent_fingerprint(agent, code_version: Optional[str] = None) -> str:
+    """ Content hash of an agent's class, configuration and code version """
+    payload = {"config": agent_config(agent), "code_version": code_version or code_version_of(agent)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+@lru_cache(maxsize=None)
+def env_version(env_id: str) -> str:
+    """ textarena version plus a hash of the env class's source file """
+    import textarena as ta
+    env = ta.make(env_id)
+    while hasattr(env, "env"): env = env.env  # unwrap the observation/action wrappers
+    source = inspect.getsourcefile(type(env))
+    return f"{getattr(ta, '__version__', 'unknown')}-{_file_hash(source)[:16]}"
+
+
+class ResultCache:
+    """
+    Persistent store of run_game results.
+
+    Args:
+        path (str): SQLite file (created if missing); may be shared between processes.
+        code_version (str, optional): Code version used in all agent fingerprints instead of the source hashes.
+    """
+    def __init__(self, path: str, code_version: Optional[str] = None):
+        self.path = path
+        self.code_version = code_version
+        self.stats = {"hits": 0, "misses": 0}
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, model, opponent, env_id: str, seed: int, seats: Sequence[int]) -> tuple:
+        return (agent_fingerprint(model, self.code_version), agent_fingerprint(opponent, self.code_version),
+                env_id, env_version(env_id), int(seed), json.dumps([int(s) for s in seats]))
+
+    def get(self, model, opponent, env_id: str, seed: int, seats: Sequence[int]) -> Optional[dict]:
+        """ The cached result of this episode, or None """
+        row = self._conn().execute(
+            "SELECT result FROM episodes WHERE agent = ? AND opponent = ? AND env_id = ? AND env_version = ? AND seed = ? AND seats = ?",
+            self.key(model, opponent, env_id, seed, seats)).fetchone()
+        self.stats["hits" if row else "misses"] += 1
+        if row is None: return None
+        result = json.loads(row[0])
+        result["model_pids"] = tuple(result["model_pids"])
+        return result
+
+    def put(self, model, opponent, env_id: str, seed: int, seats: Sequence[int], result: dict):
+        """ Store the result of an episode (replacing an older entry with the same key) """
+        self._conn().execute("INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (*self.key(model, opponent, env_id, seed, seats), json.dumps(result, default=_jsonable), time.time()))
@@ -0,0 +1,331 @@
+"""
+Append-only, indexed store of evaluation results across runs.
+
+Every evaluation run gets a row in `runs` (model and opponent names and fingerprints, label,
+configuration), and every episode a row in `episodes`: env, seed, seat, role, reward, outcome,
+invalid move, turns and latency (the episode's wall time). Episodes cannot be updated or
+deleted. Two aggregate tables are kept up to date by triggers on every insert, so they act as
+materialized views that never need a refresh:
+
+  - run_env_stats:   one row per (run, env),
+  - model_env_daily: one row per (model, env, day).
+
+The summary, compare and trend queries read only these tables, so comparing models over
+thousands of runs is a scan of a few thousand aggregate rows instead of millions of episodes.
+role_summary and episodes read the episode table through its indexes.
+
+Query from the command line:
+    python src/results_store.py eval_results/results.sqlite summary
+    python src/results_store.py eval_results/results.sqlite compare SecretMafia-v0
+    python src/results_store.py eval_results/results.sqlite trend Qwen/Qwen3-4B
+"""
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    label TEXT,
+    model TEXT NOT NULL,
+    model_fingerprint TEXT,
+    opponent TEXT,
+    opponent_fingerprint TEXT,
+    config TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, started_at);
+
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    env_id TEXT NOT NULL,
+    seed INTEGER,
+    seat TEXT NOT NULL,
+    role TEXT,
+    reward REAL NOT NULL,
+    opponent_reward REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    invalid_move INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    latency_s REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_run_env ON episodes (run_id, env_id);
+CREATE INDEX IF NOT EXISTS episodes_env_role ON episodes (env_id, role);
+
+CREATE TRIGGER IF NOT EXISTS episodes_no_update BEFORE UPDATE ON episodes
+BEGIN SELECT RAISE(ABORT, 'episodes are append-only'); END;
+CREATE TRIGGER IF NOT EXISTS episodes_no_delete BEFORE DELETE ON episodes
+BEGIN SELECT RAISE(ABORT, 'episodes are append-only'); END;
+
+CREATE TABLE IF NOT EXISTS run_env_stats (
+    run_id INTEGER NOT NULL, env_id TEXT NOT NULL,
+    episodes INTEGER NOT NULL, wins INTEGER NOT NULL, losses INTEGER NOT NULL, draws INTEGER NOT NULL,
+    invalid_moves INTEGER NOT NULL, reward_sum REAL NOT NULL, reward_sq_sum REAL NOT NULL,
+    turns_sum INTEGER NOT NULL, latency_sum REAL NOT NULL, latency_n INTEGER NOT NULL,
+    PRIMARY KEY (run_id, env_id)
+);
+CREATE TABLE IF NOT EXISTS model_env_daily (
+    model TEXT NOT NULL, env_id TEXT NOT NULL, day TEXT NOT NULL,
+    episodes INTEGER NOT NULL, wins INTEGER NOT NULL, losses INTEGER NOT NULL, draws INTEGER NOT NULL,
+    invalid_moves INTEGER NOT NULL, reward_sum REAL NOT NULL, reward_sq_sum REAL NOT NULL,
+    turns_sum INTEGER NOT NULL, latency_sum REAL NOT NULL, latency_n INTEGER NOT NULL,
+    PRIMARY KEY (model, env_id, day)
+);
+"""
+
+AGGREGATE_COLUMNS = ("episodes", "wins", "losses", "draws", "invalid_moves", "reward_sum", "reward_sq_sum",
+                     "turns_sum", "latency_sum", "latency_n")
+_NEW_VALUES = ("1, NEW.outcome = 'win', NEW.outcome = 'loss', NEW.outcome = 'draw', NEW.invalid_move, NEW.reward, "
+               "NEW.reward * NEW.reward, NEW.turns, COALESCE(NEW.latency_s, 0), NEW.latency_s IS NOT NULL")
+_ACCUMULATE = ", ".join(f"{c} = {c} + excluded.{c}" for c in AGGREGATE_COLUMNS)
+TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS episodes_aggregate AFTER INSERT ON episodes
+BEGIN
+    INSERT INTO run_env_stats (run_id, env_id, {", ".join(AGGREGATE_COLUMNS)})
+    VALUES (NEW.run_id, NEW.env_id, {_NEW_VALUES})
+    ON CONFLICT (run_id, env_id) DO UPDATE SET {_ACCUMULATE};
+    INSERT INTO model_env_daily (model, env_id, day, {", ".join(AGGREGATE_COLUMNS)})
+    VALUES ((SELECT model FROM runs WHERE run_id = NEW.run_id), NEW.env_id, date(NEW.created_at, 'unixepoch'), {_NEW_VALUES})
+    ON CONFLICT (model, env_id, day) DO UPDATE SET {_ACCUMULATE};
+END;
+"""
+
+
+def _outcome(result: dict) -> str:
+    if result["model_reward"] > result["opponent_reward"]: return "win"
+    if result["model_reward"] < result["opponent_reward"]: return "loss"
+    return "draw"
+
+
+def _rates(agg: Dict[str, Any]) -> Dict[str, Any]:
+    """ Rates and means from aggregate sums """
+    n = agg["episodes"]
+    mean = agg["reward_sum"] / n
+    variance = max(agg["reward_sq_sum"] / n - mean * mean, 0.0) * n / (n - 1) if n > 1 else float("nan")
+    return {
+        "episodes": n,
+        "win_rate": agg["wins"] / n,
+        "loss_rate": agg["losses"] / n,
+        "draw_rate": agg["draws"] / n,
+        "invalid_rate": agg["invalid_moves"] / n,
+        "avg_turns": agg["turns_sum"] / n,
+        "avg_model_reward": mean,
+        "reward_se": math.sqrt(variance / n),
+        "avg_latency_s": agg["latency_sum"] / agg["latency_n"] if agg["latency_n"] else float("nan"),
+    }
+
+
+class ResultsStore:
+    """
+    SQLite store of per-episode evaluation results with trigger-maintained aggregates.
+
+    Args:
+        path (str): Database file (created if missing).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.executescript(TRIGGERS)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def start_run(self, model: str, opponent: Optional[str] = None, label: Optional[str] = None, model_fingerprint: Optional[str] = None,
+                  opponent_fingerprint: Optional[str] = None, config: Optional[Dict[str, Any]] = None) -> int:
+        """ Register an evaluation run; returns its run id """
+        return self._conn().execute(
+            "INSERT INTO runs (started_at, label, model, model_fingerprint, opponent, opponent_fingerprint, config) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), label, model, model_fingerprint, opponent, opponent_fingerprint,
+             json.dumps(config, default=str) if config is not None else None)).lastrowid
+
+    def add_episodes(self, run_id: int, env_id: str, results: Sequence[dict], roles: Optional[Sequence[Optional[str]]] = None,
+                     created_at: Optional[float] = None):
+        """
+        Append run_game results of one env in one transaction.
+
+        Args:
+            roles: The model's role in each episode (e.g. SecretMafia roles); default: none.
+            created_at: Timestamp of the episodes (it decides their day); default: now.
+        """
+        now = created_at if created_at is not None else time.time()
+        roles = roles or [None] * len(results)
+        rows = [(run_id, env_id, r.get("seed"), ",".join(str(int(p)) for p in r["model_pids"]), role, float(r["model_reward"]),
+                 float(r["opponent_reward"]), _outcome(r), int(r["invalid_move"]), int(r["turn_count"]), r.get("duration_s"), now)
+                for r, role in zip(results, roles)]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO episodes (run_id, env_id, seed, seat, role, reward, opponent_reward, outcome, invalid_move, turns, latency_s, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def add_episode(self, run_id: int, env_id: str, result: dict, role: Optional[str] = None):
+        """ Append one run_game result """
+        self.add_episodes(run_id, env_id, [result], [role])
+
+    def runs(self, model: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Registered runs, newest first """
+        sql = "SELECT run_id, started_at, label, model, opponent FROM runs"
+        params: list = []
+        if model is not None:
+            sql += " WHERE model = ?"
+            params.append(model)
+        sql += " ORDER BY started_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def summary(self, run_ids: Optional[Sequence[int]] = None, env_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """ One row per (run, env) from run_env_stats """
+        sql = "SELECT s.*, r.model, r.label FROM run_env_stats s JOIN runs r USING (run_id)"
+        where, params = [], []
+        if run_ids is not None:
+            where.append(f"s.run_id IN ({', '.join('?' * len(run_ids))})")
+            params.extend(run_ids)
+        if env_id is not None:
+            where.append("s.env_id = ?")
+            params.append(env_id)
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.run_id, s.env_id"
+        return [{"run_id": row["run_id"], "model": row["model"], "label": row["label"], "env_id": row["env_id"], **_rates(row)}
+                for row in self._conn().execute(sql, params)]
+
+    def _model_env(self, where: List[str], params: list, group_by: str) -> List[Dict[str, Any]]:
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in AGGREGATE_COLUMNS)
+        sql = f"SELECT {group_by}, {sums} FROM model_env_daily"
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += f" GROUP BY {group_by} ORDER BY {group_by}"
+        keys = [c.strip() for c in group_by.split(",")]
+        return [{**{k: row[k] for k in keys}, **_rates(row)} for row in self._conn().execute(sql, params)]
+
+    def compare(self, env_id: Optional[str] = None, models: Optional[Sequence[str]] = None, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        One row per (model, env) over all runs, from model_env_daily.
+
+        Args:
+            since: First day to include, "YYYY-MM-DD" (UTC).
+        """
+        where, params = [], []
+        if env_id is not None:
+            where.append("env_id = ?")
+            params.append(env_id)
+        if models is not None:
+            where.append(f"model IN ({', '.join('?' * len(models))})")
+            params.extend(models)
+        if since is not None:
+            where.append("day >= ?")
+            params.append(since)
+        return self._model_env(where, params, "model, env_id")
+
+    def trend(self, model: str, env_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """ One row per (env, day) of a model, from model_env_daily """
+        where, params = ["model = ?"], [model]
+        if env_id is not None:
+            where.append("env_id = ?")
+            params.append(env_id)
+        return self._model_env(where, params, "env_id, day")
+
+    def role_summary(self, env_id: str, model: Optional[str] = None) -> List[Dict[str, Any]]:
+        """ One row per role of the model on `env_id`, aggregated from the episodes """
+        sql = ("SELECT role, COUNT(*) AS episodes, SUM(outcome = 'win') AS wins, SUM(outcome = 'loss') AS losses, "
+               "SUM(outcome = 'draw') AS draws, SUM(invalid_move) AS invalid_moves, SUM(reward) AS reward_sum, "
+               "SUM(reward * reward) AS reward_sq_sum, SUM(turns) AS turns_sum, COALESCE(SUM(latency_s), 0) AS latency_sum, "
+               "COUNT(latency_s) AS latency_n FROM episodes e")
+        params: list = [env_id]
+        if model is not None:
+            sql += " JOIN runs r USING (run_id) WHERE e.env_id = ? AND r.model = ?"
+            params.append(model)
+        else:
+            sql += " WHERE e.env_id = ?"
+        sql += " GROUP BY role ORDER BY role"
+        return [{"role": row["role"], **_rates(row)} for row in self._conn().execute(sql, params)]
+
+    def episodes(self, run_id: Optional[int] = None, env_id: Optional[str] = None, role: Optional[str] = None,
+                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """ Raw episode rows, filtered through the indexes """
+        where, params = [], []
+        for column, value in (("run_id", run_id), ("env_id", env_id), ("role", role)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT * FROM episodes" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+
+@dataclass
+class RunRecorder:
+    """ A ResultsStore bound to one run, for code that records episodes as they finish """
+    store: ResultsStore
+    run_id: int
+
+    def add(self, env_id: str, result: dict, role: Optional[str] = None):
+        self.store.add_episode(self.run_id, env_id, result, role)
+
+
+def _print_rows(rows: List[Dict[str, Any]]):
+    if not rows:
+        print("No results.")
+        return
+    print(" | ".join(f"{key:>14}" for key in rows[0]))
+    for row in rows:
+        print(" | ".join(f"{v:>14.3f}" if isinstance(v, float) else f"{v!s:>14}" for v in row.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the evaluation results store")
+    parser.add_argument("db", help="results database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("runs")
+    summary = sub.add_parser("summary", help="per (run, env); default: the last 10 runs")
+    summary.add_argument("--runs", type=int, nargs="*", default=None)
+    summary.add_argument("--env", default=None)
+    compare = sub.add_parser("compare", help="per (model, env) over all runs")
+    compare.add_argument("env", nargs="?", default=None)
+    compare.add_argument("--since", default=None, help="first day, YYYY-MM-DD")
+    trend = sub.add_parser("trend", help="per (env, day) of one model")
+    trend.add_argument("model")
+    trend.add_argument("--env", default=None)
+    roles = sub.add_parser("roles", help="per role on one env")
+    roles.add_argument("env")
+    roles.add_argument("--model", default=None)
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    if args.command == "runs":
+        _print_rows(store.runs())
+    elif args.command == "summary":
+        run_ids = args.runs or [run["run_id"] for run in store.runs(limit=10)]
+        _print_rows(store.summary(run_ids, args.env))
+    elif args.command == "compare":
+        _print_rows(store.compare(args.env, since=args.since))
+    elif args.command == "trend":
+        _print_rows(store.trend(args.model, args.env))
+    else:
+        _print_rows(store.role_summary(args.env, args.model))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Role-stratified episode scheduling for SecretMafia evaluation.
+
+With 7 players the evaluated seat is Doctor or Detective in only 1 of 7 games,
+so uniform sampling needs many games before those roles are measured at all.
+The env assigns roles from its seed, and every seed contains every role. To
+put the model in role R we therefore pick the next unused seed and seat the
+model on a seat that has role R for that seed. No env changes are needed.
+
+RoleStratifiedScheduler keeps one SequentialStopRule per role. It plays each
+role `min_per_role` times, then always schedules the role whose interval
+contributes most to the uncertainty of the overall estimate (interval width
+times the role's natural frequency). It stops once every role is within
+`precision` or `max_episodes` is reached. The overall win rate is
+re-weighted by the natural role frequencies, so it estimates what uniform
+seating would have measured.
+"""
+import random
+from collections import Counter
+from functools import lru_cache
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+from sequential_testing import SequentialStopRule
+
+MAFIA_ENV_ID = "SecretMafia-v0"
+
+
+@lru_cache(maxsize=4096)
+def _seat_roles(env_id: str, num_players: int, seed: int) -> Tuple[Tuple[int, str], ...]:
+    import textarena as ta
+    state = random.getstate()  # reset() re-seeds the global generator
+    try:
+        env = ta.make(env_id)
+        env.reset(num_players=num_players, seed=seed)
+        return tuple(sorted(env.player_roles.items()))
+    finally:
+        random.setstate(state)
+
+
+def seat_roles(seed: int, num_players: int = 7, env_id: str = MAFIA_ENV_ID) -> Dict[int, str]:
+    """ Role of every seat in the game that `seed` deals (cached) """
+    return dict(_seat_roles(env_id, num_players, seed))
+
+
+def seat_for_role(role: str, seed: int, num_players: int = 7, env_id: str = MAFIA_ENV_ID) -> int:
+    """ A seat that has `role` for `seed`; roles with several seats rotate through them with the seed """
+    seats = [pid for pid, r in seat_roles(seed, num_players, env_id).items() if r == role]
+    if not seats: raise ValueError(f"No seat has role {role!r} for seed {seed}")
+    return seats[seed % len(seats)]
+
+
+class RoleStratifiedScheduler:
+    """
+    Decide which role the evaluated seat plays next and track per-role win rates.
+
+    Args:
+        num_players (int): Players per game.
+        method (str): Interval method of the per-role SequentialStopRule ("beta", "wilson", ...).
+        confidence (float): Interval confidence.
+        precision (float): A role is done once its interval half-width is at most this.
+        min_per_role (int): Episodes of every role before uncertainty-based allocation starts.
+        max_episodes (int): Total episode budget over all roles.
+        first_seed (int): First env seed. Each role uses its own run of `max_episodes` consecutive seeds, the i-th
+            role (sorted by name) starting at `first_seed + i * max_episodes`, so no two roles share a game.
+        env_id (str): The Mafia env id.
+    """
+    def __init__(self, num_players: int = 7, method: str = "beta", confidence: float = 0.95, precision: float = 0.1,
+                 min_per_role: int = 5, max_episodes: int = 200, first_seed: int = 0, env_id: str = MAFIA_ENV_ID):
+        self.num_players = num_players
+        self.precision = precision
+        self.max_episodes = max_episodes
+        self.first_seed = first_seed
+        self.env_id = env_id
+        self.confidence = confidence
+        # natural frequency of each role for a uniformly random seat
+        self.role_weights = {role: n / num_players for role, n in Counter(seat_roles(first_seed, num_players, env_id).values()).items()}
+        self.min_per_role = min_per_role
+        # the rules provide the per-role intervals; when to stop is decided here across roles
+        self.rules = {role: SequentialStopRule(method=method, confidence=confidence) for role in sorted(self.role_weights)}
+
+    @property
+    def episodes(self) -> int:
+        return sum(rule.episodes for rule in self.rules.values())
+
+    def _role_done(self, role: str) -> bool:
+        rule = self.rules[role]
+        if rule.episodes < self.min_per_role: return False
+        lo, hi = rule.interval()
+        return (hi - lo) / 2 <= self.precision
+
+    def next_episode(self) -> Optional[Tuple[str, int, int]]:
+        """ (role, seed, seat) of the next episode, or None once the evaluation is finished """
+        if self.episodes >= self.max_episodes: return None
+        open_roles = [role for role in self.rules if not self._role_done(role)]
+        if not open_roles: return None
+        starved = [role for role in open_roles if self.rules[role].episodes < self.min_per_role]
+        if starved:
+            role = min(starved, key=lambda r: self.rules[r].episodes)
+        else:
+            def contribution(r):
+                lo, hi = self.rules[r].interval()
+                return self.role_weights[r] * (hi - lo)
+            role = max(open_roles, key=contribution)
+        seed = self.first_seed + list(self.rules).index(role) * self.max_episodes + self.rules[role].episodes
+        return role, seed, seat_for_role(role, seed, self.num_players, self.env_id)
+
+    def update(self, role: str, outcome):
+        """ Record the outcome ("win", "loss", "draw" or a score) of an episode played as `role` """
+        self.rules[role].update(outcome)
+
+    def overall(self) -> Tuple[float, float, float]:
+        """ Role-reweighted win rate and its normal-approximation interval: (estimate, lo, hi) """
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        estimate, variance = 0.0, 0.0
+        for role, rule in self.rules.items():
+            lo, hi = rule.interval()
+            estimate += self.role_weights[role] * (rule.score if rule.episodes else (lo + hi) / 2)
+            variance += (self.role_weights[role] * (hi - lo) / (2 * z)) ** 2
+        half = z * variance ** 0.5
+        return estimate, max(0.0, estimate - half), min(1.0, estimate + half)
+
+    def summary(self) -> List[Dict[str, object]]:
+        """ One row per role plus a re-weighted "overall" row """
+        rows = []
+        for role, rule in self.rules.items():
+            lo, hi = rule.interval()
+            rows.append({"role": role, "weight": self.role_weights[role], "episodes": rule.episodes,
+                         "win_rate": rule.score, "win_rate_lo": lo, "win_rate_hi": hi})
+        estimate, lo, hi = self.overall()
+        rows.append({"role": "overall (re-weighted)", "weight": 1.0, "episodes": self.episodes,
+                     "win_rate": estimate, "win_rate_lo": lo, "win_rate_hi": hi})
+        return rows
@@ -0,0 +1,285 @@
+"""
+Scripted agents: fast, deterministic (given a seed) players for every game.
+
+They need no model, produce well-formed moves in microseconds and are meant for
+load generation (stress-testing GameManager, the UIs, evaluation runs) and as
+baselines in offline evaluation:
+
+  - RandomValidAgent: a random legal move for any phase of these four games
+  - GreedyBlottoAgent: best response to the opponent's previous allocation
+  - TitForTatIPDAgent: cooperate first, then mirror each opponent
+  - MajorityVoteMafiaAgent: joins the current majority, never votes a teammate
+  - DictionaryCodenamesAgent: string-similarity spymaster and operative
+
+baseline_agent(env_id) returns the strongest scripted agent for a game. Other envs (TicTacToe,
+Snake, ...) have no action grammar here, so scripted agents cannot play them: baseline_agent
+raises ValueError for them rather than seat a player that only forfeits.
+"""
+import random
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from action_grammar import (GRAMMARS, BlottoAllocationGrammar, CodenamesClueGrammar, CodenamesGuessGrammar,
+                            IPDDecisionGrammar, MafiaVoteGrammar, detect_phase)
+from agent import Agent
+from observation_compression import MafiaStateExtractor
+
+DISCUSSION_LINES = [
+    "I have been watching the votes closely and Player {p} keeps changing their story, which makes me suspicious.",
+    "As a villager I want us to be careful; the last kill suggests the Mafia are targeting quiet players like Player {p}.",
+    "Player {p}, can you explain why you voted the way you did? Your reasoning did not add up for me.",
+    "I trust Player {p} for now. Let's hear from everyone before we decide, rushing a vote only helps the Mafia.",
+]
+CHAT_LINES = [
+    "Let's all cooperate this round, mutual cooperation gives everyone three points and keeps the game fair.",
+    "Player {p} defected before, so I will be watching closely. Cooperate with me and I will cooperate with you.",
+    "I propose a simple deal: everyone cooperates until someone defects, then we punish the defector together.",
+]
+RATIONALE = "Thinking about the current state of the game and what the others did so far, my move is: "
+
+# Candidate clue words for the Codenames spymaster
+CLUE_VOCABULARY = (
+    "animal", "water", "metal", "music", "travel", "stone", "light", "engine", "garden", "winter", "summer", "ocean",
+    "forest", "money", "house", "school", "sport", "food", "drink", "color", "paper", "glass", "space", "night",
+    "fire", "earth", "power", "machine", "letter", "number", "family", "weather", "building", "army", "body", "road",
+)
+
+
+class ScriptedAgent(Agent):
+    """
+    Base class of the scripted agents.
+
+    Args:
+        seed (int, optional): Seed of the agent's own random generator.
+        rationale (bool): Prefix structured moves with a short canned rationale, like a chatty model would.
+    """
+    def __init__(self, seed: Optional[int] = None, rationale: bool = False):
+        super().__init__()
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.rationale = rationale
+
+    def __call__(self, observation: str) -> str:
+        action_format = self.resolve_action_format(observation)
+        if action_format is None:
+            return self.speak(observation)
+        action = self.act(observation, GRAMMARS[action_format])
+        return RATIONALE + action if self.rationale else action
+
+    def speak(self, observation: str) -> str:
+        """ Free-text turn (discussion / chat) """
+        lines = DISCUSSION_LINES if detect_phase(observation)[0] == "SecretMafia-v0" else CHAT_LINES
+        return self.rng.choice(lines).format(p=self.rng.randrange(7))
+
+    def act(self, observation: str, grammar) -> str:
+        """ Structured move for `grammar`; the base implementation plays a random legal move """
+        return random_move(observation, grammar, self.rng)
+
+
+def _player_id(observation: str) -> Optional[int]:
+    match = re.search(r"You are Player (\d+)", observation)
+    return int(match.group(1)) if match else None
+
+
+def random_move(observation: str, grammar, rng: random.Random) -> str:
+    """ A random legal move for `grammar` in the current observation """
+    if isinstance(grammar, IPDDecisionGrammar):
+        return " ".join(f"[{q} {rng.choice(('cooperate', 'defect'))}]" for q in grammar.opponents(observation) or (1, 2))
+    if isinstance(grammar, BlottoAllocationGrammar):
+        fields, units = grammar.fields(observation) or ["A", "B", "C"], grammar.units(observation) or 20
+        cuts = sorted(rng.randint(0, units) for _ in range(len(fields) - 1))
+        return "[" + " ".join(f"{f}{b - a}" for f, a, b in zip(fields, [0] + cuts, cuts + [units])) + "]"
+    if isinstance(grammar, MafiaVoteGrammar):
+        me = _player_id(observation)
+        targets = [t for t in grammar.targets(observation) or ["0"] if me is None or int(t) != me] or ["0"]
+        return f"[{rng.choice(targets)}]"
+    if isinstance(grammar, CodenamesClueGrammar):
+        board = grammar.board(observation)
+        legal = [w for w in CLUE_VOCABULARY if not any(w in b or b in w for b in board)] or ["signal"]
+        return f"[{rng.choice(legal)} {rng.randint(1, 2)}]"
+    if isinstance(grammar, CodenamesGuessGrammar):
+        words = grammar.unrevealed(observation)
+        return f"[{rng.choice(words)}]" if words and rng.random() < 0.8 else "[pass]"
+    raise ValueError(f"No random move for {grammar.name}")
+
+
+class RandomValidAgent(ScriptedAgent):
+    """ Plays a random legal move in every phase of the games in BASELINE_AGENTS """
+
+
+class GreedyBlottoAgent(ScriptedAgent):
+    """
+    ColonelBlotto: best response to the opponent's last allocation.
+
+    Wins the cheapest majority of fields (opponent's units + 1 each) and spreads the rest; in the first round the
+    units are concentrated on a random majority of fields.
+    """
+    _ALLOCATED = re.compile(r"Commander (Alpha|Beta) allocated:\s*((?:[A-Z]:\s*\d+\s*,?\s*)+)")
+
+    def act(self, observation, grammar):
+        if not isinstance(grammar, BlottoAllocationGrammar): return super().act(observation, grammar)
+        fields, units = grammar.fields(observation) or ["A", "B", "C"], grammar.units(observation) or 20
+        me = "Alpha" if "You are Commander Alpha" in observation else "Beta"
+        last = {}
+        for who, allocation in self._ALLOCATED.findall(observation[observation.rfind("\nRound "):]):
+            if who != me: last = {f: int(n) for f, n in re.findall(r"([A-Z]):\s*(\d+)", allocation)}
+        majority = len(fields) // 2 + 1
+        if last:
+            costs = sorted(fields, key=lambda f: (last.get(f, 0), self.rng.random()))
+            targets = costs[:majority]
+            allocation = {f: last.get(f, 0) + 1 for f in targets}
+            if sum(allocation.values()) > units: targets, allocation = costs[:majority], {}
+        else:
+            targets, allocation = self.rng.sample(fields, majority), {}
+        spare = units - sum(allocation.values())
+        for i in range(spare):  # spread the remaining units over the targeted fields
+            f = targets[i % len(targets)]
+            allocation[f] = allocation.get(f, 0) + 1
+        return "[" + " ".join(f"{f}{allocation.get(f, 0)}" for f in fields) + "]"
+
+
+class TitForTatIPDAgent(ScriptedAgent):
+    """ ThreePlayerIPD: cooperate in the first round, then repeat what each opponent last did to us """
+    _OUTCOME = re.compile(r"Player (\d+) vs Player (\d+) chose to (cooperate|defect) and (cooperate|defect)")
+
+    def act(self, observation, grammar):
+        if not isinstance(grammar, IPDDecisionGrammar): return super().act(observation, grammar)
+        me = _player_id(observation)
+        last = {}
+        start = observation.rfind("### Round")
+        if start != -1:
+            for i, j, a, b in self._OUTCOME.findall(observation[start:]):
+                if int(i) == me: last[int(j)] = b
+                elif int(j) == me: last[int(i)] = a
+        return " ".join(f"[{q} {last.get(q, 'cooperate')}]" for q in grammar.opponents(observation) or (1, 2))
+
+    def speak(self, observation):
+        return "I will cooperate with anyone who cooperates with me, and answer a defection with a defection."
+
+
+class MajorityVoteMafiaAgent(ScriptedAgent):
+    """
+    SecretMafia: votes with the current majority.
+
+    Day votes follow the votes already cast, then the most stated vote intentions, then the most accused player
+    (investigation claims). Mafia never vote for teammates and pick the most suspicious villager at night; the
+    Doctor protects itself and the Detective investigates players it has not checked yet.
+    """
+    uses_state_view = True
+
+    def __init__(self, seed: Optional[int] = None, rationale: bool = False):
+        super().__init__(seed, rationale)
+        self._extractor = MafiaStateExtractor()
+        self._seen = ""
+
+    def _facts(self, observation: str):
+        if not observation.startswith(self._seen): self._extractor, self._seen = MafiaStateExtractor(), ""
+        self._extractor.feed(observation[len(self._seen):])
+        self._seen = observation
+        return self._extractor.facts
+
+    def act(self, observation, grammar):
+        if not isinstance(grammar, MafiaVoteGrammar): return super().act(observation, grammar)
+        facts = self._facts(observation)
+        me = _player_id(observation)
+        teammates = re.search(r"Your teammates are: ([^.]*)\.", facts.intro)
+        teammates = {int(p) for p in re.findall(r"\d+", teammates.group(1))} if teammates else set()
+        if self.state_view is not None and getattr(self.state_view, "teammates", None): teammates = set(self.state_view.teammates)
+        targets = [int(t) for t in grammar.targets(observation) or []]
+        if "choose one player to protect" in observation[observation.rfind("[GAME]"):] and me in targets:
+            return f"[{me}]"
+        candidates = [t for t in targets if t != me and t not in teammates] or [t for t in targets if t != me] or targets
+        if not candidates: return "[0]"
+        checked = {int(p) for p in re.findall(r"Player (\d+) IS", " ".join(facts.private_results))}
+        if "choose one player to investigate" in observation[observation.rfind("[GAME]"):]:
+            unchecked = [t for t in candidates if t not in checked]
+            return f"[{self.rng.choice(unchecked or candidates)}]"
+        score = Counter()
+        score.update({t: 100 for t in facts.day_votes.get(facts.day, {}).values()})
+        score.update({t: 100 for t in facts.night_votes.get(facts.day + 1, {}).values()})
+        score.update({t: 10 for t in facts.vote_intents.values()})
+        for claims in facts.investigation_claims.values():
+            score.update({int(m.group(1)): 1 for m in (re.match(r"Player (\d+) is Mafia", c) for c in claims) if m})
+        return f"[{max(candidates, key=lambda t: (score[t], self.rng.random()))}]"
+
+
+@lru_cache(maxsize=4096)
+def _bigrams(word: str) -> frozenset:
+    word = f" {word.lower()} "
+    return frozenset(word[i:i + 2] for i in range(len(word) - 1))
+
+
+def string_similarity(a: str, b: str) -> float:
+    """ Cheap lexical similarity in [0, 1] (Dice coefficient of character bigrams), used when no better one is supplied """
+    x, y = _bigrams(a), _bigrams(b)
+    return 2 * len(x & y) / (len(x) + len(y))
+
+
+class DictionaryCodenamesAgent(ScriptedAgent):
+    """
+    Codenames: spymaster and operative driven by a word-similarity function.
+
+    The spymaster picks the clue from `vocabulary` that is most similar to its team's unrevealed words while staying
+    away from the assassin and the opponents' words; the operative guesses the unrevealed word most similar to the
+    clue and passes once the best similarity drops below `min_similarity`.
+
+    Args:
+        similarity (callable, optional): `similarity(a, b) -> float`, e.g. embedding cosine; defaults to string_similarity.
+        vocabulary (tuple): Candidate clue words.
+        min_similarity (float): Operatives pass below this similarity.
+    """
+    _CLUE = re.compile(r"submitted \[(\w+) (\d+)\]")
+
+    def __init__(self, seed: Optional[int] = None, rationale: bool = False, similarity: Optional[Callable[[str, str], float]] = None,
+                 vocabulary: tuple = CLUE_VOCABULARY, min_similarity: float = 0.3):
+        super().__init__(seed, rationale)
+        self.similarity = similarity or string_similarity
+        self.vocabulary = vocabulary
+        self.min_similarity = min_similarity
+
+    def act(self, observation, grammar):
+        if isinstance(grammar, CodenamesClueGrammar): return self._clue(observation, grammar)
+        if isinstance(grammar, CodenamesGuessGrammar): return self._guess(observation, grammar)
+        return super().act(observation, grammar)
+
+    def _clue(self, observation: str, grammar: CodenamesClueGrammar) -> str:
+        board = grammar.board(observation)
+        team = "R" if "Spymaster for Red" in observation else "B"
+        live = {w: label.split()[0] for w, label in board.items() if label and "revealed" not in label}
+        ours = [w for w, label in live.items() if label == team]
+        theirs = [w for w, label in live.items() if label != team]
+        best, best_score, best_count = None, float("-inf"), 1
+        for clue in self.vocabulary:
+            if any(clue in w or w in clue for w in board): continue  # the env rejects clues overlapping a board word
+            danger = max((self.similarity(clue, w) * (2 if live[w] == "A" else 1) for w in theirs), default=0.0)
+            related = sorted((self.similarity(clue, w) for w in ours), reverse=True)
+            count = sum(1 for s in related if s > danger) or 1
+            score = sum(related[:count]) - danger
+            if score > best_score: best, best_score, best_count = clue, score, count
+        return f"[{best or 'signal'} {min(best_count, 3)}]"
+
+    def _guess(self, observation: str, grammar: CodenamesGuessGrammar) -> str:
+        clues = self._CLUE.findall(observation)
+        words = grammar.unrevealed(observation)
+        if not clues or not words: return "[pass]"
+        clue = clues[-1][0]
+        best = max(words, key=lambda w: self.similarity(clue, w))
+        return f"[{best}]" if self.similarity(clue, best) >= self.min_similarity else "[pass]"
+
+
+# Strongest scripted agent per game
+BASELINE_AGENTS: Dict[str, type] = {
+    "SecretMafia-v0": MajorityVoteMafiaAgent,
+    "ColonelBlotto-v0": GreedyBlottoAgent,
+    "ThreePlayerIPD-v0": TitForTatIPDAgent,
+    "Codenames-v0": DictionaryCodenamesAgent,
+}
+
+
+def baseline_agent(env_id: str, seed: Optional[int] = None, **kwargs) -> ScriptedAgent:
+    """ Return the baseline scripted agent for `env_id`; ValueError for games the scripted agents cannot play """
+    if env_id not in BASELINE_AGENTS:
+        raise ValueError(f"No scripted baseline for {env_id}; scripted agents only play {', '.join(BASELINE_AGENTS)}")
+    return BASELINE_AGENTS[env_id](seed=seed, **kwargs)
@@ -0,0 +1,205 @@
+"""
+Sequential stop rules for offline evaluation.
+
+Instead of a fixed number of episodes per env, SequentialStopRule is updated
+after every episode and stops the env as soon as the result is clear:
+
+  - "wilson": Wilson score interval on the win rate,
+  - "beta":   equal-tailed Beta posterior interval (uniform prior by default),
+  - "t":      Student-t interval on the mean score, using the observed variance,
+  - "sprt":   Wald's sequential probability ratio test of p0 against p1.
+
+The win rate counts a draw as half a win. An update can also be a fractional
+score, e.g. the mean over the seat permutations of one paired seed; "t" is the
+method that benefits from the lower variance of such paired scores. An interval rule stops once the
+interval lies entirely above or below `threshold`, or is narrower than
+`precision`. SPRT stops when the log-likelihood ratio crosses either Wald
+bound. Every rule also respects `min_episodes` and `max_episodes`.
+
+The interval rules look at the data after every episode without a correction
+for repeated looks, so their real error rate is higher than 1 - confidence;
+use SPRT (or a higher confidence) when the error rate matters.
+
+Only the standard library is used (the Beta quantile is computed from the
+regularized incomplete beta function).
+"""
+import math
+from statistics import NormalDist, mean, stdev
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+OUTCOME_SCORES = {"win": 1.0, "draw": 0.5, "loss": 0.0}
+
+
+def wilson_interval(successes: float, n: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """ Wilson score interval for a binomial proportion (`successes` may be fractional) """
+    if n <= 0: return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half = z * math.sqrt(max(p * (1 - p) / n + z * z / (4 * n * n), 0.0)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _betacf(a: float, b: float, x: float, max_iter: int = 200, eps: float = 1e-12) -> float:
+    """ Continued fraction of the incomplete beta function (modified Lentz) """
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1, a - 1
+    c, d = 1.0, 1 - qab * x / qap
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((qam + m2) * (a + m2)), -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < eps: break
+    return h
+
+
+def betainc(a: float, b: float, x: float) -> float:
+    """ Regularized incomplete beta function I_x(a, b) """
+    if x <= 0: return 0.0
+    if x >= 1: return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    if x < (a + 1) / (a + b + 2):
+        return math.exp(log_front) * _betacf(a, b, x) / a
+    return 1 - math.exp(log_front) * _betacf(b, a, 1 - x) / b
+
+
+def beta_ppf(q: float, a: float, b: float, tol: float = 1e-10) -> float:
+    """ Quantile of the Beta(a, b) distribution, by bisection on betainc """
+    lo, hi = 0.0, 1.0
+    while hi - lo > tol:
+        mid = (lo + hi) / 2
+        if betainc(a, b, mid) < q: lo = mid
+        else: hi = mid
+    return (lo + hi) / 2
+
+
+def beta_interval(successes: float, failures: float, confidence: float = 0.95, prior: Tuple[float, float] = (1.0, 1.0)) -> Tuple[float, float]:
+    """ Equal-tailed posterior interval of a Bernoulli rate with a Beta prior """
+    a, b = prior[0] + successes, prior[1] + failures
+    tail = (1 - confidence) / 2
+    return beta_ppf(tail, a, b), beta_ppf(1 - tail, a, b)
+
+
+def t_ppf(q: float, df: float) -> float:
+    """ Quantile of Student's t distribution with `df` degrees of freedom """
+    if q == 0.5: return 0.0
+    x = beta_ppf(2 * min(q, 1 - q), df / 2, 0.5)
+    t = math.sqrt(df * (1 - x) / x)
+    return t if q > 0.5 else -t
+
+
+def mean_interval(scores: Sequence[float], confidence: float = 0.95) -> Tuple[float, float]:
+    """ Student-t interval on the mean of scores in [0, 1], clipped to [0, 1] """
+    if len(scores) < 2: return 0.0, 1.0
+    half = t_ppf(0.5 + confidence / 2, len(scores) - 1) * stdev(scores) / math.sqrt(len(scores))
+    center = mean(scores)
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class SPRT:
+    """
+    Wald's SPRT for a win rate: H0 p = p0 against H1 p = p1 (p0 < p1).
+
+    Args:
+        p0 (float): Win rate under H0.
+        p1 (float): Win rate under H1.
+        alpha (float): Probability of accepting H1 when H0 holds.
+        beta (float): Probability of accepting H0 when H1 holds.
+    """
+    def __init__(self, p0: float = 0.4, p1: float = 0.6, alpha: float = 0.05, beta: float = 0.05):
+        if not 0 < p0 < p1 < 1: raise ValueError("SPRT needs 0 < p0 < p1 < 1")
+        self.p0, self.p1 = p0, p1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.llr = 0.0
+
+    def update(self, score: float):
+        """ Add one episode with score 1 (win), 0.5 (draw) or 0 (loss) """
+        self.llr += score * math.log(self.p1 / self.p0) + (1 - score) * math.log((1 - self.p1) / (1 - self.p0))
+
+    @property
+    def decision(self) -> Optional[str]:
+        """ "H1", "H0", or None while the test is undecided """
+        if self.llr >= self.upper: return "H1"
+        if self.llr <= self.lower: return "H0"
+        return None
+
+
+class SequentialStopRule:
+    """
+    Win/loss/draw tracker of one env that decides when to stop playing it.
+
+    Args:
+        method (str): "wilson", "beta", "t" or "sprt".
+        confidence (float): Confidence (or credibility) of the reported interval.
+        threshold (float): An interval rule stops once the interval lies entirely above or below this win rate.
+        precision (float, optional): An interval rule also stops once the interval's half-width is at most this.
+        min_episodes (int): Never stop before this many episodes.
+        max_episodes (int): Always stop after this many episodes.
+        p0, p1, alpha, beta: SPRT hypotheses and error rates (method "sprt").
+    """
+    METHODS = ("wilson", "beta", "t", "sprt")
+
+    def __init__(self, method: str = "wilson", confidence: float = 0.95, threshold: float = 0.5, precision: Optional[float] = None,
+                 min_episodes: int = 10, max_episodes: int = 200, p0: float = 0.4, p1: float = 0.6, alpha: float = 0.05, beta: float = 0.05):
+        if method not in self.METHODS: raise ValueError(f"Unknown method {method!r}, expected one of {self.METHODS}")
+        self.method = method
+        self.confidence = confidence
+        self.threshold = threshold
+        self.precision = precision
+        self.min_episodes = min_episodes
+        self.max_episodes = max_episodes
+        self.sprt = SPRT(p0, p1, alpha, beta) if method == "sprt" else None
+        self.counts = {"win": 0, "loss": 0, "draw": 0}
+        self.scores: List[float] = []
+
+    @property
+    def episodes(self) -> int:
+        return len(self.scores)
+
+    @property
+    def score(self) -> float:
+        """ Win rate with draws counted as half a win """
+        return mean(self.scores) if self.scores else 0.0
+
+    def update(self, outcome: Union[str, float]):
+        """ Record one episode: "win", "loss", "draw", or a score in [0, 1] """
+        if isinstance(outcome, str):
+            self.counts[outcome] += 1
+            outcome = OUTCOME_SCORES[outcome]
+        self.scores.append(float(outcome))
+        if self.sprt is not None: self.sprt.update(outcome)
+
+    def interval(self) -> Tuple[float, float]:
+        """ Interval on the win rate (Wilson for "wilson" and "sprt", Beta posterior for "beta", Student-t for "t") """
+        if self.method == "t": return mean_interval(self.scores, self.confidence)
+        wins = sum(self.scores)
+        if self.method == "beta": return beta_interval(wins, self.episodes - wins, self.confidence)
+        return wilson_interval(wins, self.episodes, self.confidence)
+
+    def stop_reason(self) -> Optional[str]:
+        """ Why the env should stop now, or None to keep playing """
+        if self.episodes >= self.max_episodes: return "max_episodes"
+        if self.episodes < self.min_episodes: return None
+        if self.sprt is not None:
+            return {"H1": f"sprt_above_{self.sprt.p1:g}", "H0": f"sprt_below_{self.sprt.p0:g}"}.get(self.sprt.decision)
+        lo, hi = self.interval()
+        if lo > self.threshold: return f"above_{self.threshold:g}"
+        if hi < self.threshold: return f"below_{self.threshold:g}"
+        if self.precision is not None and (hi - lo) / 2 <= self.precision: return "precision"
+        return None
+
+    def should_stop(self) -> bool:
+        return self.stop_reason() is not None
+
+    def summary(self) -> Dict[str, object]:
+        """ Columns for the evaluation summary table """
+        lo, hi = self.interval()
+        return {"episodes": self.episodes, "win_rate_lo": lo, "win_rate_hi": hi, "stop_reason": self.stop_reason() or "undecided"}
@@ -218,9 +218,17 @@ def advance_game_step():
             
         agent = st.session_state.manager.agents[player_id]
         
-        # 代理生成动作
+        # 代理生成动作，支持流式输出时边生成边显示
+        stream_placeholder = st.empty()
+        streamed_text = []
+        
+        def on_action_chunk(pid: int, chunk: str):
+            streamed_text.append(chunk)
+            stream_placeholder.markdown(f"✍️ AI玩家(ID: {pid}) 正在生成: {''.join(streamed_text)}")
+        
         with st.spinner(f"等待AI玩家(ID: {player_id})生成动作..."):
-            action = agent(observation)
+            action = st.session_state.manager.generate_action(agent, player_id, observation, {"on_action_chunk": on_action_chunk})
+        stream_placeholder.empty()
         
         # 触发动作回调
         if 'on_action' in st.session_state.callbacks:
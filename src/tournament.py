@@ -0,0 +1,279 @@
+"""
+Local tournament service for pools of agent variants.
+
+Ratings use the Weng-Lin Bayesian approximation (the Bradley-Terry "full pairing"
+variant that TrueSkill-style open implementations use): every agent has a Gaussian
+skill (mu, sigma), and after a game every seat is compared with every other seat
+by reward, so 3-player IPD and 7-player Mafia games update all participants at once.
+An agent that fills several seats of one game gets the combined update.
+
+Instead of a round-robin cross-table, each next match is the candidate seat
+assignment with the largest expected information gain: the sum over seat pairs of
+the outcome uncertainty p(1 - p) times the share of their rating variance the
+result would remove. Uncertain agents and close matchups are therefore played
+first, and games between agents whose order is already clear are avoided.
+
+Ratings are stored per env in a JSON file and reloaded on the next run.
+
+CLI (scripted demo pool, or a JSON pool spec mapping names to build_agent configs):
+    python src/tournament.py --env ColonelBlotto-v0 --matches 100 --ratings ratings.json
+    python src/tournament.py --env SecretMafia-v0 --pool pool.json --target-sigma 2.0
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import os
+import random
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Rating:
+    mu: float = 25.0
+    sigma: float = 25.0 / 3
+    matches: int = 0
+
+    @property
+    def conservative(self) -> float:
+        """ mu - 3 sigma: a skill the agent has with high probability, used for the leaderboard order """
+        return self.mu - 3 * self.sigma
+
+
+class RatingModel:
+    """
+    Weng-Lin Bradley-Terry (full pairing) rating updates for games with any number of players.
+
+    Args:
+        mu (float): Prior mean of a new agent.
+        sigma (float): Prior standard deviation of a new agent.
+        beta (float, optional): Performance noise of a single game; default sigma / 2.
+        kappa (float): Lower bound of the variance shrink factor, keeps sigma positive.
+    """
+    def __init__(self, mu: float = 25.0, sigma: float = 25.0 / 3, beta: Optional[float] = None, kappa: float = 1e-4):
+        self.mu = mu
+        self.sigma = sigma
+        self.beta = beta if beta is not None else sigma / 2
+        self.kappa = kappa
+
+    def new(self) -> Rating:
+        return Rating(self.mu, self.sigma)
+
+    def _c(self, a: Rating, b: Rating) -> float:
+        return math.sqrt(a.sigma ** 2 + b.sigma ** 2 + 2 * self.beta ** 2)
+
+    def win_probability(self, a: Rating, b: Rating) -> float:
+        """ Probability that `a` finishes ahead of `b` """
+        return 1 / (1 + math.exp((b.mu - a.mu) / self._c(a, b)))
+
+    def information(self, a: Rating, b: Rating) -> float:
+        """ Expected information of one comparison of `a` and `b`: outcome uncertainty times variance share """
+        c = self._c(a, b)
+        p = self.win_probability(a, b)
+        return p * (1 - p) * (a.sigma ** 2 + b.sigma ** 2) / c ** 2
+
+    def update(self, ratings: Sequence[Rating], rewards: Sequence[float]) -> List[Dict[str, float]]:
+        """
+        Per-seat updates for one game.
+
+        Args:
+            ratings: Rating of the agent in each seat (before the game).
+            rewards: Reward of each seat; a higher reward ranks higher, equal rewards are ties.
+
+        Returns:
+            For each seat, {"delta_mu": ..., "variance_factor": ...}.
+        """
+        updates = []
+        for i, (ri, reward_i) in enumerate(zip(ratings, rewards)):
+            omega, delta = 0.0, 0.0
+            for q, (rq, reward_q) in enumerate(zip(ratings, rewards)):
+                if q == i: continue
+                c = self._c(ri, rq)
+                p = 1 / (1 + math.exp((rq.mu - ri.mu) / c))
+                score = 1.0 if reward_i > reward_q else 0.5 if reward_i == reward_q else 0.0
+                omega += ri.sigma ** 2 / c * (score - p)
+                delta += (ri.sigma / c) * ri.sigma ** 2 / c ** 2 * p * (1 - p)
+            updates.append({"delta_mu": omega, "variance_factor": max(1 - delta, self.kappa)})
+        return updates
+
+
+def build_agent(config: Dict[str, Any]):
+    """
+    Build an agent from a config such as {"class": "OpenAIAgent", "model_name": "gpt-4o-mini"}.
+
+    The class is looked up in agent.py and scripted_agents.py; the other keys are constructor arguments.
+    """
+    import agent as agent_module
+    import scripted_agents
+    kwargs = dict(config)
+    name = kwargs.pop("class")
+    cls = getattr(agent_module, name, None) or getattr(scripted_agents, name, None)
+    if cls is None: raise ValueError(f"Unknown agent class {name!r}")
+    return cls(**kwargs)
+
+
+def scripted_pool(env_id: str) -> Dict[str, Dict[str, Any]]:
+    """ Demo pool of scripted agents: the env's baseline and random players with different seeds """
+    from scripted_agents import BASELINE_AGENTS
+    baseline = BASELINE_AGENTS.get(env_id)
+    if baseline is None: raise ValueError(f"Scripted agents cannot play {env_id}; pass a pool of model agents instead")
+    pool = {f"random-{seed}": {"class": "RandomValidAgent", "seed": seed} for seed in range(3)}
+    pool.update({f"{baseline.__name__}-{seed}": {"class": baseline.__name__, "seed": seed} for seed in range(3)})
+    return pool
+
+
+class Tournament:
+    """
+    Rate a pool of agents on one env with information-driven matchmaking.
+
+    Args:
+        env_id (str): Env to play, e.g. "ThreePlayerIPD-v0".
+        pool (dict): Agent name -> agent instance, or -> build_agent config dict.
+        ratings_path (str, optional): JSON file the ratings are loaded from and saved to after every match.
+        rating_model (RatingModel, optional): Rating update rule.
+        candidates (int): Random candidate matches scored per proposal (besides the greedy one).
+        seed (int): Seed of the matchmaking and of the env seeds.
+        play_fn (callable, optional): play_fn(env_id, agents_by_seat, seed) -> rewards by seat; default plays with GameManager.
+    """
+    def __init__(self, env_id: str, pool: Dict[str, Any], ratings_path: Optional[str] = None, rating_model: Optional[RatingModel] = None,
+                 candidates: int = 200, seed: int = 0, play_fn: Optional[Callable] = None):
+        from game_manager import GameManager
+        self.env_id = env_id
+        self.num_players = GameManager.GAME_PLAYER_COUNT[env_id]
+        self.agents = {name: build_agent(a) if isinstance(a, dict) else a for name, a in pool.items()}
+        self.ratings_path = ratings_path
+        self.model = rating_model or RatingModel()
+        self.candidates = candidates
+        self.rng = random.Random(seed)
+        self.play_fn = play_fn or play_match
+        self.matches_played = 0
+        self.ratings: Dict[str, Rating] = {}
+        self.load()
+        for name in self.agents:
+            self.ratings.setdefault(name, self.model.new())
+
+    def load(self):
+        """ Load this env's ratings from `ratings_path` (if it exists) """
+        if not self.ratings_path or not os.path.exists(self.ratings_path): return
+        with open(self.ratings_path) as f:
+            stored = json.load(f).get(self.env_id, {})
+        self.ratings.update({name: Rating(**r) for name, r in stored.get("ratings", {}).items()})
+        self.matches_played = stored.get("matches_played", 0)
+
+    def save(self):
+        """ Write this env's ratings to `ratings_path`, keeping other envs' entries; atomic replace """
+        if not self.ratings_path: return
+        data = {}
+        if os.path.exists(self.ratings_path):
+            with open(self.ratings_path) as f: data = json.load(f)
+        data[self.env_id] = {"matches_played": self.matches_played, "ratings": {name: asdict(r) for name, r in self.ratings.items()}}
+        tmp = f"{self.ratings_path}.tmp"
+        with open(tmp, "w") as f: json.dump(data, f, indent=2)
+        os.replace(tmp, self.ratings_path)
+
+    def match_information(self, names: Sequence[str]) -> float:
+        """ Expected information gain of a match with these agents (seat order does not matter) """
+        return sum(self.model.information(self.ratings[a], self.ratings[b]) for a, b in itertools.combinations(names, 2) if a != b)
+
+    def _random_match(self) -> List[str]:
+        names = list(self.agents)
+        if len(names) >= self.num_players: return self.rng.sample(names, self.num_players)
+        return names + self.rng.choices(names, k=self.num_players - len(names))
+
+    def _greedy_match(self) -> List[str]:
+        """ Start from the most uncertain agent and add the agent that adds the most information """
+        names = list(self.agents)
+        match = [max(names, key=lambda n: (self.ratings[n].sigma, self.rng.random()))]
+        while len(match) < self.num_players:
+            pool = [n for n in names if n not in match] or names
+            match.append(max(pool, key=lambda n: (self.match_information(match + [n]), self.rng.random())))
+        return match
+
+    def propose_match(self) -> List[str]:
+        """ Agent names by seat for the next match: the most informative of the greedy and random candidates """
+        candidates = [self._greedy_match()] + [self._random_match() for _ in range(self.candidates)]
+        match = max(candidates, key=self.match_information)
+        self.rng.shuffle(match)  # seats are assigned at random so seat advantages average out
+        return match
+
+    def record(self, names: Sequence[str], rewards: Sequence[float]):
+        """ Update the ratings with the result of a match (`rewards` by seat) """
+        updates = self.model.update([self.ratings[n] for n in names], rewards)
+        combined: Dict[str, Dict[str, float]] = {}
+        for name, update in zip(names, updates):
+            entry = combined.setdefault(name, {"delta_mu": 0.0, "variance_factor": 1.0})
+            entry["delta_mu"] += update["delta_mu"]
+            entry["variance_factor"] *= update["variance_factor"]
+        for name, update in combined.items():
+            rating = self.ratings[name]
+            rating.mu += update["delta_mu"]
+            rating.sigma *= math.sqrt(max(update["variance_factor"], self.model.kappa))
+            rating.matches += 1
+        self.matches_played += 1
+
+    def run(self, matches: int, target_sigma: Optional[float] = None, on_match: Optional[Callable] = None) -> List[Dict[str, Any]]:
+        """
+        Play up to `matches` matches, stopping early once every agent's sigma is at most `target_sigma`.
+
+        Args:
+            on_match: Optional callback on_match(names, rewards) after each match.
+
+        Returns:
+            The leaderboard.
+        """
+        for _ in range(matches):
+            if target_sigma is not None and all(self.ratings[n].sigma <= target_sigma for n in self.agents): break
+            names = self.propose_match()
+            seed = self.rng.randrange(2 ** 31)
+            rewards = self.play_fn(self.env_id, [self.agents[n] for n in names], seed)
+            self.record(names, [rewards[seat] for seat in range(len(names))])
+            self.save()
+            if on_match is not None: on_match(names, rewards)
+        return self.leaderboard()
+
+    def leaderboard(self) -> List[Dict[str, Any]]:
+        """ Pool agents ordered by conservative rating (mu - 3 sigma) """
+        rows = [{"agent": n, "mu": r.mu, "sigma": r.sigma, "conservative": r.conservative, "matches": r.matches}
+                for n, r in self.ratings.items() if n in self.agents]
+        return sorted(rows, key=lambda row: row["conservative"], reverse=True)
+
+
+def play_match(env_id: str, agents: Sequence[Any], seed: int) -> Dict[int, float]:
+    """ Play one game with GameManager, agents listed by seat; returns the rewards by seat """
+    from game_manager import GameManager
+    with GameManager() as manager:
+        manager.setup_game(env_id)
+        for seat, agent in enumerate(agents):
+            manager.add_agent(agent, seat)
+        manager.start_game(seed=seed)
+        return manager.play_game()["rewards"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate a pool of agents with adaptive matchmaking")
+    parser.add_argument("--env", required=True, help="env id, e.g. ColonelBlotto-v0")
+    parser.add_argument("--pool", default=None, help="JSON file: agent name -> build_agent config (default: a scripted demo pool)")
+    parser.add_argument("--ratings", default="ratings.json", help="JSON file the ratings persist in")
+    parser.add_argument("--matches", type=int, default=50)
+    parser.add_argument("--target-sigma", type=float, default=None, help="stop once every agent's sigma is at most this")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger("game_manager").setLevel(logging.WARNING)
+    if args.pool:
+        with open(args.pool) as f: pool = json.load(f)
+    else:
+        pool = scripted_pool(args.env)
+    tournament = Tournament(args.env, pool, ratings_path=args.ratings, seed=args.seed)
+    board = tournament.run(args.matches, target_sigma=args.target_sigma)
+    print(f"{'agent':<28} {'mu':>7} {'sigma':>6} {'mu-3s':>7} {'matches':>7}   ({tournament.matches_played} matches in total)")
+    for row in board:
+        print(f"{row['agent']:<28} {row['mu']:>7.2f} {row['sigma']:>6.2f} {row['conservative']:>7.2f} {row['matches']:>7}")
+
+
+if __name__ == "__main__":
+    main()
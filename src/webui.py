@@ -9,7 +9,6 @@ import sys
 import argparse
 import logging
 import time
-import gradio as gr
 import threading
 import queue
 import json
@@ -32,7 +31,8 @@ game_state = {
     "observation": "",
     "waiting_for_human": False,
     "game_result": None,
-    "last_human_action": None
+    "last_human_action": None,
+    "streaming_action": None
 }
 
 # 用于线程间通信的队列
@@ -58,7 +58,8 @@ def setup_game(game_name: str, model_name: str, human_count: int, seed: Optional
         "observation": "",
         "waiting_for_human": False,
         "game_result": None,
-        "last_human_action": None
+        "last_human_action": None,
+        "streaming_action": None
     }
     
     # 初始化管理器
@@ -128,8 +129,17 @@ def observation_callback(player_id: int, observation: str) -> None:
     else:
         game_state["waiting_for_human"] = False
 
+def action_chunk_callback(player_id: int, chunk: str) -> None:
+    """处理流式动作片段，使正在生成的内容立即可见"""
+    streaming = game_state.get("streaming_action")
+    if streaming is None or streaming["player_id"] != player_id:
+        streaming = {"player_id": player_id, "content": "", "timestamp": time.time()}
+        game_state["streaming_action"] = streaming
+    streaming["content"] += chunk
+
 def action_callback(player_id: int, action: str) -> None:
     """处理动作事件"""
+    game_state["streaming_action"] = None
     log_entry = {
         "type": "action",
         "player_id": player_id,
@@ -161,6 +171,7 @@ def game_thread_function(seed: Optional[int] = None):
         # 设置回调
         callbacks = {
             "on_observation": observation_callback,
+            "on_action_chunk": action_chunk_callback,
             "on_action": action_callback,
             "on_step_complete": step_complete_callback
         }
@@ -251,6 +262,11 @@ def get_game_log():
         elif entry_type == "system" or entry_type == "error":
             log_text += f"[{timestamp}] ⚙️ 系统: {entry['content']}\n\n"
     
+    streaming = game_state.get("streaming_action")
+    if streaming is not None:
+        timestamp = time.strftime("%H:%M:%S", time.localtime(streaming["timestamp"]))
+        log_text += f"[{timestamp}] ✍️ 玩家 {streaming['player_id']} 正在生成:\n{streaming['content']}\n\n"
+    
     if game_state["game_result"]:
         log_text += "\n===== 游戏结果 =====\n"
         log_text += f"总步数: {game_state['game_result']['steps']}\n"
@@ -294,6 +310,8 @@ def ui_observation_monitor(state):
 
 def create_ui():
     """创建Gradio界面"""
+    import gradio as gr  # 延迟导入，仅在真正创建界面时加载gradio
+    
     with gr.Blocks(title="Mind Games Challenge WebUI") as ui:
         gr.Markdown("# Mind Games Challenge WebUI")
         gr.Markdown("与强大的LLM代理对战四种不同的游戏环境")
@@ -0,0 +1,315 @@
+"""
+Sharded offline evaluation through a SQLite work queue.
+
+A coordinator enqueues units of work, one game each: env id, seed, the model's seats and the
+agent configs of the model and the opponent (build_agent configs, see tournament.py). Any
+number of worker processes, on this host or on others that share the database file, then pull
+units until the queue is empty:
+
+  - a claim leases a unit for `lease_seconds`; a heartbeat thread extends the lease while the
+    game runs, so a unit whose worker died becomes claimable again once its lease expires,
+  - units can be pre-sharded to named workers (e.g. one env per worker); a worker takes its own
+    units first and then steals pending units of other shards, so no worker idles while work is left,
+  - a failing unit is retried up to `max_attempts` times and then marked failed,
+  - the first result of a unit wins, so a unit that was re-leased after a stall is counted once.
+
+Enqueueing is idempotent (a unit's spec is unique), so a restarted coordinator does not add
+duplicates. The merged summary is computed from all finished units with the same columns as
+offline_evaluation. SQLite locking over network filesystems is unreliable; across hosts put the
+file on storage with working POSIX locks.
+
+Usage:
+    python src/work_queue.py enqueue --db queue.sqlite --env ThreePlayerIPD-v0 --seeds 0:100 --paired \\
+        --model '{"class": "OpenAIAgent", "model_name": "gpt-4o-mini"}' --opponent '{"class": "RandomValidAgent"}'
+    python src/work_queue.py worker --db queue.sqlite --name host1-w0
+    python src/work_queue.py local --db queue.sqlite --workers 4      # N workers on this host
+    python src/work_queue.py summary --db queue.sqlite
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from checkpointing import _jsonable, summarize_results
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    spec TEXT NOT NULL UNIQUE,
+    shard TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS units_status ON units (status);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    last_seen REAL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    stolen INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def make_units(env_id: str, num_players: int, seeds: Sequence[int], model: Dict[str, Any], opponent: Dict[str, Any],
+               paired: bool = False) -> List[Dict[str, Any]]:
+    """
+    Unit specs for one env: every seed in every seat assignment of the model (`paired`, see
+    offline_evaluation.seat_assignments), or on offline_evaluation.seeded_seat.
+    """
+    from offline_evaluation import seat_assignments, seeded_seat
+    units = []
+    for seed in seeds:
+        seat_sets = seat_assignments(env_id, num_players) if paired else [(seeded_seat(seed, num_players),)]
+        for seats in seat_sets:
+            units.append({"env_id": env_id, "num_players": num_players, "seed": seed, "seats": list(seats),
+                          "model": model, "opponent": opponent})
+    return units
+
+
+class WorkQueue:
+    """
+    Lease-based work queue in a SQLite file; safe to share between threads and processes.
+
+    Args:
+        path (str): Database file (created if missing).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads; the heartbeat thread gets its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, specs: Sequence[Dict[str, Any]], shards: Optional[Sequence[str]] = None) -> int:
+        """ Add unit specs (optionally sharded round-robin over worker names); returns how many were new """
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO units (spec, shard) VALUES (?, ?)",
+                         [(json.dumps(spec, sort_keys=True), shards[i % len(shards)] if shards else None)
+                          for i, spec in enumerate(specs)])
+        conn.execute("COMMIT")
+        return conn.total_changes - before
+
+    def claim(self, worker: str, lease_seconds: float) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Lease the next unit for `worker`: own or unsharded pending units first, then expired leases of its
+        own shard, then (stealing) other shards' pending units and expired leases. Returns (unit id, spec) or None.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, spec, shard FROM units WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY (shard IS NULL OR shard = ?) DESC, status = 'pending' DESC, id LIMIT 1", (now, worker)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            unit_id, spec, shard = row
+            conn.execute("UPDATE units SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                         (worker, now + lease_seconds, unit_id))
+            stolen = int(shard is not None and shard != worker)
+            conn.execute("INSERT INTO workers (name, last_seen, stolen) VALUES (?, ?, ?) "
+                         "ON CONFLICT (name) DO UPDATE SET last_seen = excluded.last_seen, stolen = stolen + excluded.stolen",
+                         (worker, now, stolen))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return unit_id, json.loads(spec)
+
+    def heartbeat(self, worker: str, unit_id: int, lease_seconds: float) -> bool:
+        """ Extend `worker`'s lease on a unit; False if the lease was lost (expired and claimed by another worker) """
+        conn = self._conn()
+        now = time.time()
+        held = conn.execute("UPDATE units SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                            (now + lease_seconds, unit_id, worker)).rowcount
+        conn.execute("UPDATE workers SET last_seen = ? WHERE name = ?", (now, worker))
+        return bool(held)
+
+    def complete(self, worker: str, unit_id: int, result: Dict[str, Any]) -> bool:
+        """ Store the result of a unit; False if another worker already finished it """
+        conn = self._conn()
+        done = conn.execute("UPDATE units SET status = 'done', worker = ?, lease_until = NULL, result = ? WHERE id = ? AND status != 'done'",
+                            (worker, json.dumps(result, default=_jsonable), unit_id)).rowcount
+        if done:
+            conn.execute("UPDATE workers SET completed = completed + 1, last_seen = ? WHERE name = ?", (time.time(), worker))
+        return bool(done)
+
+    def fail(self, worker: str, unit_id: int, error: str, max_attempts: int):
+        """ Release a unit after an error: back to pending, or failed after `max_attempts` attempts """
+        self._conn().execute(
+            "UPDATE units SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, lease_until = NULL, error = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'", (max_attempts, error, unit_id, worker))
+
+    def remaining(self) -> int:
+        """ Units that are not finished (pending or leased) """
+        return self._conn().execute("SELECT COUNT(*) FROM units WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall())
+
+    def workers(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT name, last_seen, completed, stolen FROM workers ORDER BY name").fetchall()
+        return [{"worker": name, "last_seen_s_ago": time.time() - seen, "completed": completed, "stolen": stolen}
+                for name, seen, completed, stolen in rows]
+
+    def results(self) -> List[Dict[str, Any]]:
+        """ run_game results of all finished units, each with its "env_id" """
+        rows = self._conn().execute("SELECT spec, result FROM units WHERE status = 'done' ORDER BY id").fetchall()
+        return [{"env_id": json.loads(spec)["env_id"], **json.loads(result)} for spec, result in rows]
+
+    def summary(self) -> List[dict]:
+        """ Per-env summary merged over the results of all workers """
+        return summarize_results(self.results())
+
+
+class Worker:
+    """
+    Pull units from a WorkQueue and play them until the queue is empty.
+
+    Args:
+        queue (WorkQueue): The shared queue.
+        name (str, optional): Worker name, also its shard name; default: host name and pid.
+        lease_seconds (float): Lease length; the heartbeat renews it every lease_seconds / 3.
+        max_attempts (int): Attempts of a unit before it is marked failed.
+        poll_interval (float): Wait between claims while the remaining units are leased by other workers.
+        cache (ResultCache, optional): Reuse results of episodes played before with the same agents, env version and seed.
+    """
+    def __init__(self, queue: WorkQueue, name: Optional[str] = None, lease_seconds: float = 120.0, max_attempts: int = 3,
+                 poll_interval: float = 1.0, cache=None):
+        self.queue = queue
+        self.cache = cache
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._agents: Dict[str, Any] = {}
+
+    def _agent(self, config: Dict[str, Any]):
+        """ One agent instance per distinct config, reused across units """
+        from tournament import build_agent
+        key = json.dumps(config, sort_keys=True)
+        if key not in self._agents:
+            self._agents[key] = build_agent(config)
+        return self._agents[key]
+
+    def play(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        from offline_evaluation import run_unit
+        return run_unit(spec["env_id"], spec["num_players"], self._agent(spec["model"]), self._agent(spec["opponent"]),
+                        tuple(spec["seats"]), spec["seed"], cache=self.cache)
+
+    def _heartbeat(self, unit_id: int, stop: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.name, unit_id, self.lease_seconds):
+                logger.warning(f"{self.name}: lost the lease on unit {unit_id}")
+                return
+
+    def run(self) -> int:
+        """ Work until no unit is pending or leased; returns the number of units this worker completed """
+        completed = 0
+        while True:
+            claimed = self.queue.claim(self.name, self.lease_seconds)
+            if claimed is None:
+                if self.queue.remaining() == 0: return completed
+                time.sleep(self.poll_interval)  # other workers hold the rest; their leases may still expire
+                continue
+            unit_id, spec = claimed
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(unit_id, stop), daemon=True)
+            heartbeat.start()
+            try:
+                result = self.play(spec)
+            except Exception:
+                logger.exception(f"{self.name}: unit {unit_id} failed")
+                self.queue.fail(self.name, unit_id, traceback.format_exc(limit=5), self.max_attempts)
+                continue
+            finally:
+                stop.set()
+                heartbeat.join()
+            completed += self.queue.complete(self.name, unit_id, result)
+
+
+def print_summary(queue: WorkQueue):
+    print(f"units: {queue.counts()}")
+    for worker in queue.workers():
+        print(f"  {worker['worker']:<24} completed {worker['completed']:>5}  stolen {worker['stolen']:>4}  "
+              f"last seen {worker['last_seen_s_ago']:.0f}s ago")
+    rows = queue.summary()
+    if rows:
+        print(" | ".join(f"{key:>12}" for key in rows[0]))
+        for row in rows:
+            print(" | ".join(f"{v:>12.3f}" if isinstance(v, float) else f"{v!s:>12}" for v in row.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded offline evaluation through a SQLite work queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    enqueue = sub.add_parser("enqueue", help="add units for one env")
+    enqueue.add_argument("--env", required=True)
+    enqueue.add_argument("--seeds", default="0:100", help="seed range START:STOP")
+    enqueue.add_argument("--paired", action="store_true", help="play every seed in every seat assignment")
+    enqueue.add_argument("--model", required=True, help="build_agent config (JSON) of the evaluated agent")
+    enqueue.add_argument("--opponent", required=True, help="build_agent config (JSON) of the opponents")
+    enqueue.add_argument("--shards", nargs="*", default=None, help="worker names to pre-assign units to, round-robin")
+    for name in ("worker", "local"):
+        p = sub.add_parser(name, help="run one worker" if name == "worker" else "run several worker processes on this host")
+        p.add_argument("--lease-seconds", type=float, default=120.0)
+        p.add_argument("--max-attempts", type=int, default=3)
+        p.add_argument("--cache", default=None, help="result cache file shared by the workers (see result_cache.py)")
+        if name == "worker": p.add_argument("--name", default=None)
+        else: p.add_argument("--workers", type=int, default=os.cpu_count())
+    sub.add_parser("summary", help="print progress and the merged summary")
+    for p in sub.choices.values():
+        p.add_argument("--db", required=True, help="queue database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("game_manager").setLevel(logging.WARNING)
+    queue = WorkQueue(args.db)
+    if args.command == "enqueue":
+        from game_manager import GameManager
+        start, stop = map(int, args.seeds.split(":"))
+        specs = make_units(args.env, GameManager.GAME_PLAYER_COUNT[args.env], range(start, stop),
+                           json.loads(args.model), json.loads(args.opponent), paired=args.paired)
+        print(f"enqueued {queue.enqueue(specs, args.shards)} new units ({len(specs)} requested)")
+    elif args.command == "worker":
+        from result_cache import ResultCache
+        worker = Worker(queue, args.name, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts,
+                        cache=ResultCache(args.cache) if args.cache else None)
+        print(f"{worker.name}: completed {worker.run()} units")
+    elif args.command == "local":
+        procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "worker", "--db", args.db, "--name", f"local-{i}",
+                                   "--lease-seconds", str(args.lease_seconds), "--max-attempts", str(args.max_attempts)]
+                                  + (["--cache", args.cache] if args.cache else []))
+                 for i in range(args.workers)]
+        for proc in procs: proc.wait()
+        print_summary(queue)
+    else:
+        print_summary(queue)
+
+
+if __name__ == "__main__":
+    main()
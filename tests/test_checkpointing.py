@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import offline_evaluation
+from checkpointing import EpisodeLog
+from scripted_agents import GreedyBlottoAgent, RandomValidAgent
+
+ENV_ID = "ColonelBlotto-v0"
+
+
+def result(seed: int, model_pids=(0,), model_reward: float = 1.0) -> dict:
+    return {"model_reward": model_reward, "opponent_reward": -model_reward, "invalid_move": False, "turn_count": 5,
+            "model_pids": model_pids, "seed": seed, "duration_s": 0.1}
+
+
+def test_log_round_trip(tmp_path):
+    path = str(tmp_path / "episodes.jsonl")
+    with EpisodeLog(path, snapshot_every=0) as log:
+        for seed in range(3): log.append(ENV_ID, result(seed))
+    log = EpisodeLog(path)
+    assert len(log) == 3
+    assert log.get(ENV_ID, 1, [0])["seed"] == 1
+    assert log.get(ENV_ID, 1, [1]) is None
+
+
+def test_unseeded_episodes_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        EpisodeLog(str(tmp_path / "episodes.jsonl")).append(ENV_ID, result(None))
+
+
+def test_torn_last_line_is_ignored_and_cut_off(tmp_path):
+    path = tmp_path / "episodes.jsonl"
+    with EpisodeLog(str(path), snapshot_every=0) as log:
+        for seed in range(3): log.append(ENV_ID, result(seed))
+    complete = path.read_bytes()
+    path.write_bytes(complete + b'{"env_id": "ColonelBlotto-v0", "seed": 3, "mod')  # crash mid-write
+
+    log = EpisodeLog(str(path), snapshot_every=0)
+    assert len(log) == 3 and log.get(ENV_ID, 3, [0]) is None
+    log.append(ENV_ID, result(3))
+    log.close()
+    lines = path.read_bytes().splitlines()
+    assert path.read_bytes().startswith(complete)
+    assert [json.loads(line)["seed"] for line in lines] == [0, 1, 2, 3]
+
+
+def test_resume_replays_logged_units(tmp_path, monkeypatch):
+    path = tmp_path / "episodes.jsonl"
+    played = []
+    run_game = offline_evaluation.run_game
+    def counting_run_game(*args, **kwargs):
+        played.append(kwargs["seed"])
+        return run_game(*args, **kwargs)
+    monkeypatch.setattr(offline_evaluation, "run_game", counting_run_game)
+
+    with EpisodeLog(str(path), snapshot_every=0) as log:
+        offline_evaluation.evaluate_env(ENV_ID, 2, GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0), paired=False, log=log)
+    assert len(played) == offline_evaluation.NUM_EPISODES
+    # tear the last episode as a crash during its write would
+    data = path.read_bytes()
+    path.write_bytes(data[:data.rstrip(b"\n").rfind(b"\n") + 1] + b'{"env_id": "Colo')
+
+    played.clear()
+    with EpisodeLog(str(path), snapshot_every=0) as log:
+        row = offline_evaluation.evaluate_env(ENV_ID, 2, GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0), paired=False, log=log)
+    assert played == [offline_evaluation.FIRST_SEED + offline_evaluation.NUM_EPISODES - 1]
+    assert len(EpisodeLog(str(path))) == offline_evaluation.NUM_EPISODES
+    assert 0 <= row["win_rate"] <= 1
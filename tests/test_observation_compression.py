@@ -0,0 +1,74 @@
+import textarena as ta
+
+from agent import Agent
+from observation_compression import CompressedObservationAgent, MafiaObservationCompressor, MafiaStateExtractor
+from scripted_agents import MajorityVoteMafiaAgent
+
+
+def mafia_observations(seed: int = 3):
+    """ (player_id, observation) of every turn of one scripted SecretMafia game """
+    env = ta.make("SecretMafia-v0")
+    env.reset(num_players=7, seed=seed)
+    agents = [MajorityVoteMafiaAgent(seed=pid) for pid in range(7)]
+    turns, done = [], False
+    while not done:
+        pid, observation = env.get_observation()
+        turns.append((pid, observation))
+        done, _ = env.step(action=agents[pid](observation))
+    env.close()
+    return turns
+
+
+def test_incremental_parse_matches_a_full_parse():
+    compressor = MafiaObservationCompressor()
+    for pid, observation in mafia_observations():
+        facts = compressor.extract(observation, pid)
+        fresh = MafiaStateExtractor()
+        fresh.feed(observation)
+        assert facts == fresh.facts
+    assert compressor.stats["incremental"] > 0
+
+
+def test_late_observations_get_shorter_and_keep_the_facts():
+    compressor = MafiaObservationCompressor()
+    turns = mafia_observations()
+    for pid, observation in turns: compressed = compressor(observation, pid)
+    pid, observation = turns[-1]
+    facts = compressor.extract(observation, pid)
+    assert facts.day >= 1
+    assert len(compressed) < len(observation)
+    assert compressed.startswith(facts.intro)
+    assert "Alive: " + ", ".join(f"Player {p}" for p in facts.alive) in compressed
+    assert compressor.stats["chars_out"] < compressor.stats["chars_in"]
+
+
+def test_other_games_pass_through():
+    compressor = MafiaObservationCompressor()
+    observation = "[GAME] You are Player 0 in Colonel Blotto. Allocate 20 units across fields A, B, C."
+    assert compressor(observation, 0) is observation
+    assert compressor.stats["calls"] == 0
+
+
+def test_each_past_day_is_summarized_once():
+    calls = []
+    def summarizer(text):
+        calls.append(text)
+        return "summary"
+    compressor = MafiaObservationCompressor(summarizer=summarizer)
+    for pid, observation in mafia_observations(): compressor(observation, pid)
+    assert calls and len(calls) == len(set(calls))
+    assert compressor.stats["summaries"] == len(calls)
+
+
+def test_wrapped_agent_sees_the_compressed_text():
+    seen = []
+    class Recorder(Agent):
+        def __call__(self, observation):
+            seen.append(observation)
+            return "[0]"
+    compressor = MafiaObservationCompressor()
+    agent = CompressedObservationAgent(Recorder(), compressor)
+    pid, observation = mafia_observations()[-1]
+    agent(observation)
+    assert seen == [compressor(observation)]
+    assert "action_format" not in vars(agent.agent)
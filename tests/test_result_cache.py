@@ -0,0 +1,65 @@
+import pytest
+
+import result_cache
+from result_cache import ResultCache, agent_config, agent_fingerprint
+from scripted_agents import GreedyBlottoAgent, RandomValidAgent
+
+ENV_ID = "ColonelBlotto-v0"
+RESULT = {"model_reward": 1.0, "opponent_reward": -1.0, "invalid_move": False, "turn_count": 5,
+          "model_pids": (0,), "seed": 4, "duration_s": 0.1}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache.sqlite"))
+
+
+def test_fingerprint_depends_on_configuration_only():
+    assert agent_fingerprint(RandomValidAgent(seed=1)) == agent_fingerprint(RandomValidAgent(seed=1))
+    assert agent_fingerprint(RandomValidAgent(seed=1)) != agent_fingerprint(RandomValidAgent(seed=2))
+    assert agent_fingerprint(RandomValidAgent(seed=1)) != agent_fingerprint(RandomValidAgent(seed=1, rationale=True))
+    assert agent_fingerprint(RandomValidAgent(seed=1)) != agent_fingerprint(GreedyBlottoAgent(seed=1))
+
+
+def test_fingerprint_ignores_secrets_and_runtime_state():
+    agent = RandomValidAgent(seed=1)
+    before = agent_fingerprint(agent)
+    agent.api_key = "sk-secret"
+    agent.stats = {"calls": 3}
+    agent.rng.random()
+    assert agent_fingerprint(agent) == before
+    assert "api_key" not in agent_config(agent)["attributes"]
+
+
+def test_code_version_pins_the_fingerprint():
+    agent = RandomValidAgent(seed=1)
+    assert agent_fingerprint(agent, "v1") == agent_fingerprint(agent, "v1")
+    assert agent_fingerprint(agent, "v1") != agent_fingerprint(agent, "v2")
+
+
+def test_round_trip(cache):
+    model, opponent = GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0)
+    assert cache.get(model, opponent, ENV_ID, 4, (0,)) is None
+    cache.put(model, opponent, ENV_ID, 4, (0,), RESULT)
+    assert cache.get(GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0), ENV_ID, 4, [0]) == RESULT
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+
+@pytest.mark.parametrize("change", ["model", "opponent", "seed", "seats"])
+def test_any_changed_input_misses(cache, change):
+    model, opponent = GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0)
+    cache.put(model, opponent, ENV_ID, 4, (0,), RESULT)
+    key = {"model": model, "opponent": opponent, "env_id": ENV_ID, "seed": 4, "seats": (0,)}
+    key[change] = {"model": GreedyBlottoAgent(seed=1), "opponent": RandomValidAgent(seed=0, rationale=True),
+                   "seed": 5, "seats": (1,)}[change]
+    assert cache.get(**key) is None
+
+
+def test_code_and_env_versions_invalidate(tmp_path, monkeypatch):
+    model, opponent = GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0)
+    path = str(tmp_path / "cache.sqlite")
+    ResultCache(path, code_version="v1").put(model, opponent, ENV_ID, 4, (0,), RESULT)
+    assert ResultCache(path, code_version="v1").get(model, opponent, ENV_ID, 4, (0,)) == RESULT
+    assert ResultCache(path, code_version="v2").get(model, opponent, ENV_ID, 4, (0,)) is None
+    monkeypatch.setattr(result_cache, "env_version", lambda env_id: "a-newer-env")
+    assert ResultCache(path, code_version="v1").get(model, opponent, ENV_ID, 4, (0,)) is None
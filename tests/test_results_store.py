@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from checkpointing import EpisodeLog
+from offline_evaluation import run_unit
+from result_cache import ResultCache
+from results_store import ResultsStore, RunRecorder
+from scripted_agents import GreedyBlottoAgent, RandomValidAgent
+
+ENV_ID = "ColonelBlotto-v0"
+
+
+def result(seed: int, model_reward: float = 1.0, duration_s=0.1) -> dict:
+    return {"model_reward": model_reward, "opponent_reward": -model_reward, "invalid_move": False, "turn_count": 5,
+            "model_pids": (0,), "seed": seed, "duration_s": duration_s}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultsStore(str(tmp_path / "results.sqlite"))
+
+
+def test_aggregates_follow_the_episodes(store):
+    run_id = store.start_run("model-a", label="test")
+    store.add_episodes(run_id, ENV_ID, [result(0), result(1, -1.0), result(2, 0.0)])
+    [row] = store.summary()
+    assert (row["episodes"], row["win_rate"]) == (3, pytest.approx(1 / 3))
+    assert store.compare(ENV_ID)[0]["episodes"] == 3
+    assert len(store.episodes(run_id=run_id)) == 3
+
+
+def test_a_failed_batch_is_rolled_back(store):
+    run_id = store.start_run("model-a")
+    with pytest.raises(sqlite3.Error):
+        store.add_episodes(run_id, ENV_ID, [result(0), result(1, duration_s=object())])
+    assert store.episodes() == []
+    assert store.summary() == []
+    # the connection is usable again after the rollback
+    store.add_episode(run_id, ENV_ID, result(2))
+    assert [e["seed"] for e in store.episodes()] == [2]
+    assert store.summary()[0]["episodes"] == 1
+
+
+def test_episodes_are_append_only(store):
+    run_id = store.start_run("model-a")
+    store.add_episode(run_id, ENV_ID, result(0))
+    conn = sqlite3.connect(store.path)
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("DELETE FROM episodes")
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("UPDATE episodes SET reward = 5")
+
+
+def test_only_episodes_played_in_the_run_are_recorded(store, tmp_path):
+    model, opponent = GreedyBlottoAgent(seed=0), RandomValidAgent(seed=0)
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    earlier = RunRecorder(store, store.start_run("model-a", label="earlier"))
+    run_unit(ENV_ID, 2, model, opponent, (0,), 0, cache=cache, recorder=earlier)
+
+    with EpisodeLog(str(tmp_path / "episodes.jsonl"), snapshot_every=0) as log:
+        recorder = RunRecorder(store, store.start_run("model-a", label="rerun"))
+        run_unit(ENV_ID, 2, model, opponent, (0,), 0, log, cache, recorder)  # from the cache
+        run_unit(ENV_ID, 2, model, opponent, (0,), 1, log, cache, recorder)  # played
+        run_unit(ENV_ID, 2, model, opponent, (0,), 1, log, cache, recorder)  # replayed from the log
+    assert [e["seed"] for e in store.episodes(run_id=earlier.run_id)] == [0]
+    assert [e["seed"] for e in store.episodes(run_id=recorder.run_id)] == [1]
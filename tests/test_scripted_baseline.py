@@ -0,0 +1,22 @@
+import pytest
+
+from scripted_agents import BASELINE_AGENTS, GreedyBlottoAgent, ScriptedAgent, baseline_agent
+
+
+@pytest.mark.parametrize("env_id", ["TicTacToe-v0", "Snake-v0", "NoSuchEnv-v0"])
+def test_refuses_games_without_a_grammar(env_id):
+    with pytest.raises(ValueError, match=env_id):
+        baseline_agent(env_id)
+
+
+@pytest.mark.parametrize("env_id", sorted(BASELINE_AGENTS))
+def test_every_supported_game_has_a_scripted_baseline(env_id):
+    agent = baseline_agent(env_id, seed=1)
+    assert isinstance(agent, ScriptedAgent)
+    assert type(agent) is BASELINE_AGENTS[env_id]
+
+
+def test_kwargs_reach_the_agent():
+    agent = baseline_agent("ColonelBlotto-v0", seed=3, rationale=True)
+    assert isinstance(agent, GreedyBlottoAgent)
+    assert agent.rationale
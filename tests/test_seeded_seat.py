@@ -0,0 +1,22 @@
+from collections import Counter
+
+from offline_evaluation import seeded_seat
+from role_scheduling import seat_roles
+
+NUM_PLAYERS = 7
+SEEDS = range(2000)
+# the Mafia deal for 7 players: 2 Mafia, 1 Doctor, 1 Detective, 3 Villagers
+EXPECTED = {"Villager": 3 / 7, "Mafia": 2 / 7, "Doctor": 1 / 7, "Detective": 1 / 7}
+
+
+def test_seat_is_deterministic_and_in_range():
+    seats = [seeded_seat(seed, NUM_PLAYERS) for seed in SEEDS]
+    assert seats == [seeded_seat(seed, NUM_PLAYERS) for seed in SEEDS]
+    assert set(seats) == set(range(NUM_PLAYERS))
+
+
+def test_model_roles_follow_the_deal():
+    # the env deals roles from random.seed(seed); the seat must not be correlated with that deal
+    roles = Counter(seat_roles(seed, NUM_PLAYERS)[seeded_seat(seed, NUM_PLAYERS)] for seed in SEEDS)
+    for role, share in EXPECTED.items():
+        assert abs(roles[role] / len(SEEDS) - share) < 0.035, (role, roles)
@@ -0,0 +1,67 @@
+import pytest
+
+from sequential_testing import SequentialStopRule, beta_interval, wilson_interval
+
+
+def play(rule: SequentialStopRule, outcomes) -> int:
+    """ Feed outcomes until the rule stops; returns the number of episodes played """
+    for outcome in outcomes:
+        rule.update(outcome)
+        if rule.should_stop(): break
+    return rule.episodes
+
+
+def test_intervals_contain_the_estimate():
+    lo, hi = wilson_interval(30, 50)
+    assert lo < 0.6 < hi
+    lo, hi = beta_interval(30, 20)
+    assert lo < 0.6 < hi
+
+
+def test_never_stops_before_min_episodes():
+    rule = SequentialStopRule(method="wilson", min_episodes=10)
+    assert play(rule, ["win"] * 9) == 9
+    assert rule.stop_reason() is None
+    rule.update("win")
+    assert rule.stop_reason() == "above_0.5"
+
+
+@pytest.mark.parametrize("method", ["wilson", "beta", "t"])
+def test_interval_rules_stop_on_a_clear_result(method):
+    rule = SequentialStopRule(method=method, min_episodes=5)
+    played = play(rule, ["loss", "loss", "win", "loss"] * 50)
+    assert played < 200
+    assert rule.stop_reason() == "below_0.5"
+
+
+def test_precision_stop_for_an_even_win_rate():
+    rule = SequentialStopRule(method="wilson", precision=0.15, min_episodes=5)
+    play(rule, ["win", "loss"] * 100)
+    assert rule.stop_reason() == "precision"
+    lo, hi = rule.interval()
+    assert (hi - lo) / 2 <= 0.15
+
+
+@pytest.mark.parametrize("outcome, reason", [("win", "sprt_above_0.6"), ("loss", "sprt_below_0.4")])
+def test_sprt_accepts_a_hypothesis(outcome, reason):
+    rule = SequentialStopRule(method="sprt", min_episodes=1)
+    play(rule, [outcome] * 50)
+    assert rule.stop_reason() == reason
+
+
+def test_max_episodes_caps_an_undecided_run():
+    rule = SequentialStopRule(method="sprt", min_episodes=1, max_episodes=20)
+    assert play(rule, ["draw"] * 50) == 20
+    assert rule.summary()["stop_reason"] == "max_episodes"
+
+
+def test_draws_count_half():
+    rule = SequentialStopRule()
+    for outcome in ("win", "draw", "loss", "draw"): rule.update(outcome)
+    assert rule.score == 0.5
+    assert rule.counts == {"win": 1, "loss": 1, "draw": 2}
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        SequentialStopRule(method="bayes")
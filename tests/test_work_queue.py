@@ -0,0 +1,81 @@
+import pytest
+
+from work_queue import Worker, WorkQueue, make_units
+
+ENV_ID = "ColonelBlotto-v0"
+RANDOM = {"class": "RandomValidAgent"}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.sqlite"))
+
+
+def units(seeds, paired=False):
+    return make_units(ENV_ID, 2, seeds, RANDOM, RANDOM, paired=paired)
+
+
+def test_enqueue_is_idempotent(queue):
+    assert queue.enqueue(units(range(4))) == 4
+    assert queue.enqueue(units(range(6))) == 2
+    assert queue.counts() == {"pending": 6}
+
+
+def test_paired_units_cover_every_seat():
+    assert sorted(tuple(u["seats"]) for u in units([7], paired=True)) == [(0,), (1,)]
+
+
+def test_own_shard_first_then_steal(queue):
+    queue.enqueue(units(range(4)), shards=["a", "b"])
+    claimed = [queue.claim("a", 60)[1]["seed"] for _ in range(3)]
+    assert claimed[:2] == [0, 2]  # its own shard first
+    assert claimed[2] in (1, 3)   # then another shard's pending unit
+    assert {w["worker"]: w["stolen"] for w in queue.workers()} == {"a": 1}
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue(units([0]))
+    unit_id, _ = queue.claim("dead", lease_seconds=-1)  # its lease has already run out
+    assert queue.claim("alive", 60)[0] == unit_id
+    assert not queue.heartbeat("dead", unit_id, 60)
+    assert queue.heartbeat("alive", unit_id, 60)
+    assert queue.claim("third", 60) is None
+
+
+def test_first_result_wins(queue):
+    queue.enqueue(units([0]))
+    unit_id, _ = queue.claim("slow", lease_seconds=-1)
+    queue.claim("fast", 60)
+    assert queue.complete("fast", unit_id, {"model_reward": 1})
+    assert not queue.complete("slow", unit_id, {"model_reward": 0})
+    assert queue.counts() == {"done": 1}
+    assert queue.results()[0]["model_reward"] == 1
+
+
+def test_failed_units_are_retried_then_marked_failed(queue):
+    queue.enqueue(units([0]))
+    for attempt in range(3):
+        unit_id, _ = queue.claim("w", 60)
+        queue.fail("w", unit_id, "boom", max_attempts=3)
+        assert queue.counts() == ({"pending": 1} if attempt < 2 else {"failed": 1})
+    assert queue.remaining() == 0
+
+
+class FlakyWorker(Worker):
+    """ Fails the first attempt of every unit """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attempted = set()
+
+    def play(self, spec):
+        if spec["seed"] not in self.attempted:
+            self.attempted.add(spec["seed"])
+            raise RuntimeError("transient failure")
+        return super().play(spec)
+
+
+def test_workers_drain_the_queue(queue):
+    queue.enqueue(units(range(3)))
+    assert FlakyWorker(queue, name="w0", poll_interval=0.01).run() == 3
+    assert queue.counts() == {"done": 3}
+    assert queue.summary()[0]["episodes"] == 3